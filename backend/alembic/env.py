@@ -0,0 +1,90 @@
+import re
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import engine_from_config, pool, text
+from app.config.settings import settings
+from app.config.database import Base
+from app.config.instituciones import obtener_institucion
+import app.models  # noqa: F401 - registra los modelos en Base.metadata
+
+config = context.config
+
+# Institución a migrar: alembic -x institucion=<clave> upgrade head (por
+# defecto la predeterminada). Usa su database_url o, en modo esquema, la
+# base principal con search_path y alembic_version dentro del esquema
+clave = context.get_x_argument(as_dictionary=True).get("institucion")
+institucion = obtener_institucion(clave)
+if institucion is None:
+    raise SystemExit(f"Institución desconocida: {clave}")
+ESQUEMA = institucion.esquema
+config.set_main_option("sqlalchemy.url", (institucion.database_url or settings.DATABASE_URL).replace("%", "%%"))
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Particiones por semestre (migración 0003): las gestiona ParticionesService
+PARTICION = re.compile(r"^(encuestas|respuestas)_(\d{4}_[12]|default)$")
+
+# Búsqueda de texto (migración 0009): columnas tsvector e índices de
+# PostgreSQL y tablas FTS5 de SQLite, fuera de los modelos
+BUSQUEDA = re.compile(r"^(encuestas|alertas)_fts(_\w+)?$")
+OBJETOS_BUSQUEDA = {
+    "comentario_tsv", "notas_tsv", "ix_encuestas_comentario_tsv", "ix_alertas_notas_tsv",
+    "ix_encuestas_comentario_trgm", "ix_alertas_accion_trgm", "ix_alertas_notas_trgm",
+}
+
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return not (PARTICION.match(name or "") or BUSQUEDA.match(name or ""))
+    return name not in OBJETOS_BUSQUEDA
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # PostgreSQL clona las FKs hacia una tabla particionada en cada partición
+    if type_ == "foreign_key_constraint" and reflected:
+        return not PARTICION.match(obj.referred_table.name)
+    return True
+
+def run_migrations_offline() -> None:
+    """Genera el SQL sin conectarse (alembic upgrade head --sql)"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        version_table_schema=ESQUEMA,
+    )
+    with context.begin_transaction():
+        if ESQUEMA:
+            context.execute(f'SET search_path TO "{ESQUEMA}"')
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        if ESQUEMA:
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{ESQUEMA}"'))
+            connection.execute(text(f'SET search_path TO "{ESQUEMA}"'))
+            connection.commit()
+        context.configure(
+            connection=connection,
+            version_table_schema=ESQUEMA,
+            target_metadata=target_metadata,
+            # SQLite necesita modo batch para ALTER TABLE
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_name=include_name,
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
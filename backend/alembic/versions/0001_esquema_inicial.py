@@ -0,0 +1,133 @@
+"""esquema inicial
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19
+
+Esquema que antes creaba Base.metadata.create_all() al importar app.main.
+En bases existentes creadas así basta con: alembic stamp 0001
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('usuarios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo_usuario', sa.Enum('ESTUDIANTE', 'PERSONAL', 'ADMIN', 'PSICOLOGO', name='tipousuario'), nullable=False),
+    sa.Column('nombres', sa.String(length=100), nullable=False),
+    sa.Column('apellidos', sa.String(length=100), nullable=False),
+    sa.Column('tipo_documento', sa.Enum('CC', 'TI', name='tipodocumento'), nullable=False),
+    sa.Column('numero_documento', sa.String(length=20), nullable=False),
+    sa.Column('correo_institucional', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('rol', sa.Enum('USER', 'ADMIN', 'PSICOLOGO', 'ANALISTA', name='rol'), nullable=True),
+    sa.Column('programa', sa.String(length=100), nullable=True),
+    sa.Column('promocion', sa.String(length=10), nullable=True),
+    sa.Column('cargo', sa.String(length=100), nullable=True),
+    sa.Column('consent_accepted', sa.Boolean(), nullable=True),
+    sa.Column('consent_date', sa.DateTime(), nullable=True),
+    sa.Column('can_contact', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.CheckConstraint("correo_institucional LIKE '%@uniempresarial.edu.co' OR correo_institucional LIKE '%@estudiantes.uniempresarial.edu.co'", name='check_email_institucional'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_usuarios_correo_institucional', 'usuarios', ['correo_institucional'], unique=True)
+    op.create_index('ix_usuarios_id', 'usuarios', ['id'], unique=False)
+    op.create_index('ix_usuarios_numero_documento', 'usuarios', ['numero_documento'], unique=True)
+    
+    op.create_table('encuestas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('puntaje_raw', sa.Integer(), nullable=True),
+    sa.Column('puntaje_final', sa.Integer(), nullable=True),
+    sa.Column('es_alerta', sa.Boolean(), nullable=True),
+    sa.Column('comentario', sa.Text(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=True),
+    sa.CheckConstraint("estado IN ('completada', 'en_revision')", name='check_estado'),
+    sa.CheckConstraint('puntaje_final >= 0 AND puntaje_final <= 100', name='check_puntaje_final'),
+    sa.CheckConstraint('puntaje_raw >= 0 AND puntaje_raw <= 25', name='check_puntaje_raw'),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_encuestas_created_at', 'encuestas', ['created_at'], unique=False)
+    op.create_index('ix_encuestas_es_alerta', 'encuestas', ['es_alerta'], unique=False)
+    op.create_index('ix_encuestas_id', 'encuestas', ['id'], unique=False)
+    op.create_index('ix_encuestas_usuario_id', 'encuestas', ['usuario_id'], unique=False)
+    
+    op.create_table('alertas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('encuesta_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('puntaje_obtenido', sa.Integer(), nullable=False),
+    sa.Column('prioridad', sa.String(length=10), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=True),
+    sa.Column('atendida_por', sa.Integer(), nullable=True),
+    sa.Column('fecha_atencion', sa.DateTime(), nullable=True),
+    sa.Column('accion_tomada', sa.Text(), nullable=True),
+    sa.Column('notas_psicologo', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("estado IN ('pendiente', 'en_atencion', 'resuelta')", name='check_estado'),
+    sa.CheckConstraint("prioridad IN ('alta', 'media')", name='check_prioridad'),
+    sa.ForeignKeyConstraint(['atendida_por'], ['usuarios.id'], ),
+    sa.ForeignKeyConstraint(['encuesta_id'], ['encuestas.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('encuesta_id')
+    )
+    op.create_index('ix_alertas_created_at', 'alertas', ['created_at'], unique=False)
+    op.create_index('ix_alertas_estado', 'alertas', ['estado'], unique=False)
+    op.create_index('ix_alertas_id', 'alertas', ['id'], unique=False)
+    op.create_index('ix_alertas_usuario_id', 'alertas', ['usuario_id'], unique=False)
+    
+    op.create_table('respuestas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('encuesta_id', sa.Integer(), nullable=False),
+    sa.Column('pregunta_numero', sa.Integer(), nullable=False),
+    sa.Column('valor', sa.Integer(), nullable=False),
+    sa.CheckConstraint('pregunta_numero >= 1 AND pregunta_numero <= 5', name='check_pregunta_numero'),
+    sa.CheckConstraint('valor >= 0 AND valor <= 5', name='check_valor'),
+    sa.ForeignKeyConstraint(['encuesta_id'], ['encuestas.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('encuesta_id', 'pregunta_numero', name='unique_encuesta_pregunta')
+    )
+    op.create_index('ix_respuestas_encuesta_id', 'respuestas', ['encuesta_id'], unique=False)
+    op.create_index('ix_respuestas_id', 'respuestas', ['id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_respuestas_id', table_name='respuestas')
+    op.drop_index('ix_respuestas_encuesta_id', table_name='respuestas')
+    op.drop_table('respuestas')
+    
+    op.drop_index('ix_alertas_usuario_id', table_name='alertas')
+    op.drop_index('ix_alertas_id', table_name='alertas')
+    op.drop_index('ix_alertas_estado', table_name='alertas')
+    op.drop_index('ix_alertas_created_at', table_name='alertas')
+    op.drop_table('alertas')
+    
+    op.drop_index('ix_encuestas_usuario_id', table_name='encuestas')
+    op.drop_index('ix_encuestas_id', table_name='encuestas')
+    op.drop_index('ix_encuestas_es_alerta', table_name='encuestas')
+    op.drop_index('ix_encuestas_created_at', table_name='encuestas')
+    op.drop_table('encuestas')
+    
+    op.drop_index('ix_usuarios_numero_documento', table_name='usuarios')
+    op.drop_index('ix_usuarios_id', table_name='usuarios')
+    op.drop_index('ix_usuarios_correo_institucional', table_name='usuarios')
+    op.drop_table('usuarios')
+    
+    # PostgreSQL crea tipos ENUM que drop_table no elimina
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for tipo in ("tipousuario", "tipodocumento", "rol"):
+            op.execute(f"DROP TYPE IF EXISTS {tipo}")
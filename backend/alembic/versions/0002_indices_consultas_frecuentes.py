@@ -0,0 +1,66 @@
+"""indices para las consultas frecuentes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Índices compuestos y parciales según los planes de las consultas del
+historial, la bandeja de alertas y los filtros del dashboard. Se eliminan
+los índices redundantes: los ix_*_id (la PK ya está indexada),
+ix_encuestas_usuario_id (prefijo de ix_encuestas_usuario_created),
+ix_respuestas_encuesta_id (prefijo de unique_encuesta_pregunta) y los de
+columnas de baja cardinalidad (ix_alertas_estado, ix_encuestas_es_alerta).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_index('ix_usuarios_id')
+        batch_op.create_index('ix_usuarios_tipo_programa', ['tipo_usuario', 'programa'], unique=False)
+
+    with op.batch_alter_table('encuestas', schema=None) as batch_op:
+        batch_op.drop_index('ix_encuestas_id')
+        batch_op.drop_index('ix_encuestas_usuario_id')
+        batch_op.drop_index('ix_encuestas_es_alerta')
+        batch_op.create_index('ix_encuestas_usuario_created', ['usuario_id', sa.text('created_at DESC')], unique=False)
+        batch_op.create_index('ix_encuestas_created_completadas', ['created_at'], unique=False,
+                              postgresql_where=sa.text('completed_at IS NOT NULL'),
+                              sqlite_where=sa.text('completed_at IS NOT NULL'))
+
+    with op.batch_alter_table('respuestas', schema=None) as batch_op:
+        batch_op.drop_index('ix_respuestas_id')
+        batch_op.drop_index('ix_respuestas_encuesta_id')
+
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.drop_index('ix_alertas_id')
+        batch_op.drop_index('ix_alertas_estado')
+        batch_op.create_index('ix_alertas_activas_created', ['created_at'], unique=False,
+                              postgresql_where=sa.text("estado <> 'resuelta'"),
+                              sqlite_where=sa.text("estado <> 'resuelta'"))
+
+def downgrade() -> None:
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.drop_index('ix_alertas_activas_created')
+        batch_op.create_index('ix_alertas_estado', ['estado'], unique=False)
+        batch_op.create_index('ix_alertas_id', ['id'], unique=False)
+
+    with op.batch_alter_table('respuestas', schema=None) as batch_op:
+        batch_op.create_index('ix_respuestas_encuesta_id', ['encuesta_id'], unique=False)
+        batch_op.create_index('ix_respuestas_id', ['id'], unique=False)
+
+    with op.batch_alter_table('encuestas', schema=None) as batch_op:
+        batch_op.drop_index('ix_encuestas_created_completadas')
+        batch_op.drop_index('ix_encuestas_usuario_created')
+        batch_op.create_index('ix_encuestas_es_alerta', ['es_alerta'], unique=False)
+        batch_op.create_index('ix_encuestas_usuario_id', ['usuario_id'], unique=False)
+        batch_op.create_index('ix_encuestas_id', ['id'], unique=False)
+
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_index('ix_usuarios_tipo_programa')
+        batch_op.create_index('ix_usuarios_id', ['id'], unique=False)
@@ -0,0 +1,271 @@
+"""particiones por semestre de encuestas y respuestas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+En PostgreSQL encuestas pasa a estar particionada por rango sobre
+created_at y respuestas sobre encuesta_created_at (copia de la fecha de su
+encuesta), una partición por semestre académico más una DEFAULT. Como la PK
+y las restricciones únicas de una tabla particionada deben incluir la clave
+de partición:
+
+- encuestas: PK (id, created_at); id sigue saliendo de encuestas_id_seq
+- respuestas: PK (id, encuesta_created_at) y unique_encuesta_pregunta
+  incluye encuesta_created_at
+- respuestas y alertas referencian encuestas(id, created_at) con
+  ON DELETE CASCADE; alertas.encuesta_id sigue siendo único
+
+La migración copia las tablas completas: en bases grandes ejecutarla en
+una ventana de mantenimiento. En SQLite solo se agregan las columnas y las
+restricciones equivalentes, sin particionar.
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Semestres a crear por delante del actual; luego los crea la app al
+# arrancar (ParticionesService.asegurar) o el cron
+SEMESTRES_ADELANTE = 2
+
+# SQLite no nombra las FKs; batch_alter_table las reconoce con esta convención
+CONVENCION_SQLITE = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+COLUMNAS_ENCUESTAS = (
+    "id, usuario_id, created_at, started_at, completed_at, puntaje_raw, "
+    "puntaje_final, es_alerta, comentario, estado"
+)
+
+def _semestres(desde: datetime, hasta: datetime):
+    """(nombre, inicio, fin) de cada semestre entre las dos fechas"""
+    anio, semestre = desde.year, 1 if desde.month <= 6 else 2
+    while True:
+        inicio = datetime(anio, 1 if semestre == 1 else 7, 1)
+        if inicio > hasta:
+            return
+        fin = datetime(anio, 7, 1) if semestre == 1 else datetime(anio + 1, 1, 1)
+        yield f"{anio}_{semestre}", inicio, fin
+        anio, semestre = (anio, 2) if semestre == 1 else (anio + 1, 1)
+
+def _crear_particiones(tabla: str, desde: datetime, hasta: datetime) -> None:
+    for sufijo, inicio, fin in _semestres(desde, hasta):
+        op.execute(
+            f"CREATE TABLE {tabla}_{sufijo} PARTITION OF {tabla} "
+            f"FOR VALUES FROM ('{inicio:%Y-%m-%d}') TO ('{fin:%Y-%m-%d}')"
+        )
+    op.execute(f"CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT")
+
+def _crear_indices_encuestas() -> None:
+    op.create_index('ix_encuestas_created_at', 'encuestas', ['created_at'], unique=False)
+    op.create_index('ix_encuestas_usuario_created', 'encuestas', ['usuario_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_encuestas_created_completadas', 'encuestas', ['created_at'], unique=False,
+                    postgresql_where=sa.text('completed_at IS NOT NULL'))
+
+def _drop_indices_encuestas() -> None:
+    for indice in ('ix_encuestas_created_at', 'ix_encuestas_usuario_created', 'ix_encuestas_created_completadas'):
+        op.drop_index(indice, table_name='encuestas')
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE encuestas SET created_at = COALESCE(started_at, completed_at, CURRENT_TIMESTAMP) "
+        "WHERE created_at IS NULL"
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        _upgrade_postgresql()
+    else:
+        _upgrade_sqlite()
+
+def _upgrade_postgresql() -> None:
+    bind = op.get_bind()
+
+    # Copia de la clave de partición en las tablas que referencian encuestas
+    for tabla in ('respuestas', 'alertas'):
+        op.add_column(tabla, sa.Column('encuesta_created_at', sa.DateTime(), nullable=True))
+        op.execute(
+            f"UPDATE {tabla} t SET encuesta_created_at = e.created_at "
+            f"FROM encuestas e WHERE e.id = t.encuesta_id"
+        )
+    op.alter_column('alertas', 'encuesta_created_at', nullable=False)
+    op.drop_constraint('alertas_encuesta_id_fkey', 'alertas', type_='foreignkey')
+    op.drop_constraint('respuestas_encuesta_id_fkey', 'respuestas', type_='foreignkey')
+
+    # Liberar los nombres de índices y PKs de las tablas originales
+    _drop_indices_encuestas()
+    op.rename_table('encuestas', 'encuestas_sin_particionar')
+    op.execute("ALTER TABLE encuestas_sin_particionar RENAME CONSTRAINT encuestas_pkey TO encuestas_sin_particionar_pkey")
+    op.rename_table('respuestas', 'respuestas_sin_particionar')
+    op.execute("ALTER TABLE respuestas_sin_particionar RENAME CONSTRAINT respuestas_pkey TO respuestas_sin_particionar_pkey")
+    op.execute("ALTER TABLE respuestas_sin_particionar RENAME CONSTRAINT unique_encuesta_pregunta TO unique_encuesta_pregunta_sin_particionar")
+
+    op.execute("""
+        CREATE TABLE encuestas (
+            id INTEGER NOT NULL DEFAULT nextval('encuestas_id_seq'),
+            usuario_id INTEGER NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            completed_at TIMESTAMP WITHOUT TIME ZONE,
+            puntaje_raw INTEGER,
+            puntaje_final INTEGER,
+            es_alerta BOOLEAN,
+            comentario TEXT,
+            estado VARCHAR(20),
+            CONSTRAINT encuestas_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT encuestas_usuario_id_fkey FOREIGN KEY (usuario_id) REFERENCES usuarios (id) ON DELETE CASCADE,
+            CONSTRAINT check_estado CHECK (estado IN ('completada', 'en_revision')),
+            CONSTRAINT check_puntaje_final CHECK (puntaje_final >= 0 AND puntaje_final <= 100),
+            CONSTRAINT check_puntaje_raw CHECK (puntaje_raw >= 0 AND puntaje_raw <= 25)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("""
+        CREATE TABLE respuestas (
+            id INTEGER NOT NULL DEFAULT nextval('respuestas_id_seq'),
+            encuesta_id INTEGER NOT NULL,
+            encuesta_created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            pregunta_numero INTEGER NOT NULL,
+            valor INTEGER NOT NULL,
+            CONSTRAINT respuestas_pkey PRIMARY KEY (id, encuesta_created_at),
+            CONSTRAINT unique_encuesta_pregunta UNIQUE (encuesta_id, pregunta_numero, encuesta_created_at),
+            CONSTRAINT check_pregunta_numero CHECK (pregunta_numero >= 1 AND pregunta_numero <= 5),
+            CONSTRAINT check_valor CHECK (valor >= 0 AND valor <= 5)
+        ) PARTITION BY RANGE (encuesta_created_at)
+    """)
+    # Las secuencias pasan a las tablas nuevas antes de borrar las viejas
+    op.execute("ALTER SEQUENCE encuestas_id_seq OWNED BY encuestas.id")
+    op.execute("ALTER SEQUENCE respuestas_id_seq OWNED BY respuestas.id")
+
+    ahora = datetime.utcnow()
+    desde = bind.execute(sa.text("SELECT min(created_at) FROM encuestas_sin_particionar")).scalar() or ahora
+    hasta = ahora
+    for _ in range(SEMESTRES_ADELANTE):
+        hasta = datetime(hasta.year + (hasta.month > 6), 1 if hasta.month > 6 else 7, 1)
+    _crear_particiones('encuestas', desde, hasta)
+    _crear_particiones('respuestas', desde, hasta)
+
+    op.execute(f"INSERT INTO encuestas ({COLUMNAS_ENCUESTAS}) SELECT {COLUMNAS_ENCUESTAS} FROM encuestas_sin_particionar")
+    op.execute(
+        "INSERT INTO respuestas (id, encuesta_id, encuesta_created_at, pregunta_numero, valor) "
+        "SELECT id, encuesta_id, encuesta_created_at, pregunta_numero, valor FROM respuestas_sin_particionar"
+    )
+    op.drop_table('respuestas_sin_particionar')
+    op.drop_table('encuestas_sin_particionar')
+
+    _crear_indices_encuestas()
+    op.create_foreign_key('fk_respuestas_encuesta', 'respuestas', 'encuestas',
+                          ['encuesta_id', 'encuesta_created_at'], ['id', 'created_at'], ondelete='CASCADE')
+    op.create_foreign_key('fk_alertas_encuesta', 'alertas', 'encuestas',
+                          ['encuesta_id', 'encuesta_created_at'], ['id', 'created_at'], ondelete='CASCADE')
+    op.execute("ANALYZE encuestas")
+    op.execute("ANALYZE respuestas")
+
+def _upgrade_sqlite() -> None:
+    with op.batch_alter_table('encuestas', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+    for tabla in ('respuestas', 'alertas'):
+        op.add_column(tabla, sa.Column('encuesta_created_at', sa.DateTime(), nullable=True))
+        op.execute(
+            f"UPDATE {tabla} SET encuesta_created_at = "
+            f"(SELECT e.created_at FROM encuestas e WHERE e.id = {tabla}.encuesta_id)"
+        )
+
+    with op.batch_alter_table('respuestas', schema=None, naming_convention=CONVENCION_SQLITE) as batch_op:
+        batch_op.alter_column('encuesta_created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_constraint('fk_respuestas_encuesta_id_encuestas', type_='foreignkey')
+        batch_op.drop_constraint('unique_encuesta_pregunta', type_='unique')
+        batch_op.create_unique_constraint('unique_encuesta_pregunta', ['encuesta_id', 'pregunta_numero', 'encuesta_created_at'])
+        batch_op.create_foreign_key('fk_respuestas_encuesta', 'encuestas',
+                                    ['encuesta_id', 'encuesta_created_at'], ['id', 'created_at'], ondelete='CASCADE')
+
+    with op.batch_alter_table('alertas', schema=None, naming_convention=CONVENCION_SQLITE) as batch_op:
+        batch_op.alter_column('encuesta_created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_constraint('fk_alertas_encuesta_id_encuestas', type_='foreignkey')
+        batch_op.create_foreign_key('fk_alertas_encuesta', 'encuestas',
+                                    ['encuesta_id', 'encuesta_created_at'], ['id', 'created_at'], ondelete='CASCADE')
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        _downgrade_postgresql()
+    else:
+        _downgrade_sqlite()
+
+def _downgrade_postgresql() -> None:
+    op.drop_constraint('fk_alertas_encuesta', 'alertas', type_='foreignkey')
+    op.drop_constraint('fk_respuestas_encuesta', 'respuestas', type_='foreignkey')
+    _drop_indices_encuestas()
+
+    op.rename_table('encuestas', 'encuestas_particionada')
+    op.execute("ALTER TABLE encuestas_particionada RENAME CONSTRAINT encuestas_pkey TO encuestas_particionada_pkey")
+    op.rename_table('respuestas', 'respuestas_particionada')
+    op.execute("ALTER TABLE respuestas_particionada RENAME CONSTRAINT respuestas_pkey TO respuestas_particionada_pkey")
+    op.execute("ALTER TABLE respuestas_particionada RENAME CONSTRAINT unique_encuesta_pregunta TO unique_encuesta_pregunta_particionada")
+
+    op.execute("""
+        CREATE TABLE encuestas (
+            id INTEGER NOT NULL DEFAULT nextval('encuestas_id_seq'),
+            usuario_id INTEGER NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            completed_at TIMESTAMP WITHOUT TIME ZONE,
+            puntaje_raw INTEGER,
+            puntaje_final INTEGER,
+            es_alerta BOOLEAN,
+            comentario TEXT,
+            estado VARCHAR(20),
+            CONSTRAINT encuestas_pkey PRIMARY KEY (id),
+            CONSTRAINT encuestas_usuario_id_fkey FOREIGN KEY (usuario_id) REFERENCES usuarios (id) ON DELETE CASCADE,
+            CONSTRAINT check_estado CHECK (estado IN ('completada', 'en_revision')),
+            CONSTRAINT check_puntaje_final CHECK (puntaje_final >= 0 AND puntaje_final <= 100),
+            CONSTRAINT check_puntaje_raw CHECK (puntaje_raw >= 0 AND puntaje_raw <= 25)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE respuestas (
+            id INTEGER NOT NULL DEFAULT nextval('respuestas_id_seq'),
+            encuesta_id INTEGER NOT NULL,
+            pregunta_numero INTEGER NOT NULL,
+            valor INTEGER NOT NULL,
+            CONSTRAINT respuestas_pkey PRIMARY KEY (id),
+            CONSTRAINT respuestas_encuesta_id_fkey FOREIGN KEY (encuesta_id) REFERENCES encuestas (id) ON DELETE CASCADE,
+            CONSTRAINT unique_encuesta_pregunta UNIQUE (encuesta_id, pregunta_numero),
+            CONSTRAINT check_pregunta_numero CHECK (pregunta_numero >= 1 AND pregunta_numero <= 5),
+            CONSTRAINT check_valor CHECK (valor >= 0 AND valor <= 5)
+        )
+    """)
+    op.execute("ALTER SEQUENCE encuestas_id_seq OWNED BY encuestas.id")
+    op.execute("ALTER SEQUENCE respuestas_id_seq OWNED BY respuestas.id")
+
+    op.execute(f"INSERT INTO encuestas ({COLUMNAS_ENCUESTAS}) SELECT {COLUMNAS_ENCUESTAS} FROM encuestas_particionada")
+    op.execute(
+        "INSERT INTO respuestas (id, encuesta_id, pregunta_numero, valor) "
+        "SELECT id, encuesta_id, pregunta_numero, valor FROM respuestas_particionada"
+    )
+    op.execute("DROP TABLE respuestas_particionada CASCADE")
+    op.execute("DROP TABLE encuestas_particionada CASCADE")
+
+    _crear_indices_encuestas()
+    op.drop_column('alertas', 'encuesta_created_at')
+    op.create_foreign_key('alertas_encuesta_id_fkey', 'alertas', 'encuestas',
+                          ['encuesta_id'], ['id'], ondelete='CASCADE')
+
+def _downgrade_sqlite() -> None:
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_alertas_encuesta', type_='foreignkey')
+        batch_op.drop_column('encuesta_created_at')
+        batch_op.create_foreign_key('fk_alertas_encuesta_id_encuestas', 'encuestas',
+                                    ['encuesta_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('respuestas', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_respuestas_encuesta', type_='foreignkey')
+        batch_op.drop_constraint('unique_encuesta_pregunta', type_='unique')
+        batch_op.drop_column('encuesta_created_at')
+        batch_op.create_unique_constraint('unique_encuesta_pregunta', ['encuesta_id', 'pregunta_numero'])
+        batch_op.create_foreign_key('fk_respuestas_encuesta_id_encuestas', 'encuestas',
+                                    ['encuesta_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('encuestas', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
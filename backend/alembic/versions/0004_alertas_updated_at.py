@@ -0,0 +1,30 @@
+"""updated_at en alertas
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Marca de agua de las alertas para el caché condicional del dashboard
+(ETag): max(updated_at) cambia con cada alerta nueva o atendida. Las filas
+existentes toman la fecha de atención o, si no la tienen, la de creación.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE alertas SET updated_at = COALESCE(fecha_atencion, created_at, CURRENT_TIMESTAMP)")
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_alertas_updated_at', ['updated_at'], unique=False)
+
+def downgrade() -> None:
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.drop_index('ix_alertas_updated_at')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,41 @@
+"""tendencias por usuario y tipo de alerta
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Estado incremental de la tendencia de puntajes de cada usuario (EWMA,
+pendiente, descensos seguidos) y columna tipo en alertas: "puntaje" para
+las existentes, "deterioro" para las nuevas alertas longitudinales. La
+tabla queda vacía: se llena con `python -m app.scripts.tendencias recalcular`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('tendencias_usuario',
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('n_encuestas', sa.Integer(), nullable=False),
+    sa.Column('ewma', sa.Float(), nullable=True),
+    sa.Column('ultimos_puntajes', sa.JSON(), nullable=False),
+    sa.Column('pendiente', sa.Float(), nullable=False),
+    sa.Column('descensos_consecutivos', sa.Integer(), nullable=False),
+    sa.Column('ultima_encuesta_fecha', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('usuario_id')
+    )
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tipo', sa.String(length=20), server_default='puntaje', nullable=False))
+        batch_op.create_check_constraint('check_tipo', "tipo IN ('puntaje', 'deterioro')")
+
+def downgrade() -> None:
+    with op.batch_alter_table('alertas', schema=None) as batch_op:
+        batch_op.drop_constraint('check_tipo', type_='check')
+        batch_op.drop_column('tipo')
+    op.drop_table('tendencias_usuario')
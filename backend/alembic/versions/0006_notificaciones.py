@@ -0,0 +1,42 @@
+"""bandeja de salida de notificaciones
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Outbox de avisos de alertas por correo: se escribe en la misma
+transacción que la alerta y la despacha un hilo en segundo plano.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('notificaciones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('alerta_id', sa.Integer(), nullable=False),
+    sa.Column('prioridad', sa.String(length=10), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('proximo_intento', sa.DateTime(), nullable=False),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('enviada_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("prioridad IN ('alta', 'media')", name='check_prioridad'),
+    sa.CheckConstraint("estado IN ('pendiente', 'enviada', 'fallida')", name='check_estado'),
+    sa.ForeignKeyConstraint(['alerta_id'], ['alertas.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_notificaciones_pendientes', 'notificaciones', ['proximo_intento'], unique=False,
+        postgresql_where=sa.text("estado = 'pendiente'"),
+        sqlite_where=sa.text("estado = 'pendiente'")
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_notificaciones_pendientes', table_name='notificaciones')
+    op.drop_table('notificaciones')
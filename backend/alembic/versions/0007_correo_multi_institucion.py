@@ -0,0 +1,27 @@
+"""dominio del correo por institución
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+check_email_institucional fijaba los dominios de una sola universidad; con
+varias instituciones el dominio se valida en la aplicación.
+"""
+from alembic import op
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_constraint('check_email_institucional', type_='check')
+
+def downgrade() -> None:
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.create_check_constraint(
+            'check_email_institucional',
+            "correo_institucional LIKE '%@uniempresarial.edu.co' OR "
+            "correo_institucional LIKE '%@estudiantes.uniempresarial.edu.co'"
+        )
@@ -0,0 +1,51 @@
+"""tabla de hechos analíticos sin datos personales
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+Una fila por encuesta completada con seudónimo del usuario, dimensiones,
+respuestas, puntaje y alerta, para las rutas del rol analista. La tabla
+queda vacía: se llena con `python -m app.scripts.analitica reconstruir`
+(incluye los semestres archivados) y luego se refresca sola.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('hechos_encuestas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('encuesta_id', sa.Integer(), nullable=False),
+    sa.Column('encuesta_created_at', sa.DateTime(), nullable=False),
+    sa.Column('seudonimo', sa.String(length=32), nullable=False),
+    sa.Column('tipo_usuario', sa.String(length=20), nullable=False),
+    sa.Column('programa', sa.String(length=100), nullable=True),
+    sa.Column('promocion', sa.String(length=10), nullable=True),
+    sa.Column('cargo', sa.String(length=100), nullable=True),
+    sa.Column('semestre', sa.String(length=6), nullable=False),
+    sa.Column('p1', sa.SmallInteger(), nullable=True),
+    sa.Column('p2', sa.SmallInteger(), nullable=True),
+    sa.Column('p3', sa.SmallInteger(), nullable=True),
+    sa.Column('p4', sa.SmallInteger(), nullable=True),
+    sa.Column('p5', sa.SmallInteger(), nullable=True),
+    sa.Column('puntaje', sa.SmallInteger(), nullable=False),
+    sa.Column('es_alerta', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('encuesta_id')
+    )
+    op.create_index('ix_hechos_encuestas_encuesta_created_at', 'hechos_encuestas', ['encuesta_created_at'], unique=False)
+    op.create_index('ix_hechos_encuestas_seudonimo', 'hechos_encuestas', ['seudonimo'], unique=False)
+    op.create_index('ix_hechos_semestre_programa', 'hechos_encuestas', ['semestre', 'programa'], unique=False)
+    op.create_index('ix_hechos_semestre_tipo', 'hechos_encuestas', ['semestre', 'tipo_usuario'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_hechos_semestre_tipo', table_name='hechos_encuestas')
+    op.drop_index('ix_hechos_semestre_programa', table_name='hechos_encuestas')
+    op.drop_index('ix_hechos_encuestas_seudonimo', table_name='hechos_encuestas')
+    op.drop_index('ix_hechos_encuestas_encuesta_created_at', table_name='hechos_encuestas')
+    op.drop_table('hechos_encuestas')
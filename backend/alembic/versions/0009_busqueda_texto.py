@@ -0,0 +1,138 @@
+"""búsqueda de texto en comentarios y notas de atención
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+PostgreSQL: columnas tsvector generadas (configuración spanish) con índice
+GIN en encuestas.comentario y en las notas de alertas (accion_tomada y
+notas_psicologo), más índices de trigramas para coincidencias parciales si
+la extensión pg_trgm está disponible. En encuestas particionadas la columna
+y el índice se propagan a cada partición, también a las que se creen
+después.
+
+SQLite (desarrollo y pruebas): tablas FTS5 de contenido externo
+sincronizadas con triggers. Una migración posterior que recree encuestas o
+alertas en modo batch debe volver a crear estos triggers.
+
+Las columnas, índices y tablas de búsqueda no están en los modelos; env.py
+los excluye de la autogeneración.
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+TSV_COMENTARIO = "to_tsvector('spanish'::regconfig, coalesce(comentario, ''))"
+TSV_NOTAS = "to_tsvector('spanish'::regconfig, coalesce(accion_tomada, '') || ' ' || coalesce(notas_psicologo, ''))"
+
+TRIGRAMAS = {
+    'ix_encuestas_comentario_trgm': ('encuestas', 'comentario'),
+    'ix_alertas_accion_trgm': ('alertas', 'accion_tomada'),
+    'ix_alertas_notas_trgm': ('alertas', 'notas_psicologo'),
+}
+
+def _upgrade_postgresql() -> None:
+    op.execute(f"ALTER TABLE encuestas ADD COLUMN comentario_tsv tsvector GENERATED ALWAYS AS ({TSV_COMENTARIO}) STORED")
+    op.execute("CREATE INDEX ix_encuestas_comentario_tsv ON encuestas USING gin (comentario_tsv)")
+    op.execute(f"ALTER TABLE alertas ADD COLUMN notas_tsv tsvector GENERATED ALWAYS AS ({TSV_NOTAS}) STORED")
+    op.execute("CREATE INDEX ix_alertas_notas_tsv ON alertas USING gin (notas_tsv)")
+
+    disponible = op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+    ).scalar()
+    if not disponible:
+        # Sin trigramas la búsqueda sigue funcionando con prefijos de palabra
+        logger.warning("pg_trgm no está disponible: se omiten los índices de trigramas")
+        return
+    # En public: las instituciones con esquema propio comparten la extensión
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public")
+    esquema = op.get_bind().execute(
+        sa.text("SELECT n.nspname FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace WHERE e.extname = 'pg_trgm'")
+    ).scalar()
+    for indice, (tabla, columna) in TRIGRAMAS.items():
+        op.execute(f'CREATE INDEX {indice} ON {tabla} USING gin ({columna} "{esquema}".gin_trgm_ops)')
+
+def _upgrade_sqlite() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE encuestas_fts USING fts5(comentario, content='encuestas', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute("INSERT INTO encuestas_fts(rowid, comentario) SELECT id, comentario FROM encuestas WHERE comentario IS NOT NULL")
+    # Solo se indexan (y se borran del índice) las filas con texto: borrar
+    # de una tabla de contenido externo una fila que no estaba la corrompe
+    op.execute("""
+        CREATE TRIGGER encuestas_fts_ai AFTER INSERT ON encuestas WHEN new.comentario IS NOT NULL BEGIN
+            INSERT INTO encuestas_fts(rowid, comentario) VALUES (new.id, new.comentario);
+        END""")
+    op.execute("""
+        CREATE TRIGGER encuestas_fts_ad AFTER DELETE ON encuestas WHEN old.comentario IS NOT NULL BEGIN
+            INSERT INTO encuestas_fts(encuestas_fts, rowid, comentario) VALUES ('delete', old.id, old.comentario);
+        END""")
+    # Un solo trigger de UPDATE: con dos, SQLite no garantiza que el borrado
+    # del texto anterior vaya antes de la inserción del nuevo
+    op.execute("""
+        CREATE TRIGGER encuestas_fts_au AFTER UPDATE OF comentario ON encuestas BEGIN
+            INSERT INTO encuestas_fts(encuestas_fts, rowid, comentario)
+            SELECT 'delete', old.id, old.comentario WHERE old.comentario IS NOT NULL;
+            INSERT INTO encuestas_fts(rowid, comentario)
+            SELECT new.id, new.comentario WHERE new.comentario IS NOT NULL;
+        END""")
+
+    op.execute(
+        "CREATE VIRTUAL TABLE alertas_fts USING fts5(accion_tomada, notas_psicologo, content='alertas', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "INSERT INTO alertas_fts(rowid, accion_tomada, notas_psicologo) SELECT id, accion_tomada, notas_psicologo "
+        "FROM alertas WHERE accion_tomada IS NOT NULL OR notas_psicologo IS NOT NULL"
+    )
+    op.execute("""
+        CREATE TRIGGER alertas_fts_ai AFTER INSERT ON alertas
+        WHEN new.accion_tomada IS NOT NULL OR new.notas_psicologo IS NOT NULL BEGIN
+            INSERT INTO alertas_fts(rowid, accion_tomada, notas_psicologo)
+            VALUES (new.id, new.accion_tomada, new.notas_psicologo);
+        END""")
+    op.execute("""
+        CREATE TRIGGER alertas_fts_ad AFTER DELETE ON alertas
+        WHEN old.accion_tomada IS NOT NULL OR old.notas_psicologo IS NOT NULL BEGIN
+            INSERT INTO alertas_fts(alertas_fts, rowid, accion_tomada, notas_psicologo)
+            VALUES ('delete', old.id, old.accion_tomada, old.notas_psicologo);
+        END""")
+    op.execute("""
+        CREATE TRIGGER alertas_fts_au AFTER UPDATE OF accion_tomada, notas_psicologo ON alertas BEGIN
+            INSERT INTO alertas_fts(alertas_fts, rowid, accion_tomada, notas_psicologo)
+            SELECT 'delete', old.id, old.accion_tomada, old.notas_psicologo
+            WHERE old.accion_tomada IS NOT NULL OR old.notas_psicologo IS NOT NULL;
+            INSERT INTO alertas_fts(rowid, accion_tomada, notas_psicologo)
+            SELECT new.id, new.accion_tomada, new.notas_psicologo
+            WHERE new.accion_tomada IS NOT NULL OR new.notas_psicologo IS NOT NULL;
+        END""")
+
+def upgrade() -> None:
+    dialecto = op.get_bind().dialect.name
+    if dialecto == "postgresql":
+        _upgrade_postgresql()
+    elif dialecto == "sqlite":
+        _upgrade_sqlite()
+
+def downgrade() -> None:
+    dialecto = op.get_bind().dialect.name
+    if dialecto == "postgresql":
+        for indice in TRIGRAMAS:
+            op.execute(f"DROP INDEX IF EXISTS {indice}")
+        op.execute("DROP INDEX ix_alertas_notas_tsv")
+        op.execute("ALTER TABLE alertas DROP COLUMN notas_tsv")
+        op.execute("DROP INDEX ix_encuestas_comentario_tsv")
+        op.execute("ALTER TABLE encuestas DROP COLUMN comentario_tsv")
+    elif dialecto == "sqlite":
+        for tabla in ("encuestas", "alertas"):
+            for sufijo in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}")
+            op.execute(f"DROP TABLE IF EXISTS {tabla}_fts")
@@ -0,0 +1,30 @@
+# Listas predefinidas
+PROGRAMAS = [
+    "Administración de Empresas",
+    "Administración Financiera",
+    "Contaduría Pública",
+    "Ingeniería de Sistemas",
+    "Ingeniería Industrial",
+    "Psicología",
+    "Derecho",
+    "Comunicación Social",
+    "Diseño Gráfico",
+    "Mercadeo y Publicidad"
+]
+
+CARGOS = [
+    "Docente Tiempo Completo",
+    "Docente Hora Cátedra",
+    "Coordinador Académico",
+    "Decano",
+    "Director de Programa",
+    "Psicólogo",
+    "Trabajador Social",
+    "Secretaria/o",
+    "Auxiliar Administrativo",
+    "Servicios Generales",
+    "Vigilancia",
+    "Biblioteca",
+    "Sistemas",
+    "Otro"
+]
@@ -1,24 +1,289 @@
+import asyncio
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Optional, Set
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.config.instituciones import Institucion, PREDETERMINADA, institucion_actual
 from app.config.settings import settings
+from app.utils.metricas_http import instrumentar_sql
+from app.utils.pool_metrics import desregistrar_engine, pool_instrumentado, registrar_engine
 
-# Crear engine
+def url_async(url: str) -> str:
+    """Traduce la URL sync al driver async equivalente (asyncpg / aiosqlite)"""
+    for prefijo in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefijo):
+            return "postgresql+asyncpg://" + url[len(prefijo):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+def opciones_engine(
+    url: str,
+    pool_base: type,
+    nombre: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None
+) -> dict:
+    """Parámetros del pool desde Settings (o los de la institución), con un pool instrumentado"""
+    opciones = {"pool_pre_ping": True, "echo": settings.DB_ECHO}
+    # SQLite en memoria usa un pool de una sola conexión
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        return opciones
+    opciones.update(
+        poolclass=pool_instrumentado(pool_base, nombre),
+        pool_size=settings.DB_POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=settings.DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    return opciones
+
+# Engine sync: scripts, jobs de fondo y rutas CPU-bound que corren en el threadpool
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
+    **opciones_engine(settings.DATABASE_URL, QueuePool, "primario_sync")
+)
+
+# Engine async: camino de los requests
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or url_async(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **opciones_engine(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, "primario")
 )
 
-# Session maker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+registrar_engine("primario", async_engine.sync_engine)
+registrar_engine("primario_sync", engine)
+instrumentar_sql(async_engine.sync_engine)
+instrumentar_sql(engine)
+
+# Réplica de lectura opcional para dashboard, exportes e historial
+if settings.DATABASE_REPLICA_URL:
+    read_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        **opciones_engine(settings.DATABASE_REPLICA_URL, QueuePool, "replica_sync")
+    )
+    ASYNC_DATABASE_REPLICA_URL = settings.ASYNC_DATABASE_REPLICA_URL or url_async(settings.DATABASE_REPLICA_URL)
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_REPLICA_URL,
+        **opciones_engine(ASYNC_DATABASE_REPLICA_URL, AsyncAdaptedQueuePool, "replica")
+    )
+    registrar_engine("replica", async_read_engine.sync_engine)
+    registrar_engine("replica_sync", read_engine)
+    instrumentar_sql(async_read_engine.sync_engine)
+    instrumentar_sql(read_engine)
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+class MotoresInstitucion:
+    """Engines y fábricas de sesión de una institución"""
+
+    def __init__(self, engine, async_engine, read_engine, async_read_engine, nombres_pools=()):
+        self.engine = engine
+        self.async_engine = async_engine
+        self.read_engine = read_engine
+        self.async_read_engine = async_read_engine
+        self.nombres_pools = nombres_pools
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+        self.AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Institución predeterminada: los engines de arriba (scripts, benchmarks y
+# jobs usan también estos nombres de módulo)
+_motores_predeterminada = MotoresInstitucion(engine, async_engine, read_engine, async_read_engine)
+SessionLocal = _motores_predeterminada.SessionLocal
+AsyncSessionLocal = _motores_predeterminada.AsyncSessionLocal
+ReadSessionLocal = _motores_predeterminada.ReadSessionLocal
+AsyncReadSessionLocal = _motores_predeterminada.AsyncReadSessionLocal
+
+def _search_path(url: str, esquema: str) -> dict:
+    """connect_args que fijan el search_path de cada conexión al esquema de la institución"""
+    if url.startswith("postgresql+asyncpg://"):
+        return {"server_settings": {"search_path": esquema}}
+    if url.startswith(("postgresql://", "postgresql+psycopg2://", "postgres://")):
+        return {"options": f"-csearch_path={esquema}"}
+    raise ValueError(f"El modo un-esquema-por-institución requiere PostgreSQL: {url.split(':')[0]}")
+
+def _crear_motores(institucion: Institucion) -> MotoresInstitucion:
+    """Engines propios de una institución, con su propio pool y métricas"""
+    url = institucion.database_url or settings.DATABASE_URL
+    url_asincrona = institucion.async_database_url or (
+        url_async(url) if institucion.database_url else ASYNC_DATABASE_URL
+    )
+    nombre = f"institucion_{institucion.clave}"
+    opciones = {"pool_size": institucion.pool_size, "max_overflow": institucion.max_overflow}
+    extra_sync, extra_async = {}, {}
+    if institucion.esquema:
+        # Solo el esquema de la institución: una tabla que falte da error en
+        # lugar de leer la de otra institución en public
+        extra_sync = {"connect_args": _search_path(url, institucion.esquema)}
+        extra_async = {"connect_args": _search_path(url_asincrona, institucion.esquema)}
+
+    motor_sync = create_engine(url, **opciones_engine(url, QueuePool, f"{nombre}_sync", **opciones), **extra_sync)
+    motor_async = create_async_engine(
+        url_asincrona, **opciones_engine(url_asincrona, AsyncAdaptedQueuePool, nombre, **opciones), **extra_async
+    )
+    registrar_engine(nombre, motor_async.sync_engine)
+    registrar_engine(f"{nombre}_sync", motor_sync)
+    instrumentar_sql(motor_async.sync_engine)
+    instrumentar_sql(motor_sync)
+    return MotoresInstitucion(motor_sync, motor_async, motor_sync, motor_async, (nombre, f"{nombre}_sync"))
+
+# Engines de las demás instituciones: caché LRU acotada por
+# INSTITUCIONES_MAX_MOTORES para no abrir un pool por cada institución
+# registrada en cada worker
+_motores: "OrderedDict[str, MotoresInstitucion]" = OrderedDict()
+_motores_lock = threading.Lock()
+_loop_eventos: Optional[asyncio.AbstractEventLoop] = None
+_cierres_pendientes: Set[asyncio.Future] = set()
+
+def _descartar(motores: MotoresInstitucion) -> None:
+    """
+    Cierra los pools de una institución que salió de la caché
+
+    Las conexiones en uso no se cierran: vuelven a un pool huérfano y se
+    liberan al terminar el request que las tiene. El engine async se cierra
+    en el event loop donde se abrieron sus conexiones.
+    """
+    for nombre in motores.nombres_pools:
+        desregistrar_engine(nombre)
+    motores.engine.dispose()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        tarea = loop.create_task(motores.async_engine.dispose())
+        _cierres_pendientes.add(tarea)
+        tarea.add_done_callback(_cierres_pendientes.discard)
+    elif _loop_eventos is not None and _loop_eventos.is_running():
+        futuro = asyncio.run_coroutine_threadsafe(motores.async_engine.dispose(), _loop_eventos)
+        _cierres_pendientes.add(futuro)
+        futuro.add_done_callback(_cierres_pendientes.discard)
+    # Sin event loop (scripts) el engine async nunca abrió conexiones
+
+def motores(institucion: Optional[Institucion] = None) -> MotoresInstitucion:
+    """Engines de la institución (por defecto, la del request o job en curso)"""
+    global _loop_eventos
+    institucion = institucion or institucion_actual()
+    if institucion.clave == PREDETERMINADA.clave:
+        return _motores_predeterminada
+    if _loop_eventos is None:
+        try:
+            _loop_eventos = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    descartados = []
+    with _motores_lock:
+        actuales = _motores.get(institucion.clave)
+        if actuales is not None:
+            _motores.move_to_end(institucion.clave)
+            return actuales
+        actuales = _motores[institucion.clave] = _crear_motores(institucion)
+        while len(_motores) > max(1, settings.INSTITUCIONES_MAX_MOTORES):
+            descartados.append(_motores.popitem(last=False)[1])
+    for viejos in descartados:
+        _descartar(viejos)
+    return actuales
+
+def reiniciar_tras_fork() -> None:
+    """
+    Descarta en el worker recién creado los pools heredados del proceso padre
+
+    Con preload_app el padre importa la app antes del fork; si llegó a
+    abrir conexiones, el hijo no debe usar esos sockets compartidos.
+    close=False: no los cierra (son del padre), solo deja de usarlos.
+    """
+    global _loop_eventos
+    for motor in {engine, read_engine}:
+        motor.dispose(close=False)
+    for motor in {async_engine, async_read_engine}:
+        motor.sync_engine.dispose(close=False)
+    with _motores_lock:
+        for actuales in _motores.values():
+            actuales.engine.dispose(close=False)
+            actuales.async_engine.sync_engine.dispose(close=False)
+    _loop_eventos = None
+
+# Read-your-writes: tras una escritura el usuario lee del primario durante
+# REPLICA_PIN_PRIMARIO_SEGUNDOS. El registro local solo lo ve este proceso;
+# entre workers (o instancias) la marca viaja con el cliente: la respuesta
+# lleva CABECERA_ESCRITURA firmada y el cliente la reenvía mientras dure
+CABECERA_ESCRITURA = "X-Escritura-Reciente"
+_escrituras_recientes: Dict[int, float] = {}
+_escrituras_lock = threading.Lock()
+
+# Marca recibida y marca a emitir del request actual; la fija
+# MarcaEscrituraMiddleware (dict mutable: las rutas sync corren en el
+# threadpool con una copia del contexto)
+marcas_request: ContextVar[Optional[dict]] = ContextVar("marca_escritura", default=None)
+
+def _firma_escritura(usuario_id: int, hasta_ms: int) -> str:
+    mensaje = f"{institucion_actual().clave}:{usuario_id}:{hasta_ms}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), mensaje, hashlib.sha256).hexdigest()[:32]
+
+def marca_escritura(usuario_id: int, hasta: float) -> str:
+    """Valor de CABECERA_ESCRITURA: vencimiento (epoch en ms) y firma ligada al usuario"""
+    hasta_ms = int(hasta * 1000)
+    return f"{hasta_ms}.{_firma_escritura(usuario_id, hasta_ms)}"
+
+def marca_vigente(valor: Optional[str], usuario_id: int) -> bool:
+    """True si la marca es de este usuario e institución y no ha vencido"""
+    try:
+        hasta_ms, firma = valor.split(".")
+        hasta_ms = int(hasta_ms)
+    except (AttributeError, ValueError):
+        return False
+    return hasta_ms > time.time() * 1000 and hmac.compare_digest(firma, _firma_escritura(usuario_id, hasta_ms))
+
+def marcar_escritura(usuario_id: int) -> None:
+    """Fija al usuario al primario mientras la réplica se pone al día"""
+    actuales = motores()
+    if actuales.read_engine is actuales.engine:
+        return
+    ahora = time.monotonic()
+    with _escrituras_lock:
+        _escrituras_recientes[usuario_id] = ahora + settings.REPLICA_PIN_PRIMARIO_SEGUNDOS
+        if len(_escrituras_recientes) > 10_000:
+            for clave in [k for k, hasta in _escrituras_recientes.items() if hasta < ahora]:
+                del _escrituras_recientes[clave]
+    marca = marcas_request.get()
+    if marca is not None:
+        marca["emitida"] = marca_escritura(usuario_id, time.time() + settings.REPLICA_PIN_PRIMARIO_SEGUNDOS)
+
+def leer_de_primario(usuario_id: int) -> bool:
+    """True si el usuario escribió hace menos de la ventana de pinning (en este proceso o según su marca)"""
+    actuales = motores()
+    if actuales.read_engine is actuales.engine:
+        return True
+    with _escrituras_lock:
+        hasta = _escrituras_recientes.get(usuario_id)
+    if hasta is not None and hasta > time.monotonic():
+        return True
+    marca = marcas_request.get()
+    return marca is not None and marca_vigente(marca["recibida"], usuario_id)
 
 # Base para modelos
 Base = declarative_base()
 
-# Dependency para FastAPI
-def get_db():
-    db = SessionLocal()
+# Dependency para FastAPI: sesión contra la base de la institución del request
+async def get_db():
+    async with motores().AsyncSessionLocal() as db:
+        yield db
+
+# Dependency sync para rutas que deben correr en el threadpool
+def get_sync_db():
+    db = motores().SessionLocal()
     try:
         yield db
     finally:
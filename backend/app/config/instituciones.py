@@ -0,0 +1,130 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+from app.config.catalogos import PROGRAMAS, CARGOS
+from app.config.settings import settings
+
+class Institucion(BaseModel):
+    """
+    Configuración de una institución (tenant)
+
+    La base de datos se elige con database_url (una base por institución) o
+    con esquema (un esquema por institución en la base de DATABASE_URL,
+    vía search_path). Solo la predeterminada usa la base principal tal cual:
+    las tablas no tienen columna de institución, así que cualquier otra que
+    la compartiera vería sus usuarios, encuestas y alertas.
+    """
+
+    clave: str = Field(..., pattern=r"^[a-z][a-z0-9_]{0,29}$")
+    nombre: str
+    hosts: List[str] = []
+    dominio_estudiantes: str
+    dominio_personal: str
+    # Sin catálogo propio se usan los de app/config/catalogos.py
+    programas: List[str] = Field(default_factory=lambda: list(PROGRAMAS))
+    cargos: List[str] = Field(default_factory=lambda: list(CARGOS))
+    database_url: Optional[str] = None
+    async_database_url: Optional[str] = None
+    esquema: Optional[str] = Field(None, pattern=r"^[a-z_][a-z0-9_]{0,62}$")
+    # Pool propio: una institución grande no agota las conexiones de las demás
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+
+    def error_correo(self, correo: str, estudiante: bool) -> Optional[str]:
+        """Mensaje de error si el correo no es del dominio que corresponde, o None"""
+        correo = correo.lower()
+        if estudiante:
+            if not correo.endswith(self.dominio_estudiantes.lower()):
+                return "Debes usar tu correo institucional de estudiante"
+            return None
+        if not correo.endswith(self.dominio_personal.lower()):
+            return "Debes usar tu correo institucional"
+        if self.dominio_estudiantes.lower() != self.dominio_personal.lower() and correo.endswith(
+            self.dominio_estudiantes.lower()
+        ):
+            return "Este correo es de estudiante. Usa el registro de estudiantes."
+        return None
+
+def _cargar() -> Dict[str, Institucion]:
+    """La institución predeterminada sale de Settings; las demás, de INSTITUCIONES_ARCHIVO"""
+    predeterminada = Institucion(
+        clave=settings.INSTITUCION_PREDETERMINADA,
+        nombre=settings.UNIVERSIDAD_NOMBRE,
+        hosts=settings.INSTITUCION_HOSTS,
+        dominio_estudiantes=settings.DOMINIO_ESTUDIANTES,
+        dominio_personal=settings.DOMINIO_PERSONAL,
+        programas=PROGRAMAS,
+        cargos=CARGOS,
+    )
+    registro = {predeterminada.clave: predeterminada}
+    if settings.INSTITUCIONES_ARCHIVO:
+        with open(settings.INSTITUCIONES_ARCHIVO, encoding="utf-8") as f:
+            for datos in json.load(f):
+                institucion = Institucion(**datos)
+                if institucion.clave in registro:
+                    raise ValueError(f"Institución repetida en {settings.INSTITUCIONES_ARCHIVO}: {institucion.clave}")
+                if not institucion.esquema and (
+                    not institucion.database_url or institucion.database_url == settings.DATABASE_URL
+                ):
+                    raise ValueError(
+                        f"La institución {institucion.clave} de {settings.INSTITUCIONES_ARCHIVO} necesita "
+                        "database_url (otra base) o esquema: compartiría las tablas de la predeterminada"
+                    )
+                registro[institucion.clave] = institucion
+    return registro
+
+# Registro por proceso; el archivo se lee una vez al importar
+INSTITUCIONES: Dict[str, Institucion] = _cargar()
+PREDETERMINADA = INSTITUCIONES[settings.INSTITUCION_PREDETERMINADA]
+_por_host: Dict[str, Institucion] = {
+    host.lower(): institucion for institucion in INSTITUCIONES.values() for host in institucion.hosts
+}
+
+# La fija InstitucionMiddleware por request (o usar_institucion en scripts y
+# jobs); llega al threadpool y a los greenlets de SQLAlchemy como la de métricas
+_institucion_actual: ContextVar[Institucion] = ContextVar("institucion_actual", default=PREDETERMINADA)
+
+def institucion_actual() -> Institucion:
+    return _institucion_actual.get()
+
+def obtener_institucion(clave: Optional[str]) -> Optional[Institucion]:
+    """Institución por clave; None (sin clave) es la predeterminada"""
+    if clave is None:
+        return PREDETERMINADA
+    return INSTITUCIONES.get(clave)
+
+def institucion_por_host(host: str) -> Optional[Institucion]:
+    """Institución registrada para el host (sin puerto), o None"""
+    return _por_host.get(host.split(":")[0].lower())
+
+@contextmanager
+def usar_institucion(clave: Optional[str]) -> Iterator[Institucion]:
+    """
+    Fija la institución actual dentro del bloque
+
+    Raises:
+        ValueError: si la clave no está registrada
+    """
+    institucion = obtener_institucion(clave)
+    if institucion is None:
+        raise ValueError(f"Institución desconocida: {clave}")
+    token = _institucion_actual.set(institucion)
+    try:
+        yield institucion
+    finally:
+        _institucion_actual.reset(token)
+
+def fijar_institucion(clave: Optional[str]) -> Institucion:
+    """
+    Fija la institución actual sin restaurarla (scripts de línea de comandos)
+
+    Raises:
+        ValueError: si la clave no está registrada
+    """
+    institucion = obtener_institucion(clave)
+    if institucion is None:
+        raise ValueError(f"Institución desconocida: {clave}")
+    _institucion_actual.set(institucion)
+    return institucion
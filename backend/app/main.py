@@ -1,19 +1,77 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from app.config.instituciones import INSTITUCIONES, usar_institucion
+from app.config.database import CABECERA_ESCRITURA
 from app.config.settings import settings
-from app.config.database import Base, engine
-from app.routes import auth, encuestas, dashboard
+from app.routes import auth, encuestas, dashboard, admin, metricas, analitica
+from app.services.analitica_service import refresco_analitica
+from app.services.last_login_service import last_login_buffer
+from app.services.notificacion_service import despachador_notificaciones
+from app.services.auth_service import pwd_context
+from app.services.particiones_service import ParticionesService
+from app.utils.bcrypt_policy import calibrar_una_vez
+from app.utils.calentamiento import calentar
+from app.utils.compresion import CompresionMiddleware
+from app.utils.institucion import InstitucionMiddleware
+from app.utils.marca_escritura import MarcaEscrituraMiddleware
+from app.utils.metricas_compartidas import metricas_compartidas
+from app.utils.metricas_http import MetricasMiddleware
+from app.utils.respuestas_json import clase_respuesta_por_defecto
 
-# Crear tablas
-Base.metadata.create_all(bind=engine)
+# El esquema se gestiona con Alembic (alembic upgrade head); importar la
+# app no se conecta a la base de datos
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.BCRYPT_CALIBRAR_AL_INICIO:
+        # Con gunicorn ya se calibró en el proceso padre (when_ready)
+        calibrar_una_vez(pwd_context)
+    if settings.PARTICIONES_AL_INICIO:
+        # Particiones del semestre actual y los siguientes de cada
+        # institución (no-op fuera de PostgreSQL)
+        for clave in INSTITUCIONES:
+            with usar_institucion(clave):
+                await run_in_threadpool(ParticionesService.asegurar)
+    if settings.CALENTAR_AL_INICIO:
+        # Pools y cachés listos antes del primer request (tras un deploy o
+        # un reciclaje por WEB_MAX_REQUESTS)
+        await calentar()
+    last_login_buffer.iniciar()
+    if settings.NOTIFICACIONES_ACTIVAS:
+        despachador_notificaciones.iniciar()
+    refresco_analitica.iniciar()
+    metricas_compartidas.iniciar()
+    yield
+    # Se llega aquí cuando el servidor ya drenó los requests en curso.
+    # Escribir los last_login pendientes antes de apagar
+    last_login_buffer.detener()
+    despachador_notificaciones.detener()
+    refresco_analitica.detener()
+    # Al final: la última publicación incluye lo que hicieron los anteriores
+    metricas_compartidas.detener()
 
 # Crear app
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    description="Sistema de Bienestar Universitario - Índice WHO-5"
+    description="Sistema de Bienestar Universitario - Índice WHO-5",
+    default_response_class=clase_respuesta_por_defecto(),
+    lifespan=lifespan
 )
 
+# Institución del request (la más interna: las respuestas de error que
+# genera pasan por compresión, CORS y métricas)
+app.add_middleware(InstitucionMiddleware)
+
+# Marca de read-your-writes que el cliente reenvía tras una escritura
+app.add_middleware(MarcaEscrituraMiddleware)
+
+# Compresión negociada (por dentro de CORS y métricas: comprime lo que
+# devuelve la ruta y queda dentro de la latencia medida por MetricasMiddleware)
+app.add_middleware(CompresionMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -21,12 +79,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECERA_ESCRITURA],
 )
 
+# Latencia, códigos de estado y SQL por ruta (se expone en /metrics). Se
+# agrega después de CORS para quedar por fuera y medir también los preflight
+app.add_middleware(MetricasMiddleware)
+
 # Incluir routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Autenticación"])
 app.include_router(encuestas.router, prefix="/api/encuestas", tags=["Encuestas"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Administración"])
+app.include_router(analitica.router, prefix="/api/analitica", tags=["Analítica"])
+app.include_router(metricas.router, tags=["Métricas"])
 
 @app.get("/")
 def root():
@@ -40,6 +106,8 @@ def root():
 def health_check():
     return {"status": "ok"}
 
+# Solo desarrollo (un proceso con recarga); en producción:
+# gunicorn -c gunicorn.conf.py app.main:app
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
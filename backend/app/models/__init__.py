@@ -3,5 +3,8 @@ from app.models.usuario import Usuario, TipoUsuario, TipoDocumento, Rol
 from app.models.encuesta import Encuesta
 from app.models.respuesta import Respuesta
 from app.models.alerta import Alerta
+from app.models.tendencia import TendenciaUsuario
+from app.models.notificacion import Notificacion
+from app.models.hecho_encuesta import HechoEncuesta
 
-__all__ = ["Usuario", "TipoUsuario", "TipoDocumento", "Rol", "Encuesta", "Respuesta", "Alerta"]
+__all__ = ["Usuario", "TipoUsuario", "TipoDocumento", "Rol", "Encuesta", "Respuesta", "Alerta", "TendenciaUsuario", "Notificacion", "HechoEncuesta"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, ForeignKeyConstraint, Text, CheckConstraint, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config.database import Base
@@ -6,16 +6,19 @@ from app.config.database import Base
 class Alerta(Base):
     __tablename__ = "alertas"
     
-    id = Column(Integer, primary_key=True, index=True)
-    encuesta_id = Column(Integer, ForeignKey("encuestas.id", ondelete="CASCADE"), nullable=False, unique=True)
+    id = Column(Integer, primary_key=True)
+    encuesta_id = Column(Integer, nullable=False, unique=True)
+    encuesta_created_at = Column(DateTime, nullable=False)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
     
     # Metadata de la alerta
+    # puntaje: puntaje bajo el umbral; deterioro: caída o descenso sostenido
+    tipo = Column(String(20), nullable=False, default="puntaje", server_default="puntaje")
     puntaje_obtenido = Column(Integer, nullable=False)
     prioridad = Column(String(10), default="media")  # alta, media
     
     # Estado
-    estado = Column(String(20), default="pendiente", index=True)  # pendiente, en_atencion, resuelta
+    estado = Column(String(20), default="pendiente")  # pendiente, en_atencion, resuelta
     
     # Atención
     atendida_por = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
@@ -25,6 +28,8 @@ class Alerta(Base):
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Marca de agua del caché condicional del dashboard
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
     
     # Relaciones
     encuesta = relationship("Encuesta", back_populates="alerta")
@@ -35,6 +40,21 @@ class Alerta(Base):
     __table_args__ = (
         CheckConstraint("prioridad IN ('alta', 'media')", name="check_prioridad"),
         CheckConstraint("estado IN ('pendiente', 'en_atencion', 'resuelta')", name="check_estado"),
+        CheckConstraint("tipo IN ('puntaje', 'deterioro')", name="check_tipo"),
+        # encuestas está particionada: la FK incluye la clave de partición
+        ForeignKeyConstraint(
+            ["encuesta_id", "encuesta_created_at"],
+            ["encuestas.id", "encuestas.created_at"],
+            ondelete="CASCADE",
+            name="fk_alertas_encuesta"
+        ),
+        # Bandeja de alertas activas ordenada por fecha
+        Index(
+            "ix_alertas_activas_created",
+            "created_at",
+            postgresql_where=text("estado <> 'resuelta'"),
+            sqlite_where=text("estado <> 'resuelta'")
+        ),
     )
     
     def __repr__(self):
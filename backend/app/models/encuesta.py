@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, CheckConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, CheckConstraint, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config.database import Base
@@ -6,18 +6,21 @@ from app.config.database import Base
 class Encuesta(Base):
     __tablename__ = "encuestas"
     
-    id = Column(Integer, primary_key=True, index=True)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+    # En PostgreSQL la tabla está particionada por semestre sobre created_at
+    # (migración 0003) y su PK física es (id, created_at); el mapper sigue
+    # identificando las filas solo por id, que la secuencia mantiene único
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False)
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     
     # Resultados WHO-5
     puntaje_raw = Column(Integer, nullable=True)  # 0-25
     puntaje_final = Column(Integer, nullable=True)  # 0-100
-    es_alerta = Column(Boolean, default=False, index=True)  # TRUE si < 13
+    es_alerta = Column(Boolean, default=False)  # TRUE si < 13
     
     # Comentarios opcionales
     comentario = Column(Text, nullable=True)
@@ -35,7 +38,17 @@ class Encuesta(Base):
         CheckConstraint("puntaje_raw >= 0 AND puntaje_raw <= 25", name="check_puntaje_raw"),
         CheckConstraint("puntaje_final >= 0 AND puntaje_final <= 100", name="check_puntaje_final"),
         CheckConstraint("estado IN ('completada', 'en_revision')", name="check_estado"),
+        # Agregados por período sobre encuestas completadas
+        Index(
+            "ix_encuestas_created_completadas",
+            "created_at",
+            postgresql_where=text("completed_at IS NOT NULL"),
+            sqlite_where=text("completed_at IS NOT NULL")
+        ),
     )
     
     def __repr__(self):
         return f"<Encuesta {self.id} - Usuario {self.usuario_id}>"
+
+# Historial y resultado anterior: usuario_id = ? ORDER BY created_at DESC
+Index("ix_encuestas_usuario_created", Encuesta.usuario_id, Encuesta.created_at.desc())
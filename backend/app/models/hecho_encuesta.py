@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, DateTime, Index
+from app.config.database import Base
+
+class HechoEncuesta(Base):
+    """
+    Tabla de hechos analíticos: una fila por encuesta completada, sin datos
+    personales
+
+    El usuario se identifica solo por un seudónimo (HMAC con una clave del
+    servidor) y las dimensiones son las de su perfil al responder. La
+    mantiene AnaliticaService de forma incremental y es lo único que leen
+    las rutas del rol analista. No tiene llave foránea a encuestas: los
+    hechos de los semestres archivados siguen aquí.
+    """
+    __tablename__ = "hechos_encuestas"
+
+    id = Column(Integer, primary_key=True)
+
+    # Linaje para el refresco incremental; las rutas no los exponen
+    encuesta_id = Column(Integer, nullable=False, unique=True)
+    encuesta_created_at = Column(DateTime, nullable=False, index=True)
+
+    seudonimo = Column(String(32), nullable=False, index=True)
+
+    # Dimensiones
+    tipo_usuario = Column(String(20), nullable=False)
+    programa = Column(String(100), nullable=True)
+    promocion = Column(String(10), nullable=True)
+    cargo = Column(String(100), nullable=True)
+    semestre = Column(String(6), nullable=False)  # Formato: 2024-1
+
+    # Respuestas (0-5), puntaje final (0-100) y alerta
+    p1 = Column(SmallInteger, nullable=True)
+    p2 = Column(SmallInteger, nullable=True)
+    p3 = Column(SmallInteger, nullable=True)
+    p4 = Column(SmallInteger, nullable=True)
+    p5 = Column(SmallInteger, nullable=True)
+    puntaje = Column(SmallInteger, nullable=False)
+    es_alerta = Column(Boolean, nullable=False)
+
+    __table_args__ = (
+        # Agregados por semestre filtrados o agrupados por programa y tipo
+        Index("ix_hechos_semestre_programa", "semestre", "programa"),
+        Index("ix_hechos_semestre_tipo", "semestre", "tipo_usuario"),
+    )
+
+    def __repr__(self):
+        return f"<HechoEncuesta {self.id} - {self.semestre}>"
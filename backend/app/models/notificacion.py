@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, CheckConstraint, Index, text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.config.database import Base
+
+class Notificacion(Base):
+    """
+    Bandeja de salida (outbox) de avisos de alertas por correo
+
+    La fila se escribe en la misma transacción que la Alerta; el envío lo
+    hace el despachador en segundo plano (NotificacionService).
+    """
+    __tablename__ = "notificaciones"
+    
+    id = Column(Integer, primary_key=True)
+    alerta_id = Column(Integer, ForeignKey("alertas.id", ondelete="CASCADE"), nullable=False)
+    
+    # alta: envío inmediato; media: resumen periódico
+    prioridad = Column(String(10), nullable=False, default="media")
+    
+    # Estado del envío
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente, enviada, fallida
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    enviada_at = Column(DateTime, nullable=True)
+    
+    # Relaciones
+    alerta = relationship("Alerta")
+    
+    # Constraints
+    __table_args__ = (
+        CheckConstraint("prioridad IN ('alta', 'media')", name="check_prioridad"),
+        CheckConstraint("estado IN ('pendiente', 'enviada', 'fallida')", name="check_estado"),
+        # Cola del despachador: pendientes por fecha de próximo intento
+        Index(
+            "ix_notificaciones_pendientes",
+            "proximo_intento",
+            postgresql_where=text("estado = 'pendiente'"),
+            sqlite_where=text("estado = 'pendiente'")
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<Notificacion {self.id} - Alerta {self.alerta_id} - Estado {self.estado}>"
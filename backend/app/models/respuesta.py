@@ -1,12 +1,15 @@
-from sqlalchemy import Column, Integer, ForeignKey, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKeyConstraint, CheckConstraint, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.config.database import Base
 
 class Respuesta(Base):
     __tablename__ = "respuestas"
     
-    id = Column(Integer, primary_key=True, index=True)
-    encuesta_id = Column(Integer, ForeignKey("encuestas.id", ondelete="CASCADE"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    # unique_encuesta_pregunta ya indexa encuesta_id como prefijo
+    encuesta_id = Column(Integer, nullable=False)
+    # Copia de encuestas.created_at: clave de partición en PostgreSQL
+    encuesta_created_at = Column(DateTime, nullable=False)
     pregunta_numero = Column(Integer, nullable=False)  # 1-5
     valor = Column(Integer, nullable=False)  # 0-5
     
@@ -17,7 +20,13 @@ class Respuesta(Base):
     __table_args__ = (
         CheckConstraint("pregunta_numero >= 1 AND pregunta_numero <= 5", name="check_pregunta_numero"),
         CheckConstraint("valor >= 0 AND valor <= 5", name="check_valor"),
-        UniqueConstraint("encuesta_id", "pregunta_numero", name="unique_encuesta_pregunta"),
+        UniqueConstraint("encuesta_id", "pregunta_numero", "encuesta_created_at", name="unique_encuesta_pregunta"),
+        ForeignKeyConstraint(
+            ["encuesta_id", "encuesta_created_at"],
+            ["encuestas.id", "encuestas.created_at"],
+            ondelete="CASCADE",
+            name="fk_respuestas_encuesta"
+        ),
     )
     
     def __repr__(self):
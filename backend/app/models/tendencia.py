@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, JSON
+from datetime import datetime
+from app.config.database import Base
+
+class TendenciaUsuario(Base):
+    """
+    Estado incremental de la tendencia de puntajes de un usuario
+
+    Se actualiza en O(1) con cada encuesta completada (TendenciaService) y
+    se puede recalcular sobre todo el historial con
+    `python -m app.scripts.tendencias recalcular`.
+    """
+    __tablename__ = "tendencias_usuario"
+    
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Encuestas completadas consideradas
+    n_encuestas = Column(Integer, nullable=False, default=0)
+    
+    # Media móvil exponencial (alfa = TENDENCIA_ALFA_EWMA)
+    ewma = Column(Float, nullable=True)
+    
+    # Últimos TENDENCIA_VENTANA puntajes, del más antiguo al más reciente,
+    # y pendiente de mínimos cuadrados sobre ellos (puntos por encuesta)
+    ultimos_puntajes = Column(JSON, nullable=False, default=list)
+    pendiente = Column(Float, nullable=False, default=0.0)
+    
+    # Descensos seguidos (cada puntaje menor que el anterior)
+    descensos_consecutivos = Column(Integer, nullable=False, default=0)
+    
+    ultima_encuesta_fecha = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TendenciaUsuario {self.usuario_id} - EWMA {self.ewma}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, CheckConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -24,7 +24,7 @@ class Usuario(Base):
     __tablename__ = "usuarios"
     
     # Identificación
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     tipo_usuario = Column(SQLEnum(TipoUsuario), nullable=False)
     nombres = Column(String(100), nullable=False)
     apellidos = Column(String(100), nullable=False)
@@ -56,13 +56,11 @@ class Usuario(Base):
     encuestas = relationship("Encuesta", back_populates="usuario", cascade="all, delete-orphan")
     alertas = relationship("Alerta", back_populates="usuario", foreign_keys="Alerta.usuario_id")
     
-    # Constraints
+    # Constraints (el dominio del correo depende de la institución: lo
+    # validan el registro y el aprovisionamiento)
     __table_args__ = (
-        CheckConstraint(
-            "correo_institucional LIKE '%@uniempresarial.edu.co' OR "
-            "correo_institucional LIKE '%@estudiantes.uniempresarial.edu.co'",
-            name="check_email_institucional"
-        ),
+        # Filtros del dashboard por tipo de usuario y programa
+        Index("ix_usuarios_tipo_programa", "tipo_usuario", "programa"),
     )
     
     def __repr__(self):
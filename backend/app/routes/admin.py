@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from app.models.usuario import Usuario
+from app.utils.security import require_role
+from app.utils.rate_limit import login_rate_limiter
+from app.utils.pool_metrics import estadisticas_pools
+
+router = APIRouter()
+
+@router.get("/metricas/login")
+async def metricas_login(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Intentos de login y rechazos por throttling (por worker)"""
+    return login_rate_limiter.metricas()
+
+@router.get("/metricas/pool")
+async def metricas_pool(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Estado y tiempos de espera de los pools de conexiones (por worker)"""
+    return estadisticas_pools()
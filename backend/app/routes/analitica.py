@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models.usuario import Usuario
+from app.services.analitica_service import AnaliticaService, DIMENSIONES
+from app.utils.security import require_role, get_read_db
+from app.utils.detector_consultas import presupuesto_consultas
+from app.utils.respuestas_json import json_directo
+
+router = APIRouter()
+
+# Solo leen hechos_encuestas: ninguna ruta del analista toca usuarios
+@router.get("/resumen")
+@presupuesto_consultas(2)
+async def resumen(
+    agrupar: str = "programa",
+    semestre: Optional[str] = None,
+    tipo_usuario: Optional[str] = None,
+    programa: Optional[str] = None,
+    current_user: Usuario = Depends(require_role(["analista"])),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Indicadores por dimensión sobre los hechos sin datos personales
+
+    Parámetros:
+    - agrupar: tipo_usuario, programa, promocion, cargo, semestre
+    - semestre (2024-1), tipo_usuario, programa: filtros opcionales
+
+    Los grupos con menos de ANALITICA_MIN_GRUPO personas se omiten.
+    """
+    if agrupar not in DIMENSIONES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"agrupar debe ser uno de: {', '.join(DIMENSIONES)}"
+        )
+    filtros = {"semestre": semestre, "tipo_usuario": tipo_usuario, "programa": programa}
+    return json_directo(await AnaliticaService.resumen(db, agrupar, filtros))
+
+@router.get("/hechos")
+# Usuario, la página y el tamaño de los grupos presentes en ella
+@presupuesto_consultas(3)
+async def listar_hechos(
+    semestre: Optional[str] = None,
+    tipo_usuario: Optional[str] = None,
+    programa: Optional[str] = None,
+    despues_de: Optional[int] = None,
+    limite: int = Query(1000, ge=1, le=5000),
+    current_user: Usuario = Depends(require_role(["analista"])),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Hechos por encuesta con seudónimo del usuario, para análisis propio
+
+    Paginación por cursor: pasar en despues_de el valor `siguiente` de la
+    página anterior. Los hechos de combinaciones (tipo, programa, promoción,
+    cargo, semestre) con menos de ANALITICA_MIN_GRUPO personas se omiten.
+    """
+    filtros = {"semestre": semestre, "tipo_usuario": tipo_usuario, "programa": programa}
+    return json_directo(await AnaliticaService.hechos(db, filtros, despues_de, limite))
@@ -1,86 +1,124 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.config.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import get_db, get_sync_db, marcar_escritura
 from app.schemas.usuario import EstudianteRegistro, PersonalRegistro, UsuarioResponse
 from app.services.auth_service import AuthService
+from app.services.provisioning_service import ProvisioningService
+from app.config.instituciones import institucion_actual
+from app.config.settings import settings
+from app.models.usuario import Usuario, TipoUsuario
+from app.utils.security import require_role
+from app.utils.rate_limit import login_rate_limiter, obtener_ip_cliente
+from app.utils.detector_consultas import presupuesto_consultas
 from typing import Dict
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-# Listas predefinidas
-PROGRAMAS = [
-    "Administración de Empresas",
-    "Administración Financiera",
-    "Contaduría Pública",
-    "Ingeniería de Sistemas",
-    "Ingeniería Industrial",
-    "Psicología",
-    "Derecho",
-    "Comunicación Social",
-    "Diseño Gráfico",
-    "Mercadeo y Publicidad"
-]
-
-CARGOS = [
-    "Docente Tiempo Completo",
-    "Docente Hora Cátedra",
-    "Coordinador Académico",
-    "Decano",
-    "Director de Programa",
-    "Psicólogo",
-    "Trabajador Social",
-    "Secretaria/o",
-    "Auxiliar Administrativo",
-    "Servicios Generales",
-    "Vigilancia",
-    "Biblioteca",
-    "Sistemas",
-    "Otro"
-]
-
 @router.post("/registro/estudiante", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED)
-def registrar_estudiante(data: EstudianteRegistro, db: Session = Depends(get_db)):
+async def registrar_estudiante(data: EstudianteRegistro, db: AsyncSession = Depends(get_db)):
     """Registra un nuevo estudiante"""
     
+    institucion = institucion_actual()
+    error = institucion.error_correo(data.correo_institucional, estudiante=True)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    
     # Validar programa
-    if data.programa not in PROGRAMAS:
+    if data.programa not in institucion.programas:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Programa no válido. Selecciona uno de la lista."
         )
     
-    usuario = AuthService.create_estudiante(db, data.dict())
+    usuario = await AuthService.create_estudiante(db, data.dict())
     return usuario
 
 @router.post("/registro/personal", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED)
-def registrar_personal(data: PersonalRegistro, db: Session = Depends(get_db)):
+async def registrar_personal(data: PersonalRegistro, db: AsyncSession = Depends(get_db)):
     """Registra un nuevo miembro del personal"""
     
+    institucion = institucion_actual()
+    error = institucion.error_correo(data.correo_institucional, estudiante=False)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    
     # Validar cargo
-    if data.cargo not in CARGOS:
+    if data.cargo not in institucion.cargos:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cargo no válido. Selecciona uno de la lista."
         )
     
-    usuario = AuthService.create_personal(db, data.dict())
+    usuario = await AuthService.create_personal(db, data.dict())
     return usuario
 
+@router.post("/provisionar/{tipo}")
+def provisionar_usuarios(
+    tipo: TipoUsuario,
+    archivo: UploadFile = File(...),
+    current_user: Usuario = Depends(require_role(["admin"])),
+    db: Session = Depends(get_sync_db)
+) -> Dict:
+    """
+    Aprovisiona en lote estudiantes o personal desde el roster CSV de registro
+
+    Solo rosters pequeños (PROVISIONAMIENTO_MAX_FILAS_API): se hashean en
+    este hilo, sin lanzar procesos desde el worker web. Los grandes se
+    cargan con python -m app.scripts.provisionar_usuarios.
+    """
+    
+    # Ruta sync a propósito: el job es CPU-bound y corre en el threadpool
+    
+    if tipo not in (TipoUsuario.ESTUDIANTE, TipoUsuario.PERSONAL):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Solo se pueden aprovisionar estudiantes o personal"
+        )
+    
+    crudo = archivo.file.read()
+    try:
+        contenido = crudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Exportaciones de Excel en Windows
+        contenido = crudo.decode("latin-1")
+    
+    filas = len(ProvisioningService.leer_csv(contenido))
+    if filas > settings.PROVISIONAMIENTO_MAX_FILAS_API:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=(
+                f"El roster tiene {filas} filas; por la API se aceptan hasta "
+                f"{settings.PROVISIONAMIENTO_MAX_FILAS_API}. Usa python -m app.scripts.provisionar_usuarios"
+            )
+        )
+    
+    resultado = ProvisioningService.provisionar(db, contenido, tipo, workers=1)
+    marcar_escritura(current_user.id)
+    
+    return resultado
+
+# Usuario + el UPDATE del rehash cuando el hash está fuera de la política
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)) -> Dict:
+@presupuesto_consultas(2)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)) -> Dict:
     """Login con correo y contraseña"""
     
-    usuario = AuthService.authenticate_user(db, form_data.username, form_data.password)
+    # Throttling antes de consultar la BD y de verificar bcrypt
+    await login_rate_limiter.verificar_async(form_data.username, obtener_ip_cliente(request))
+    
+    usuario = await AuthService.authenticate_user(db, form_data.username, form_data.password)
     
     # Crear token
     access_token = AuthService.create_access_token(
         data={
             "sub": usuario.correo_institucional,
             "id": usuario.id,
-            "rol": usuario.rol
+            "rol": usuario.rol,
+            "inst": institucion_actual().clave
         }
     )
     
@@ -98,11 +136,11 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @router.get("/programas")
-def listar_programas():
+async def listar_programas():
     """Lista los programas académicos disponibles"""
-    return {"programas": PROGRAMAS}
+    return {"programas": institucion_actual().programas}
 
 @router.get("/cargos")
-def listar_cargos():
+async def listar_cargos():
     """Lista los cargos disponibles para personal"""
-    return {"cargos": CARGOS}
+    return {"cargos": institucion_actual().cargos}
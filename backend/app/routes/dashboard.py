@@ -1,25 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_
-from datetime import datetime, timedelta
-from typing import Optional
-from app.config.database import get_db
-from app.models.usuario import Usuario
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, case, and_, select
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from app.config.database import get_db, marcar_escritura
+from app.config.settings import settings
+from app.models.usuario import Usuario, Rol
 from app.models.encuesta import Encuesta
 from app.models.alerta import Alerta
+from app.services.archivo_service import ArchivoService
+from app.services.busqueda_service import BusquedaService, FUENTES
 from app.services.export_service import ExportService
-from app.utils.security import require_role
+from app.services.marca_agua_service import MarcaAguaService
+from app.services.segmentos_service import SegmentosService
+from app.utils.security import require_role, get_read_db, get_sync_read_db
+from app.utils.detector_consultas import presupuesto_consultas
+from app.utils.respuestas_json import json_directo
+from app.utils.cache_http import calcular_etag, encabezados_cache, no_modificado, respuesta_no_modificada
 
 router = APIRouter()
 
+# Días de cada período del dashboard; cualquier otro valor es "all"
+PERIODOS = {"7d": 7, "30d": 30, "90d": 90}
+
+def _ventana_periodo(periodo: str) -> Tuple[str, datetime, Optional[datetime]]:
+    """
+    Período normalizado, instante actual y fecha de corte (None para "all")
+
+    Lo usan /metricas y /segmentos para que la ventana y su ETag coincidan.
+    """
+    ahora = datetime.utcnow()
+    if periodo not in PERIODOS:
+        return "all", ahora, None
+    return periodo, ahora, ahora - timedelta(days=PERIODOS[periodo])
+
 @router.get("/metricas")
-def obtener_metricas(
+@presupuesto_consultas(8)
+async def obtener_metricas(
+    request: Request,
     periodo: str = "30d",
     tipo_usuario: Optional[str] = None,
     programa: Optional[str] = None,
     current_user: Usuario = Depends(require_role(["admin", "psicologo", "analista"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene métricas del dashboard
@@ -28,61 +54,108 @@ def obtener_metricas(
     - periodo: 7d, 30d, 90d, all
     - tipo_usuario: estudiante, personal (opcional)
     - programa: Filtrar por programa (opcional)
+    
+    Para el analista rige ANALITICA_MIN_GRUPO como en /api/analitica: si
+    menos personas que ese mínimo respondieron en el grupo filtrado, 403
+    en lugar de sus indicadores.
     """
     
     # Calcular fecha de corte según período
-    if periodo == "7d":
-        fecha_desde = datetime.utcnow() - timedelta(days=7)
-    elif periodo == "30d":
-        fecha_desde = datetime.utcnow() - timedelta(days=30)
-    elif periodo == "90d":
-        fecha_desde = datetime.utcnow() - timedelta(days=90)
-    else:
-        fecha_desde = None
+    periodo, ahora, fecha_desde = _ventana_periodo(periodo)
+    suprimir_grupos_pequenos = current_user.rol == Rol.ANALISTA
     
-    # Base query
-    query_usuarios = db.query(Usuario)
-    query_encuestas = db.query(Encuesta)
+    # Caché condicional: si el cliente ya tiene esta versión, 304 sin
+    # ejecutar las agregaciones. Con período la ventana se desliza sin que
+    # cambien los datos, así que Last-Modified solo es exacto para "all"
+    marca = await MarcaAguaService.metricas(db, fecha_desde, ahora)
+    etag = calcular_etag("metricas", periodo, tipo_usuario, programa, suprimir_grupos_pequenos, marca)
+    ultima_modificacion = MarcaAguaService.ultima_modificacion(marca) if fecha_desde is None else None
+    if no_modificado(request, etag, ultima_modificacion):
+        return respuesta_no_modificada(etag, ultima_modificacion)
     
-    # Aplicar filtros
+    # Filtros de usuario (un solo join aunque se combinen tipo_usuario y programa)
+    filtros_usuario = []
     if tipo_usuario:
-        query_usuarios = query_usuarios.filter(Usuario.tipo_usuario == tipo_usuario)
-        query_encuestas = query_encuestas.join(Usuario).filter(Usuario.tipo_usuario == tipo_usuario)
-    
+        filtros_usuario.append(Usuario.tipo_usuario == tipo_usuario)
     if programa:
-        query_usuarios = query_usuarios.filter(Usuario.programa == programa)
-        query_encuestas = query_encuestas.join(Usuario).filter(Usuario.programa == programa)
+        filtros_usuario.append(Usuario.programa == programa)
     
+    query_encuestas = select(func.count(Encuesta.id))
+    if filtros_usuario:
+        query_encuestas = query_encuestas.join(Usuario).where(*filtros_usuario)
     if fecha_desde:
-        query_encuestas = query_encuestas.filter(Encuesta.created_at >= fecha_desde)
+        # La cota superior permite descartar las particiones futuras y la DEFAULT
+        query_encuestas = query_encuestas.where(Encuesta.created_at.between(fecha_desde, ahora))
     
     # Métricas
-    total_usuarios = query_usuarios.count()
-    total_encuestas = query_encuestas.count()
+    total_usuarios = (await db.execute(
+        select(func.count(Usuario.id)).where(*filtros_usuario)
+    )).scalar_one()
+    total_encuestas = (await db.execute(query_encuestas)).scalar_one()
+    
+    # Semestres archivados en Parquet (ver ArchivoService): se suman a los vivos
+    archivo = None
+    if ArchivoService.hay_archivo():
+        usuario_ids = None
+        if filtros_usuario:
+            usuario_ids = set((await db.execute(select(Usuario.id).where(*filtros_usuario))).scalars().all())
+        archivo = await run_in_threadpool(ArchivoService.metricas, fecha_desde, usuario_ids)
+        total_encuestas += archivo["total_encuestas"]
     
     # Tasa de participación
-    usuarios_han_respondido = query_usuarios.join(Encuesta).distinct().count()
+    if archivo is None:
+        usuarios_han_respondido = (await db.execute(
+            select(func.count(func.distinct(Usuario.id))).join(Encuesta).where(*filtros_usuario)
+        )).scalar_one()
+    else:
+        # Un usuario puede tener encuestas vivas y archivadas: se unen los ids
+        ids_vivos = (await db.execute(
+            select(Encuesta.usuario_id).distinct().join(Usuario).where(*filtros_usuario)
+        )).scalars().all()
+        usuarios_han_respondido = len(archivo["usuarios"].union(ids_vivos))
+    if suprimir_grupos_pequenos and usuarios_han_respondido < settings.ANALITICA_MIN_GRUPO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"El grupo tiene menos de {settings.ANALITICA_MIN_GRUPO} personas con encuestas; no se publica"
+        )
     tasa_participacion = (usuarios_han_respondido / total_usuarios * 100) if total_usuarios > 0 else 0
     
-    # Puntaje promedio
-    puntaje_promedio = db.query(func.avg(Encuesta.puntaje_final)).filter(
-        Encuesta.completed_at.isnot(None)
-    ).scalar() or 0
+    # Puntaje promedio y distribución de puntajes en una sola pasada (suma y
+    # conteo en vez de avg para poder combinarlos con el archivo)
+    distribucion = (await db.execute(
+        select(
+            func.sum(Encuesta.puntaje_final).label("suma"),
+            func.count(Encuesta.puntaje_final).label("n"),
+            func.sum(case((Encuesta.puntaje_final < 13, 1), else_=0)).label("alerta"),
+            func.sum(case((and_(Encuesta.puntaje_final >= 13, Encuesta.puntaje_final < 51), 1), else_=0)).label("bajo"),
+            func.sum(case((and_(Encuesta.puntaje_final >= 51, Encuesta.puntaje_final < 76), 1), else_=0)).label("medio"),
+            func.sum(case((Encuesta.puntaje_final >= 76, 1), else_=0)).label("alto")
+        ).where(Encuesta.completed_at.isnot(None))
+    )).one()
+    rangos = {clave: getattr(distribucion, clave) or 0 for clave in ("alerta", "bajo", "medio", "alto")}
+    suma_puntaje, n_puntaje = distribucion.suma or 0, distribucion.n
+    if archivo is not None:
+        rangos = {clave: valor + archivo[clave] for clave, valor in rangos.items()}
+        suma_puntaje += archivo["suma_puntaje"]
+        n_puntaje += archivo["n_puntaje"]
+    puntaje_promedio = float(suma_puntaje) / n_puntaje if n_puntaje else 0.0
     
     # Alertas
-    alertas_activas = db.query(Alerta).filter(Alerta.estado != "resuelta").count()
-    alertas_pendientes = db.query(Alerta).filter(Alerta.estado == "pendiente").count()
-    alertas_resueltas = db.query(Alerta).filter(Alerta.estado == "resuelta").count()
-    
-    # Distribución de puntajes
-    distribucion = db.query(
-        func.sum(case((Encuesta.puntaje_final < 13, 1), else_=0)).label("alerta"),
-        func.sum(case((and_(Encuesta.puntaje_final >= 13, Encuesta.puntaje_final < 51), 1), else_=0)).label("bajo"),
-        func.sum(case((and_(Encuesta.puntaje_final >= 51, Encuesta.puntaje_final < 76), 1), else_=0)).label("medio"),
-        func.sum(case((Encuesta.puntaje_final >= 76, 1), else_=0)).label("alto")
-    ).filter(Encuesta.completed_at.isnot(None)).first()
+    conteo_alertas = (await db.execute(
+        select(
+            func.sum(case((Alerta.estado != "resuelta", 1), else_=0)).label("activas"),
+            func.sum(case((Alerta.estado == "pendiente", 1), else_=0)).label("pendientes"),
+            func.sum(case((Alerta.estado == "resuelta", 1), else_=0)).label("resueltas")
+        )
+    )).one()
+    alertas_activas = conteo_alertas.activas or 0
+    alertas_pendientes = conteo_alertas.pendientes or 0
+    alertas_resueltas = conteo_alertas.resueltas or 0
+    if archivo is not None:
+        # Solo se archivan semestres con todas sus alertas resueltas
+        alertas_resueltas += archivo["alertas"]
     
-    return {
+    return json_directo({
         "total_usuarios": total_usuarios,
         "total_encuestas": total_encuestas,
         "tasa_participacion": round(tasa_participacion, 2),
@@ -93,66 +166,177 @@ def obtener_metricas(
             "resueltas": alertas_resueltas
         },
         "distribucion_puntajes": {
-            "alerta_0_12": distribucion.alerta or 0,
-            "bajo_13_50": distribucion.bajo or 0,
-            "medio_51_75": distribucion.medio or 0,
-            "alto_76_100": distribucion.alto or 0
+            "alerta_0_12": rangos["alerta"],
+            "bajo_13_50": rangos["bajo"],
+            "medio_51_75": rangos["medio"],
+            "alto_76_100": rangos["alto"]
         }
+    }, encabezados=encabezados_cache(etag, ultima_modificacion))
+
+@router.get("/segmentos")
+@presupuesto_consultas(5)
+async def obtener_segmentos(
+    request: Request,
+    periodo: str = "30d",
+    current_user: Usuario = Depends(require_role(["admin", "psicologo"])),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Métricas por segmento: participación, puntaje promedio, tasa de alerta
+    y distribución de puntajes por programa, promoción y cargo, con totales
+
+    Reemplaza una llamada a /metricas por cada programa. Todos los
+    indicadores (también la distribución) respetan el período. No está
+    abierta al analista: los segmentos pequeños no se suprimen; su vista
+    agregada es /api/analitica/resumen.
+
+    Parámetros:
+    - periodo: 7d, 30d, 90d, all
+    """
+    
+    periodo, ahora, fecha_desde = _ventana_periodo(periodo)
+    
+    # Misma marca de agua que /metricas: depende de encuestas, usuarios y archivo
+    marca = await MarcaAguaService.metricas(db, fecha_desde, ahora)
+    etag = calcular_etag("segmentos", periodo, marca)
+    ultima_modificacion = MarcaAguaService.ultima_modificacion(marca) if fecha_desde is None else None
+    if no_modificado(request, etag, ultima_modificacion):
+        return respuesta_no_modificada(etag, ultima_modificacion)
+    
+    segmentos = await SegmentosService.calcular(db, fecha_desde, ahora)
+    return json_directo(segmentos, encabezados=encabezados_cache(etag, ultima_modificacion))
+
+def _alerta_a_dict(alerta: Alerta) -> dict:
+    """Fila del listado de alertas (usuario ya cargado con contains_eager)"""
+    usuario = alerta.usuario
+    return {
+        "id": alerta.id,
+        "encuesta_id": alerta.encuesta_id,
+        "tipo": alerta.tipo,
+        "puntaje": alerta.puntaje_obtenido,
+        "prioridad": alerta.prioridad,
+        "estado": alerta.estado,
+        "usuario": {
+            "id": usuario.id,
+            "nombres": usuario.nombres,
+            "apellidos": usuario.apellidos,
+            "tipo_documento": usuario.tipo_documento,
+            "numero_documento": f"****{usuario.numero_documento[-4:]}",  # Últimos 4 dígitos
+            "tipo_usuario": usuario.tipo_usuario,
+            "programa": usuario.programa,
+            "cargo": usuario.cargo
+        },
+        "fecha_alerta": alerta.created_at,
+        "atendida_por": alerta.atendida_por,
+        "fecha_atencion": alerta.fecha_atencion,
+        "accion_tomada": alerta.accion_tomada
     }
 
 @router.get("/alertas")
-def listar_alertas(
+@presupuesto_consultas(3)
+async def listar_alertas(
+    request: Request,
     estado: str = "all",
     current_user: Usuario = Depends(require_role(["admin", "psicologo"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Lista las alertas del sistema
+    
+    Parámetros:
+    - estado: all, activas (no resueltas), pendiente, en_atencion, resuelta
+    """
+    
+    marca = await MarcaAguaService.alertas(db)
+    etag = calcular_etag("alertas", estado, marca)
+    ultima_modificacion = MarcaAguaService.ultima_modificacion(marca)
+    if no_modificado(request, etag, ultima_modificacion):
+        return respuesta_no_modificada(etag, ultima_modificacion)
+    
+    query = (
+        select(Alerta)
+        .join(Usuario, Alerta.usuario_id == Usuario.id)
+        .options(contains_eager(Alerta.usuario))
+    )
+    
+    if estado == "activas":
+        # Usa el índice parcial ix_alertas_activas_created
+        query = query.where(Alerta.estado != "resuelta")
+    elif estado != "all":
+        query = query.where(Alerta.estado == estado)
+    
+    result = await db.execute(query.order_by(Alerta.created_at.desc()).limit(100))
+    alertas = result.scalars().all()
+    
+    return json_directo(
+        [_alerta_a_dict(alerta) for alerta in alertas],
+        encabezados=encabezados_cache(etag, ultima_modificacion)
+    )
+
+@router.get("/busqueda")
+@presupuesto_consultas(3)
+async def buscar(
+    q: str,
+    fuente: str = "todas",
+    estado: Optional[str] = None,
+    programa: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    despues_de: Optional[str] = None,
+    limite: int = Query(20, ge=1, le=100),
+    current_user: Usuario = Depends(require_role(["admin", "psicologo"])),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Lista las alertas del sistema"""
-    
-    query = db.query(Alerta).join(Encuesta).join(Usuario)
-    
-    if estado != "all":
-        query = query.filter(Alerta.estado == estado)
-    
-    alertas = query.order_by(Alerta.created_at.desc()).limit(100).all()
-    
-    resultado = []
-    for alerta in alertas:
-        usuario = alerta.usuario
-        resultado.append({
-            "id": alerta.id,
-            "encuesta_id": alerta.encuesta_id,
-            "puntaje": alerta.puntaje_obtenido,
-            "prioridad": alerta.prioridad,
-            "estado": alerta.estado,
-            "usuario": {
-                "id": usuario.id,
-                "nombres": usuario.nombres,
-                "apellidos": usuario.apellidos,
-                "tipo_documento": usuario.tipo_documento,
-                "numero_documento": f"****{usuario.numero_documento[-4:]}",  # Últimos 4 dígitos
-                "tipo_usuario": usuario.tipo_usuario,
-                "programa": usuario.programa,
-                "cargo": usuario.cargo
-            },
-            "fecha_alerta": alerta.created_at,
-            "atendida_por": alerta.atendida_por,
-            "fecha_atencion": alerta.fecha_atencion,
-            "accion_tomada": alerta.accion_tomada
-        })
-    
-    return resultado
+    """
+    Busca en los comentarios de las encuestas y en las notas de atención
+    de las alertas
+
+    Parámetros:
+    - q: palabras a buscar (todas; cada una también como prefijo)
+    - fuente: todas, comentario, notas
+    - estado: pendiente, en_atencion, resuelta (estado de la alerta)
+    - programa: programa del usuario
+    - desde, hasta: fechas AAAA-MM-DD, ambas incluidas
+    - despues_de: cursor `siguiente` de la página anterior
+
+    Los resultados van del más reciente al más antiguo; en el fragmento
+    las coincidencias aparecen entre « y ».
+    """
+    if not BusquedaService.terminos(q):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La búsqueda debe tener al menos una palabra"
+        )
+    if fuente != "todas" and fuente not in FUENTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fuente debe ser todas o uno de: {', '.join(FUENTES)}"
+        )
+    try:
+        cursor = BusquedaService.leer_cursor(despues_de) if despues_de else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    
+    filtros = {
+        "estado": estado,
+        "programa": programa,
+        "desde": datetime.combine(desde, datetime.min.time()) if desde else None,
+        "hasta": datetime.combine(hasta + timedelta(days=1), datetime.min.time()) if hasta else None,
+    }
+    fuentes = FUENTES if fuente == "todas" else (fuente,)
+    return json_directo(await BusquedaService.buscar(db, q, fuentes, filtros, cursor, limite))
 
 @router.patch("/alertas/{alerta_id}/resolver")
-def resolver_alerta(
+async def resolver_alerta(
     alerta_id: int,
     accion_tomada: str,
     notas: Optional[str] = None,
     current_user: Usuario = Depends(require_role(["admin", "psicologo"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Marca una alerta como resuelta"""
     
-    alerta = db.query(Alerta).filter(Alerta.id == alerta_id).first()
+    alerta = await db.get(Alerta, alerta_id)
     
     if not alerta:
         raise HTTPException(
@@ -166,20 +350,24 @@ def resolver_alerta(
     alerta.accion_tomada = accion_tomada
     alerta.notas_psicologo = notas
     
-    db.commit()
+    await db.commit()
+    marcar_escritura(current_user.id)
     
     return {"message": "Alerta resuelta exitosamente"}
 
 @router.get("/export/excel")
+@presupuesto_consultas(5)
 def exportar_excel(
     tipo_usuario: Optional[str] = None,
     programa: Optional[str] = None,
     es_alerta: Optional[bool] = None,
     current_user: Usuario = Depends(require_role(["admin", "psicologo"])),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_sync_read_db)
 ):
     """Exporta encuestas a Excel"""
     
+    # Ruta sync a propósito: construir el libro es CPU-bound y corre en el threadpool
+    
     filtros = {}
     if tipo_usuario:
         filtros['tipo_usuario'] = tipo_usuario
@@ -1,23 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import List
-from app.config.database import get_db
+from app.config.database import get_db, marcar_escritura
 from app.models.usuario import Usuario
 from app.models.encuesta import Encuesta
 from app.models.respuesta import Respuesta
 from app.models.alerta import Alerta
+from app.models.notificacion import Notificacion
 from app.schemas.encuesta import EncuestaCreate, EncuestaResponse
 from app.services.who5_service import WHO5Service
-from app.utils.security import get_current_user
+from app.services.tendencia_service import TendenciaService
+from app.services.notificacion_service import despachador_notificaciones
+from app.config.settings import settings
+from app.utils.security import get_current_user, get_read_db
+from app.utils.detector_consultas import presupuesto_consultas
+from app.utils.respuestas_json import json_filas
 
 router = APIRouter()
 
+# Historial: solo las columnas de EncuestaResponse, sin hidratar objetos ORM
+COLUMNAS_HISTORIAL = [getattr(Encuesta, campo) for campo in EncuestaResponse.model_fields]
+
 @router.post("/consentimiento")
-def aceptar_consentimiento(
+async def aceptar_consentimiento(
     can_contact: bool = Query(False),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Registra el consentimiento informado del usuario"""
     
@@ -25,7 +35,8 @@ def aceptar_consentimiento(
     current_user.consent_date = datetime.utcnow()
     current_user.can_contact = can_contact
     
-    db.commit()
+    await db.commit()
+    marcar_escritura(current_user.id)
     
     return {
         "message": "Consentimiento registrado exitosamente",
@@ -33,10 +44,10 @@ def aceptar_consentimiento(
     }
 
 @router.post("/", response_model=EncuestaResponse, status_code=status.HTTP_201_CREATED)
-def crear_encuesta(
+async def crear_encuesta(
     data: EncuestaCreate,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Crea y completa una nueva encuesta WHO-5
@@ -57,47 +68,79 @@ def crear_encuesta(
     puntaje_final = WHO5Service.calcular_puntaje_final(puntaje_raw)
     es_alerta = WHO5Service.es_alerta(puntaje_final)
     
-    # Crear encuesta
+    # Crear encuesta; respuestas y alerta van por las relaciones para que el
+    # ORM copie (id, created_at) a sus FKs compuestas
+    ahora = datetime.utcnow()
     encuesta = Encuesta(
         usuario_id=current_user.id,
-        completed_at=datetime.utcnow(),
+        created_at=ahora,
+        completed_at=ahora,
         puntaje_raw=puntaje_raw,
         puntaje_final=puntaje_final,
         es_alerta=es_alerta,
         comentario=data.comentario,
-        estado="completada"
+        estado="completada",
+        respuestas=[
+            Respuesta(pregunta_numero=r.pregunta_numero, valor=r.valor)
+            for r in data.respuestas
+        ]
     )
     
-    db.add(encuesta)
-    db.flush()  # Para obtener el ID
-    
-    # Guardar respuestas
-    for respuesta_data in data.respuestas:
-        respuesta = Respuesta(
-            encuesta_id=encuesta.id,
-            pregunta_numero=respuesta_data.pregunta_numero,
-            valor=respuesta_data.valor
+    # Tendencia del usuario: actualización O(1) del estado guardado. El
+    # bloqueo de la fila (creada si falta) serializa dos encuestas
+    # simultáneas del mismo usuario, también la primera
+    tendencia = await TendenciaService.bloquear(db, current_user.id)
+    deterioro = TendenciaService.actualizar(tendencia, puntaje_final, ahora)
+    if deterioro and not es_alerta:
+        # Mientras la media móvil se ajusta, cada encuesta siguiente vuelve a
+        # parecer una caída: basta una alerta de deterioro abierta por usuario
+        abierta = await db.execute(
+            select(Alerta.id).where(
+                Alerta.usuario_id == current_user.id,
+                Alerta.tipo == "deterioro",
+                Alerta.estado != "resuelta"
+            ).limit(1)
         )
-        db.add(respuesta)
+        if abierta.first() is not None:
+            deterioro = None
     
-    # Crear alerta si es necesario
+    # Crear alerta si es necesario (una por encuesta: el puntaje bajo el
+    # umbral tiene prioridad sobre el deterioro)
     if es_alerta:
-        alerta = Alerta(
-            encuesta_id=encuesta.id,
+        encuesta.alerta = Alerta(
             usuario_id=current_user.id,
+            tipo="puntaje",
             puntaje_obtenido=puntaje_final,
             prioridad="alta" if puntaje_final < 10 else "media",
             estado="pendiente"
         )
-        db.add(alerta)
+    elif deterioro:
+        encuesta.alerta = Alerta(
+            usuario_id=current_user.id,
+            tipo="deterioro",
+            puntaje_obtenido=puntaje_final,
+            prioridad="media",
+            estado="pendiente"
+        )
     
-    db.commit()
-    db.refresh(encuesta)
+    # Aviso por correo: la fila de la bandeja de salida se confirma junto
+    # con la alerta y el envío ocurre en segundo plano
+    notificacion = None
+    if encuesta.alerta is not None and settings.NOTIFICACIONES_ACTIVAS:
+        notificacion = Notificacion(alerta=encuesta.alerta, prioridad=encuesta.alerta.prioridad)
+        db.add(notificacion)
+    
+    db.add(encuesta)
+    await db.commit()
+    await db.refresh(encuesta)
+    marcar_escritura(current_user.id)
+    if notificacion is not None and notificacion.prioridad == "alta":
+        despachador_notificaciones.despertar()
     
     return encuesta
 
 @router.get("/preguntas")
-def obtener_preguntas():
+async def obtener_preguntas():
     """Obtiene las 5 preguntas del WHO-5"""
     return {
         "instrumento": "WHO-5",
@@ -106,30 +149,37 @@ def obtener_preguntas():
     }
 
 @router.get("/mis-encuestas", response_model=List[EncuestaResponse])
-def obtener_mis_encuestas(
+@presupuesto_consultas(2)
+async def obtener_mis_encuestas(
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtiene el historial de encuestas del usuario actual"""
     
-    encuestas = db.query(Encuesta).filter(
-        Encuesta.usuario_id == current_user.id
-    ).order_by(Encuesta.created_at.desc()).all()
+    result = await db.execute(
+        select(*COLUMNAS_HISTORIAL).where(
+            Encuesta.usuario_id == current_user.id
+        ).order_by(Encuesta.created_at.desc())
+    )
     
-    return encuestas
+    return json_filas(result.all())
 
 @router.get("/{encuesta_id}/resultado")
-def obtener_resultado(
+@presupuesto_consultas(3)
+async def obtener_resultado(
     encuesta_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Obtiene el resultado detallado de una encuesta"""
     
-    encuesta = db.query(Encuesta).filter(
-        Encuesta.id == encuesta_id,
-        Encuesta.usuario_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Encuesta).where(
+            Encuesta.id == encuesta_id,
+            Encuesta.usuario_id == current_user.id
+        )
+    )
+    encuesta = result.scalars().first()
     
     if not encuesta:
         raise HTTPException(
@@ -141,11 +191,14 @@ def obtener_resultado(
     clasificacion = WHO5Service.clasificar_bienestar(encuesta.puntaje_final)
     
     # Verificar cambio significativo si hay encuesta anterior
-    encuesta_anterior = db.query(Encuesta).filter(
-        Encuesta.usuario_id == current_user.id,
-        Encuesta.id < encuesta_id,
-        Encuesta.completed_at.isnot(None)
-    ).order_by(Encuesta.created_at.desc()).first()
+    result = await db.execute(
+        select(Encuesta).where(
+            Encuesta.usuario_id == current_user.id,
+            Encuesta.id < encuesta_id,
+            Encuesta.completed_at.isnot(None)
+        ).order_by(Encuesta.created_at.desc()).limit(1)
+    )
+    encuesta_anterior = result.scalars().first()
     
     cambio_significativo = None
     if encuesta_anterior:
@@ -0,0 +1,28 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.config.settings import settings
+from app.utils.metricas_compartidas import metricas_compartidas
+from app.utils.metricas_http import exponer_prometheus
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metricas_prometheus(authorization: Optional[str] = Header(None)):
+    """
+    Métricas en formato de texto de Prometheus: las de este proceso, o la
+    suma de todos los workers con gunicorn (METRICAS_DIRECTORIO)
+
+    Si METRICAS_TOKEN está definido se exige `Authorization: Bearer <token>`
+    (credencial del scraper, distinta de los JWT de usuarios).
+    """
+    if settings.METRICAS_TOKEN:
+        esperado = f"Bearer {settings.METRICAS_TOKEN}"
+        if not authorization or not secrets.compare_digest(authorization, esperado):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token de métricas inválido"
+            )
+    texto = metricas_compartidas.exponer() if metricas_compartidas.directorio else exponer_prometheus()
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4")
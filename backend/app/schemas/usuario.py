@@ -14,10 +14,9 @@ class EstudianteRegistro(BaseModel):
     programa: str
     promocion: str  # Formato: 2024-1
     
+    # El dominio depende de la institución: lo valida la ruta (Institucion.error_correo)
     @validator('correo_institucional')
-    def validar_correo_estudiante(cls, v):
-        if not v.endswith('@estudiantes.uniempresarial.edu.co'):
-            raise ValueError('Debes usar tu correo institucional de estudiante')
+    def normalizar_correo(cls, v):
         return v.lower()
     
     @validator('promocion')
@@ -50,12 +49,9 @@ class PersonalRegistro(BaseModel):
     password: str = Field(..., min_length=8)
     cargo: str
     
+    # El dominio depende de la institución: lo valida la ruta (Institucion.error_correo)
     @validator('correo_institucional')
-    def validar_correo_personal(cls, v):
-        if not v.endswith('@uniempresarial.edu.co'):
-            raise ValueError('Debes usar tu correo institucional')
-        if v.endswith('@estudiantes.uniempresarial.edu.co'):
-            raise ValueError('Este correo es de estudiante. Usa el registro de estudiantes.')
+    def normalizar_correo(cls, v):
         return v.lower()
     
     @validator('password')
@@ -0,0 +1 @@
+# Scripts de línea de comandos
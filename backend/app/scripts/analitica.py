@@ -0,0 +1,42 @@
+"""
+Tabla de hechos analíticos sin datos personales (rol analista)
+
+Uso:
+    python -m app.scripts.analitica refrescar
+    python -m app.scripts.analitica reconstruir
+
+`refrescar` agrega los hechos de las encuestas nuevas (lo mismo que hace
+el hilo de fondo cada ANALITICA_REFRESCO_SEGUNDOS). `reconstruir` los
+recalcula todos desde las encuestas vivas y archivadas: hay que ejecutarlo
+después de aplicar la migración 0008 y al cambiar ANALITICA_CLAVE_SEUDONIMO.
+"""
+import argparse
+import sys
+import time
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.services.analitica_service import AnaliticaService
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hechos analíticos sin datos personales")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("refrescar", help="Agrega los hechos de las encuestas nuevas")
+    comandos.add_parser("reconstruir", help="Recalcula todos los hechos (vivos y archivados)")
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+
+    inicio = time.perf_counter()
+    with motores().engine.begin() as conn:
+        if args.comando == "refrescar":
+            hechos = AnaliticaService.refrescar(conn)
+        else:
+            hechos = AnaliticaService.reconstruir(conn)
+    print(f"Hechos insertados: {hechos} en {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
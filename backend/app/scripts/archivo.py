@@ -0,0 +1,88 @@
+"""
+Archivo en frío de semestres cerrados en Parquet
+
+Uso:
+    python -m app.scripts.archivo listar
+    python -m app.scripts.archivo archivar [2023-1 2023-2 ...]
+    python -m app.scripts.archivo restaurar 2023-1
+    python -m app.scripts.archivo verificar
+
+`archivar` sin semestres archiva todos los cerrados anteriores a los
+ARCHIVO_SEMESTRES_VIVOS más recientes; puede programarse en cron al
+cerrar cada semestre. Un semestre con alertas sin resolver se omite.
+`verificar` comprueba los checksums de todos los archivos del manifiesto.
+"""
+import argparse
+import json
+import sys
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.scripts.particiones import _semestre
+from app.services.archivo_service import ArchivoService
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archivo en Parquet de semestres cerrados")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar", help="Muestra el manifiesto del archivo")
+    archivar = comandos.add_parser("archivar", help="Archiva semestres cerrados")
+    archivar.add_argument("semestres", nargs="*", type=_semestre, help="AAAA-S (por defecto, todos los archivables)")
+    restaurar = comandos.add_parser("restaurar", help="Devuelve un semestre archivado a la base de datos")
+    restaurar.add_argument("semestre", type=_semestre, help="AAAA-S")
+    comandos.add_parser("verificar", help="Comprueba los checksums de los archivos")
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+    engine = motores().engine
+
+    if args.comando == "listar":
+        print(json.dumps(ArchivoService.leer_manifiesto(), indent=2, ensure_ascii=False))
+        return 0
+
+    if args.comando == "verificar":
+        errores = 0
+        for clave, entrada in ArchivoService.leer_manifiesto()["semestres"].items():
+            try:
+                ArchivoService.verificar_semestre(clave, entrada)
+                print(f"{clave}: OK")
+            except ValueError as e:
+                print(f"{clave}: {e}", file=sys.stderr)
+                errores += 1
+        return 1 if errores else 0
+
+    if args.comando == "restaurar":
+        anio, semestre = args.semestre
+        try:
+            restauradas = ArchivoService.restaurar_semestre(anio, semestre)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        print(f"{anio}-{semestre} restaurado: " + ", ".join(f"{t}={n}" for t, n in restauradas.items()))
+        return 0
+
+    semestres = args.semestres
+    if not semestres:
+        with engine.connect() as conn:
+            semestres = ArchivoService.semestres_archivables(conn)
+        if not semestres:
+            print("No hay semestres para archivar")
+            return 0
+
+    errores = 0
+    for anio, semestre in semestres:
+        try:
+            entrada = ArchivoService.archivar_semestre(anio, semestre)
+        except ValueError as e:
+            print(f"{anio}-{semestre}: {e}", file=sys.stderr)
+            errores += 1
+            continue
+        tablas = entrada["tablas"]
+        print(f"{anio}-{semestre} archivado: " + ", ".join(
+            f"{t}={a['filas']} filas/{a['bytes']} bytes" for t, a in tablas.items()
+        ))
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
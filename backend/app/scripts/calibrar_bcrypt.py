@@ -0,0 +1,55 @@
+"""
+Calibración del costo bcrypt y benchmark de verificación
+
+Uso:
+    python -m app.scripts.calibrar_bcrypt --objetivo-ms 250 --segundos 3
+
+Imprime el tiempo de hash por costo, el costo recomendado para
+BCRYPT_ROUNDS y el throughput de verificación por núcleo y total.
+"""
+import argparse
+import json
+import sys
+from app.config.settings import settings
+from app.utils.bcrypt_policy import benchmark_verify, calibrar_rounds, medir_hash_ms
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Calibra el costo bcrypt para este host")
+    parser.add_argument("--objetivo-ms", type=float, default=settings.BCRYPT_OBJETIVO_MS)
+    parser.add_argument("--segundos", type=float, default=3.0, help="Duración del benchmark por proceso")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del benchmark (por defecto uno por CPU)")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args(argv)
+
+    recomendado = calibrar_rounds(args.objetivo_ms)
+    tiempos = {
+        rounds: round(medir_hash_ms(rounds), 1)
+        for rounds in range(settings.BCRYPT_ROUNDS_MIN, min(recomendado + 1, settings.BCRYPT_ROUNDS_MAX) + 1)
+    }
+    benchmark = benchmark_verify(recomendado, args.segundos, args.procesos)
+
+    resultado = {
+        "objetivo_ms": args.objetivo_ms,
+        "ms_por_hash": tiempos,
+        "rounds_recomendado": recomendado,
+        "rounds_configurado": settings.BCRYPT_ROUNDS,
+        "benchmark": benchmark
+    }
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+        return 0
+
+    print(f"Objetivo: {args.objetivo_ms:.0f} ms por hash")
+    for rounds, ms in tiempos.items():
+        print(f"  rounds={rounds:2d}  {ms:8.1f} ms")
+    print(f"Recomendado: BCRYPT_ROUNDS={recomendado} (configurado: {settings.BCRYPT_ROUNDS})")
+    print(
+        f"Verificación con rounds={recomendado}: {benchmark['ms_por_verificacion']} ms, "
+        f"{benchmark['verificaciones_por_segundo_por_nucleo']}/s por núcleo, "
+        f"{benchmark['verificaciones_por_segundo_total']}/s con {benchmark['procesos']} procesos"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
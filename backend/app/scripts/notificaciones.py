@@ -0,0 +1,63 @@
+"""
+Bandeja de salida de notificaciones de alertas
+
+Uso:
+    python -m app.scripts.notificaciones estado
+    python -m app.scripts.notificaciones despachar
+    python -m app.scripts.notificaciones reintentar
+
+`despachar` hace una pasada del despachador (la app ya lo ejecuta en
+segundo plano con NOTIFICACIONES_ACTIVAS=true); sirve para cron o para
+probar la configuración SMTP. `reintentar` devuelve las fallidas a la
+cola con los intentos en cero.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from sqlalchemy import update
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.models.notificacion import Notificacion
+from app.services.notificacion_service import DespachadorNotificaciones, despachador_notificaciones
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Notificaciones de alertas por correo")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("estado", help="Notificaciones por estado")
+    comandos.add_parser("despachar", help="Envía ahora las notificaciones vencidas")
+    comandos.add_parser("reintentar", help="Vuelve a encolar las notificaciones fallidas")
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.comando == "despachar":
+        try:
+            enviadas = despachador_notificaciones.despachar_institucion()
+        finally:
+            despachador_notificaciones.conexion.cerrar()
+        print(f"Notificaciones enviadas: {enviadas}")
+        print(json.dumps(despachador_notificaciones.metricas(), indent=2))
+        return 0
+
+    db = motores().SessionLocal()
+    try:
+        if args.comando == "reintentar":
+            resultado = db.execute(
+                update(Notificacion)
+                .where(Notificacion.estado == "fallida")
+                .values(estado="pendiente", intentos=0, proximo_intento=datetime.utcnow())
+            )
+            db.commit()
+            print(f"Notificaciones reencoladas: {resultado.rowcount}")
+            return 0
+        print(json.dumps(DespachadorNotificaciones.conteo(db), indent=2))
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Mantenimiento de las particiones por semestre (PostgreSQL)
+
+Uso:
+    python -m app.scripts.particiones listar
+    python -m app.scripts.particiones asegurar [--semestres-adelante 2]
+    python -m app.scripts.particiones desvincular 2023-1
+
+`asegurar` es idempotente y puede programarse en cron además de la
+ejecución al arrancar la app. `desvincular` separa las particiones de un
+semestre: quedan como tablas sueltas para archivarlas o eliminarlas.
+"""
+import argparse
+import json
+import sys
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.config.settings import settings
+from app.services.particiones_service import ParticionesService
+
+def _semestre(valor: str):
+    try:
+        anio, semestre = valor.split("-")
+        anio, semestre = int(anio), int(semestre)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Formato esperado AAAA-S, por ejemplo 2023-1")
+    if semestre not in (1, 2):
+        raise argparse.ArgumentTypeError("El semestre debe ser 1 o 2")
+    return anio, semestre
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Particiones por semestre de encuestas y respuestas")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar", help="Lista las particiones existentes")
+    asegurar = comandos.add_parser("asegurar", help="Crea las particiones faltantes")
+    asegurar.add_argument("--semestres-adelante", type=int, default=settings.PARTICIONES_SEMESTRES_ADELANTE)
+    desvincular = comandos.add_parser("desvincular", help="Separa las particiones de un semestre")
+    desvincular.add_argument("semestre", type=_semestre, help="AAAA-S")
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+    engine = motores().engine
+
+    if args.comando == "listar":
+        with engine.connect() as conn:
+            print(json.dumps(ParticionesService.listar_particiones(conn), indent=2))
+        return 0
+
+    if args.comando == "asegurar":
+        creadas = ParticionesService.asegurar(args.semestres_adelante)
+        print("Particiones creadas: " + (", ".join(creadas) if creadas else "ninguna"))
+        return 0
+
+    anio, semestre = args.semestre
+    try:
+        with engine.begin() as conn:
+            tablas = ParticionesService.desvincular_semestre(conn, anio, semestre)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print("Tablas separadas: " + ", ".join(tablas))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Aprovisionamiento masivo de usuarios desde un roster CSV
+
+Uso:
+    python -m app.scripts.provisionar_usuarios roster.csv --tipo estudiante \\
+        --reporte errores.csv --credenciales credenciales.csv
+"""
+import argparse
+import csv
+import sys
+import time
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.models.usuario import TipoUsuario
+from app.services.provisioning_service import ProvisioningService
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Aprovisiona usuarios desde un roster CSV")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    parser.add_argument("archivo", help="Ruta del CSV del registro académico")
+    parser.add_argument("--tipo", choices=["estudiante", "personal"], required=True)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para el hash de contraseñas")
+    parser.add_argument("--reporte", default="reporte_errores.csv", help="Ruta del reporte de errores")
+    parser.add_argument("--credenciales", default=None, help="Ruta donde guardar las contraseñas generadas")
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.archivo, encoding="utf-8-sig", newline="") as f:
+        contenido = f.read()
+
+    inicio = time.perf_counter()
+    db = motores().SessionLocal()
+    try:
+        resultado = ProvisioningService.provisionar(db, contenido, TipoUsuario(args.tipo), args.workers)
+    finally:
+        db.close()
+    duracion = time.perf_counter() - inicio
+
+    with open(args.reporte, "w", encoding="utf-8", newline="") as f:
+        f.write(ProvisioningService.reporte_errores_csv(resultado["errores"]))
+
+    if resultado["credenciales"]:
+        ruta = args.credenciales or "credenciales_iniciales.csv"
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["correo", "password"])
+            for c in resultado["credenciales"]:
+                escritor.writerow([c["correo"], c["password"]])
+        print(f"Credenciales iniciales: {ruta}")
+
+    print(
+        f"Filas: {resultado['total_filas']} | Creados: {resultado['creados']} | "
+        f"Con errores: {resultado['con_errores']} | {duracion:.1f}s"
+    )
+    print(f"Reporte de errores: {args.reporte}")
+    return 0 if resultado["con_errores"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Estado de tendencia por usuario (alertas de deterioro)
+
+Uso:
+    python -m app.scripts.tendencias recalcular
+    python -m app.scripts.tendencias mostrar 123
+
+`recalcular` calcula en un solo paso vectorizado el estado de todos los
+usuarios sobre su historial completo y reemplaza el guardado. Hay que
+ejecutarlo después de aplicar la migración 0005 y al cambiar
+TENDENCIA_ALFA_EWMA o TENDENCIA_VENTANA; no crea alertas retroactivas.
+"""
+import argparse
+import json
+import sys
+import time
+from sqlalchemy import select
+from app.config.database import motores
+from app.config.instituciones import fijar_institucion
+from app.models.tendencia import TendenciaUsuario
+from app.services.tendencia_service import TendenciaService
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tendencias longitudinales por usuario")
+    parser.add_argument("--institucion", metavar="CLAVE", help="Clave de la institución (por defecto la predeterminada)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("recalcular", help="Recalcula el estado de todos los usuarios desde su historial")
+    mostrar = comandos.add_parser("mostrar", help="Muestra el estado guardado de un usuario")
+    mostrar.add_argument("usuario_id", type=int)
+    args = parser.parse_args(argv)
+    try:
+        fijar_institucion(args.institucion)
+    except ValueError as e:
+        parser.error(str(e))
+    engine = motores().engine
+
+    if args.comando == "mostrar":
+        with engine.connect() as conn:
+            fila = conn.execute(
+                select(TendenciaUsuario.__table__).where(TendenciaUsuario.usuario_id == args.usuario_id)
+            ).first()
+        if fila is None:
+            print(f"El usuario {args.usuario_id} no tiene estado de tendencia", file=sys.stderr)
+            return 1
+        print(json.dumps(dict(fila._mapping), indent=2, default=str))
+        return 0
+
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        usuarios = TendenciaService.recalcular(conn)
+    print(f"Tendencias recalculadas: {usuarios} usuarios en {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+import hashlib
+import hmac
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, case, delete, exists, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import motores
+from app.config.instituciones import INSTITUCIONES, institucion_actual, usar_institucion
+from app.config.settings import settings
+from app.models.encuesta import Encuesta
+from app.models.hecho_encuesta import HechoEncuesta
+from app.models.respuesta import Respuesta
+from app.models.usuario import Usuario
+from app.services.archivo_service import ArchivoService
+from app.services.particiones_service import ParticionesService
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock (la segunda mitad es la institución: las de un
+# mismo servidor con esquema propio no se bloquean entre sí)
+LOCK_ANALITICA = 503_002
+
+# Una encuesta se inserta con created_at de antes del commit: el refresco
+# vuelve a mirar este margen hacia atrás y el anti-join evita duplicados
+MARGEN_INCREMENTAL = timedelta(minutes=15)
+
+FILAS_POR_LOTE = 5000
+PREGUNTAS = ("p1", "p2", "p3", "p4", "p5")
+
+# Dimensiones por las que se puede agrupar y filtrar
+DIMENSIONES = {
+    "tipo_usuario": HechoEncuesta.tipo_usuario,
+    "programa": HechoEncuesta.programa,
+    "promocion": HechoEncuesta.promocion,
+    "cargo": HechoEncuesta.cargo,
+    "semestre": HechoEncuesta.semestre,
+}
+
+@lru_cache(maxsize=1)
+def _clave_seudonimo() -> bytes:
+    if settings.ANALITICA_CLAVE_SEUDONIMO:
+        return settings.ANALITICA_CLAVE_SEUDONIMO.encode()
+    # Derivada: el SECRET_KEY no se usa tal cual fuera de los tokens
+    return hmac.new(settings.SECRET_KEY.encode(), b"seudonimo-analitica", hashlib.sha256).digest()
+
+class AnaliticaService:
+    """
+    Hechos analíticos sin datos personales (tabla hechos_encuestas)
+
+    Cada encuesta completada se copia una vez con el seudónimo de su
+    usuario, tipo, programa, promoción, cargo, semestre, las cinco
+    respuestas, el puntaje y la alerta. El refresco es incremental: toma
+    las encuestas creadas desde el último hecho (menos un margen) que aún
+    no tienen hecho. Al archivar un semestre sus hechos se conservan;
+    reconstruir los vuelve a calcular desde las tablas vivas y el archivo.
+
+    El seudónimo es estable por usuario e institución, así que permite
+    seguir a una persona entre semestres sin saber quién es.
+    """
+
+    @staticmethod
+    def seudonimo(usuario_id: int, institucion: Optional[str] = None) -> str:
+        clave = institucion or institucion_actual().clave
+        return hmac.new(_clave_seudonimo(), f"{clave}:{usuario_id}".encode(), hashlib.sha256).hexdigest()[:32]
+
+    @staticmethod
+    def semestre(fecha: datetime) -> str:
+        anio, semestre = ParticionesService.semestre_de(fecha)
+        return f"{anio}-{semestre}"
+
+    @staticmethod
+    def _registros(filas: Iterable) -> List[Dict]:
+        """Filas (encuesta, usuario y respuestas) a registros de hechos"""
+        clave = institucion_actual().clave
+        registros = []
+        for fila in filas:
+            tipo = fila.tipo_usuario
+            registros.append({
+                "encuesta_id": int(fila.encuesta_id),
+                "encuesta_created_at": fila.created_at,
+                "seudonimo": AnaliticaService.seudonimo(int(fila.usuario_id), clave),
+                "tipo_usuario": getattr(tipo, "value", tipo),
+                "programa": fila.programa,
+                "promocion": fila.promocion,
+                "cargo": fila.cargo,
+                "semestre": AnaliticaService.semestre(fila.created_at),
+                **{p: None if getattr(fila, p) is None else int(getattr(fila, p)) for p in PREGUNTAS},
+                "puntaje": int(fila.puntaje_final),
+                "es_alerta": bool(fila.es_alerta),
+            })
+        return registros
+
+    @staticmethod
+    def _consulta_vivas(desde: Optional[datetime]):
+        """Encuestas completadas sin hecho, con su usuario y respuestas pivotadas"""
+        columnas = [
+            Encuesta.id.label("encuesta_id"), Encuesta.created_at, Encuesta.usuario_id,
+            Encuesta.puntaje_final, Encuesta.es_alerta,
+            Usuario.tipo_usuario, Usuario.programa, Usuario.promocion, Usuario.cargo,
+        ]
+        query = (
+            select(*columnas, *[
+                func.max(case((Respuesta.pregunta_numero == n, Respuesta.valor))).label(p)
+                for n, p in enumerate(PREGUNTAS, start=1)
+            ])
+            .join(Usuario, Usuario.id == Encuesta.usuario_id)
+            .outerjoin(Respuesta, and_(
+                Respuesta.encuesta_id == Encuesta.id,
+                Respuesta.encuesta_created_at == Encuesta.created_at,
+            ))
+            .where(
+                Encuesta.completed_at.isnot(None),
+                Encuesta.puntaje_final.isnot(None),
+                ~exists().where(HechoEncuesta.encuesta_id == Encuesta.id),
+            )
+            .group_by(*columnas)
+        )
+        if desde is not None:
+            query = query.where(Encuesta.created_at >= desde)
+        return query
+
+    @staticmethod
+    def _insertar_vivas(conn: Connection, desde: Optional[datetime]) -> int:
+        # Cursor del lado del servidor: la primera carga puede ser de años
+        resultado = conn.execute(
+            AnaliticaService._consulta_vivas(desde),
+            execution_options={"stream_results": True, "yield_per": FILAS_POR_LOTE},
+        )
+        total = 0
+        for lote in resultado.partitions():
+            registros = AnaliticaService._registros(lote)
+            conn.execute(insert(HechoEncuesta), registros)
+            total += len(registros)
+        return total
+
+    @staticmethod
+    def _bloquear(conn: Connection, esperar: bool) -> bool:
+        """Advisory lock de la transacción; sin esperar, False si otro lo tiene"""
+        if conn.dialect.name != "postgresql":
+            return True
+        funcion = "pg_advisory_xact_lock" if esperar else "pg_try_advisory_xact_lock"
+        obtenido = conn.execute(
+            text(f"SELECT {funcion}(:clave, hashtext(:institucion))"),
+            {"clave": LOCK_ANALITICA, "institucion": institucion_actual().clave},
+        ).scalar()
+        return obtenido is not False
+
+    @staticmethod
+    def refrescar(conn: Connection) -> int:
+        """
+        Agrega los hechos de las encuestas nuevas, en la transacción de `conn`
+
+        En PostgreSQL, si otro proceso está refrescando la misma
+        institución no hace nada (lo hará ese proceso).
+
+        Returns:
+            Hechos insertados
+        """
+        if not AnaliticaService._bloquear(conn, esperar=False):
+            return 0
+        ultimo = conn.execute(select(func.max(HechoEncuesta.encuesta_created_at))).scalar()
+        return AnaliticaService._insertar_vivas(conn, None if ultimo is None else ultimo - MARGEN_INCREMENTAL)
+
+    @staticmethod
+    def _archivadas():
+        """
+        DataFrame de las encuestas archivadas con las respuestas pivotadas
+        (None si no hay), con None en lugar de NaN en las preguntas sin
+        respuesta, como en las filas vivas
+        """
+        encuestas = ArchivoService.leer(
+            "encuestas", ["id", "usuario_id", "created_at", "completed_at", "puntaje_final", "es_alerta"]
+        )
+        if encuestas is None or encuestas.empty:
+            return None
+        encuestas = encuestas[encuestas["completed_at"].notna() & encuestas["puntaje_final"].notna()]
+        respuestas = ArchivoService.leer("respuestas", ["encuesta_id", "pregunta_numero", "valor"])
+        if respuestas is not None and not respuestas.empty:
+            pivote = respuestas.pivot_table(
+                index="encuesta_id", columns="pregunta_numero", values="valor", aggfunc="max"
+            ).rename(columns=lambda n: f"p{n}")
+            encuestas = encuestas.merge(pivote, left_on="id", right_index=True, how="left")
+        for p in PREGUNTAS:
+            if p not in encuestas:
+                encuestas[p] = None
+            else:
+                encuestas[p] = encuestas[p].astype(object).where(encuestas[p].notna(), None)
+        return encuestas.rename(columns={"id": "encuesta_id"})
+
+    @staticmethod
+    def reconstruir(conn: Connection) -> int:
+        """
+        Reemplaza todos los hechos por los calculados desde las encuestas
+        vivas y archivadas, en una transacción
+
+        Las dimensiones salen del perfil actual de cada usuario; las
+        encuestas archivadas de usuarios eliminados no se incluyen.
+
+        Returns:
+            Hechos insertados
+        """
+        # pandas solo en la reconstrucción (script), no en las rutas
+        import pandas as pd
+
+        AnaliticaService._bloquear(conn, esperar=True)
+        conn.execute(delete(HechoEncuesta))
+
+        total = 0
+        archivadas = AnaliticaService._archivadas()
+        if archivadas is not None:
+            usuarios = pd.read_sql(
+                select(Usuario.id.label("usuario_id"), Usuario.tipo_usuario, Usuario.programa,
+                       Usuario.promocion, Usuario.cargo),
+                conn,
+            )
+            archivadas = archivadas.merge(usuarios, on="usuario_id", how="inner")
+            archivadas["created_at"] = pd.to_datetime(archivadas["created_at"])
+            for inicio in range(0, len(archivadas), FILAS_POR_LOTE):
+                lote = archivadas.iloc[inicio:inicio + FILAS_POR_LOTE]
+                registros = AnaliticaService._registros(lote.itertuples(index=False))
+                for registro in registros:
+                    registro["encuesta_created_at"] = registro["encuesta_created_at"].to_pydatetime()
+                conn.execute(insert(HechoEncuesta), registros)
+                total += len(registros)
+
+        # Las vivas que ya estén en el archivo (restauradas) no se duplican
+        return total + AnaliticaService._insertar_vivas(conn, None)
+
+    @staticmethod
+    def _filtros(query, filtros: Dict[str, Optional[str]]):
+        for nombre, valor in filtros.items():
+            if valor is not None:
+                query = query.where(DIMENSIONES[nombre] == valor)
+        return query
+
+    @staticmethod
+    async def resumen(db: AsyncSession, agrupar: str, filtros: Dict[str, Optional[str]]) -> Dict:
+        """
+        Indicadores por valor de la dimensión `agrupar`
+
+        Los grupos con menos de ANALITICA_MIN_GRUPO personas distintas se
+        omiten (solo se informa cuántos fueron) para que un grupo pequeño no
+        delate las respuestas de alguien.
+        """
+        dimension = DIMENSIONES[agrupar]
+        query = AnaliticaService._filtros(
+            select(
+                dimension.label("valor"),
+                func.count(func.distinct(HechoEncuesta.seudonimo)).label("personas"),
+                func.count().label("encuestas"),
+                func.avg(HechoEncuesta.puntaje).label("puntaje_promedio"),
+                func.sum(case((HechoEncuesta.es_alerta, 1), else_=0)).label("alertas"),
+                *[func.avg(getattr(HechoEncuesta, p)).label(p) for p in PREGUNTAS],
+            ).group_by(dimension).order_by(dimension),
+            filtros,
+        )
+        filas = (await db.execute(query)).all()
+
+        minimo = settings.ANALITICA_MIN_GRUPO
+        grupos = []
+        suprimidos = 0
+        for fila in filas:
+            if fila.personas < minimo:
+                suprimidos += 1
+                continue
+            grupos.append({
+                "valor": fila.valor,
+                "personas": fila.personas,
+                "encuestas": fila.encuestas,
+                "puntaje_promedio": round(float(fila.puntaje_promedio), 1),
+                "tasa_alerta": round(100 * fila.alertas / fila.encuestas, 1),
+                "promedio_preguntas": {
+                    p: None if getattr(fila, p) is None else round(float(getattr(fila, p)), 2) for p in PREGUNTAS
+                },
+            })
+        return {"agrupar": agrupar, "minimo_grupo": minimo, "grupos": grupos, "grupos_suprimidos": suprimidos}
+
+    @staticmethod
+    async def _personas_por_grupo(
+        db: AsyncSession, filtros: Dict[str, Optional[str]], semestres: Iterable[str]
+    ) -> Dict[tuple, int]:
+        """Personas distintas por combinación de dimensiones en los semestres dados"""
+        query = AnaliticaService._filtros(
+            select(*DIMENSIONES.values(), func.count(func.distinct(HechoEncuesta.seudonimo)).label("personas"))
+            .where(HechoEncuesta.semestre.in_(sorted(semestres)))
+            .group_by(*DIMENSIONES.values()),
+            filtros,
+        )
+        return {tuple(fila[:len(DIMENSIONES)]): fila.personas for fila in (await db.execute(query)).all()}
+
+    @staticmethod
+    async def hechos(
+        db: AsyncSession, filtros: Dict[str, Optional[str]], despues_de: Optional[int], limite: int
+    ) -> Dict:
+        """
+        Hechos individuales (seudonimizados) paginados por id
+
+        Las dimensiones de un hecho (tipo, programa, promoción, cargo y
+        semestre) son casi identificadores: combinadas pueden señalar a una
+        sola persona. Se omiten los hechos cuya combinación tiene menos de
+        ANALITICA_MIN_GRUPO personas en el semestre, igual que en resumen.
+
+        Returns:
+            Dict con los hechos, los omitidos en la página y el cursor
+            `siguiente` (None en la última página)
+        """
+        query = AnaliticaService._filtros(
+            select(
+                HechoEncuesta.id, HechoEncuesta.seudonimo, *DIMENSIONES.values(),
+                *[getattr(HechoEncuesta, p) for p in PREGUNTAS],
+                HechoEncuesta.puntaje, HechoEncuesta.es_alerta,
+            ),
+            filtros,
+        )
+        if despues_de is not None:
+            query = query.where(HechoEncuesta.id > despues_de)
+        filas = (await db.execute(query.order_by(HechoEncuesta.id).limit(limite + 1))).all()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+
+        minimo = settings.ANALITICA_MIN_GRUPO
+        personas = {}
+        if filas:
+            personas = await AnaliticaService._personas_por_grupo(db, filtros, {fila.semestre for fila in filas})
+        hechos = [
+            fila._asdict() for fila in filas
+            if personas.get(tuple(getattr(fila, nombre) for nombre in DIMENSIONES), 0) >= minimo
+        ]
+        return {
+            "hechos": hechos,
+            "minimo_grupo": minimo,
+            "hechos_suprimidos": len(filas) - len(hechos),
+            # El cursor avanza también sobre los omitidos
+            "siguiente": filas[-1].id if hay_mas else None,
+        }
+
+class RefrescoAnalitica:
+    """
+    Refresca los hechos de cada institución en un hilo de fondo
+
+    Cada worker tiene su hilo; el advisory lock hace que solo uno trabaje a
+    la vez por institución.
+    """
+
+    def __init__(self, intervalo_segundos: float):
+        self.intervalo_segundos = intervalo_segundos
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def refrescar(self) -> int:
+        """Una pasada por todas las instituciones; devuelve los hechos insertados"""
+        insertados = 0
+        for clave in INSTITUCIONES:
+            with usar_institucion(clave):
+                try:
+                    with motores().engine.begin() as conn:
+                        insertados += AnaliticaService.refrescar(conn)
+                except Exception:
+                    logger.exception("Error refrescando los hechos analíticos de %s", clave)
+        return insertados
+
+    def iniciar(self) -> None:
+        if self.intervalo_segundos <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="analitica", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+
+    def _ejecutar(self) -> None:
+        while not self._detener.is_set():
+            self.refrescar()
+            self._detener.wait(self.intervalo_segundos)
+
+refresco_analitica = RefrescoAnalitica(intervalo_segundos=settings.ANALITICA_REFRESCO_SEGUNDOS)
@@ -0,0 +1,413 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import Boolean, DateTime, Integer, delete, func, insert, select, text
+from sqlalchemy.engine import Connection
+from app.config.database import motores
+from app.config.instituciones import PREDETERMINADA, institucion_actual
+from app.config.settings import settings
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.respuesta import Respuesta
+from app.services.particiones_service import ParticionesService
+
+logger = logging.getLogger(__name__)
+
+# Orden de escritura; la restauración inserta en este orden y el borrado
+# recorre el inverso
+TABLAS = {
+    "encuestas": Encuesta.__table__,
+    "respuestas": Respuesta.__table__,
+    "alertas": Alerta.__table__,
+}
+
+# Columna que ubica cada fila en el semestre de su encuesta
+COLUMNA_SEMESTRE = {
+    "encuestas": "created_at",
+    "respuestas": "encuesta_created_at",
+    "alertas": "encuesta_created_at",
+}
+
+MANIFIESTO = "manifest.json"
+FILAS_POR_LOTE = 10_000
+
+# Cachés por proceso y por directorio (institución), invalidadas por el
+# mtime del manifiesto
+_lock = threading.Lock()
+_cache_manifiesto: Dict[str, Dict] = {}
+_cache_encuestas: Dict[str, Dict] = {}
+
+def _esquema_arrow(tabla):
+    """Esquema Parquet explícito: todos los archivos comparten tipos aunque haya nulos"""
+    import pyarrow as pa
+
+    campos = []
+    for columna in tabla.columns:
+        if isinstance(columna.type, Integer):
+            tipo = pa.int64()
+        elif isinstance(columna.type, Boolean):
+            tipo = pa.bool_()
+        elif isinstance(columna.type, DateTime):
+            tipo = pa.timestamp("us")
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(columna.name, tipo, nullable=columna.nullable))
+    return pa.schema(campos)
+
+def _sha256(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+class ArchivoService:
+    """
+    Archivo en frío de semestres cerrados en Parquet comprimido
+
+    ARCHIVO_DIRECTORIO/
+        manifest.json
+        2023_1/encuestas.parquet, respuestas.parquet, alertas.parquet
+        <clave>/manifest.json, ...   (las demás instituciones)
+
+    El manifiesto es la fuente de verdad de qué está archivado: rango del
+    semestre, filas, bytes y sha256 de cada archivo. Un semestre está o en
+    la base de datos o en el archivo, nunca en ambos. pyarrow y pandas se
+    importan al usarse para no encarecer el arranque de los workers.
+    """
+
+    @staticmethod
+    def directorio() -> str:
+        """Directorio del archivo de la institución actual"""
+        institucion = institucion_actual()
+        if institucion.clave == PREDETERMINADA.clave:
+            return settings.ARCHIVO_DIRECTORIO
+        return os.path.join(settings.ARCHIVO_DIRECTORIO, institucion.clave)
+
+    @staticmethod
+    def _ruta(*partes: str) -> str:
+        return os.path.join(ArchivoService.directorio(), *partes)
+
+    @staticmethod
+    def leer_manifiesto() -> Dict:
+        """Manifiesto actual (no modificar el dict devuelto: está cacheado)"""
+        ruta = ArchivoService._ruta(MANIFIESTO)
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except FileNotFoundError:
+            return {"version": 1, "semestres": {}}
+        with _lock:
+            cache = _cache_manifiesto.setdefault(ArchivoService.directorio(), {"mtime": None, "datos": None})
+            if cache["mtime"] != mtime:
+                with open(ruta, encoding="utf-8") as f:
+                    cache.update(mtime=mtime, datos=json.load(f))
+            return cache["datos"]
+
+    @staticmethod
+    def _guardar_manifiesto(datos: Dict) -> None:
+        os.makedirs(ArchivoService.directorio(), exist_ok=True)
+        ruta = ArchivoService._ruta(MANIFIESTO)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def hay_archivo(desde: Optional[datetime] = None) -> bool:
+        """True si hay semestres archivados con datos posteriores a `desde`"""
+        semestres = ArchivoService.leer_manifiesto()["semestres"].values()
+        if desde is None:
+            return bool(semestres)
+        return any(datetime.fromisoformat(s["hasta"]) > desde for s in semestres)
+
+    @staticmethod
+    def semestres_archivables(conn: Connection) -> List[Tuple[int, int]]:
+        """Semestres cerrados con datos más antiguos que los ARCHIVO_SEMESTRES_VIVOS recientes"""
+        primera = conn.execute(select(func.min(Encuesta.created_at))).scalar()
+        if primera is None:
+            return []
+        limite = ParticionesService.semestre_de(datetime.utcnow())
+        for _ in range(settings.ARCHIVO_SEMESTRES_VIVOS):
+            anio, semestre = limite
+            limite = (anio, 1) if semestre == 2 else (anio - 1, 2)
+
+        archivados = ArchivoService.leer_manifiesto()["semestres"]
+        resultado = []
+        actual = ParticionesService.semestre_de(primera)
+        while actual < limite:
+            if f"{actual[0]}_{actual[1]}" not in archivados:
+                resultado.append(actual)
+            actual = ParticionesService.semestre_siguiente(*actual)
+        return resultado
+
+    @staticmethod
+    def _escribir_parquet(conn: Connection, nombre: str, desde: datetime, hasta: datetime, directorio: str) -> Dict:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabla = TABLAS[nombre]
+        columna = tabla.c[COLUMNA_SEMESTRE[nombre]]
+        esquema = _esquema_arrow(tabla)
+        ruta = os.path.join(directorio, f"{nombre}.parquet")
+        temporal = ruta + ".tmp"
+
+        resultado = conn.execute(
+            select(tabla).where(columna >= desde, columna < hasta).order_by(tabla.c.id),
+            execution_options={"yield_per": FILAS_POR_LOTE}
+        )
+        filas = 0
+        with pq.ParquetWriter(temporal, esquema, compression=settings.ARCHIVO_COMPRESION) as escritor:
+            for lote in resultado.mappings().partitions():
+                escritor.write_table(pa.Table.from_pylist([dict(f) for f in lote], schema=esquema))
+                filas += len(lote)
+        os.replace(temporal, ruta)
+
+        return {
+            "archivo": os.path.relpath(ruta, ArchivoService.directorio()),
+            "filas": filas,
+            "bytes": os.path.getsize(ruta),
+            "sha256": _sha256(ruta),
+        }
+
+    @staticmethod
+    def _eliminar_filas(conn: Connection, anio: int, semestre: int) -> None:
+        desde, hasta = ParticionesService.rango_semestre(anio, semestre)
+        conn.execute(delete(Alerta.__table__).where(
+            Alerta.encuesta_created_at >= desde, Alerta.encuesta_created_at < hasta
+        ))
+        particiones = {p["particion"] for p in ParticionesService.listar_particiones(conn)}
+        if ParticionesService.nombre_particion("encuestas", anio, semestre) in particiones:
+            # Con particiones basta separar y eliminar las tablas del semestre
+            for tabla in ParticionesService.desvincular_semestre(conn, anio, semestre):
+                conn.execute(text(f"DROP TABLE {tabla}"))
+            return
+        conn.execute(delete(Respuesta.__table__).where(
+            Respuesta.encuesta_created_at >= desde, Respuesta.encuesta_created_at < hasta
+        ))
+        conn.execute(delete(Encuesta.__table__).where(
+            Encuesta.created_at >= desde, Encuesta.created_at < hasta
+        ))
+
+    @staticmethod
+    def archivar_semestre(anio: int, semestre: int) -> Dict:
+        """
+        Escribe el semestre en Parquet, lo registra en el manifiesto y
+        elimina las filas vivas, todo dentro de una transacción
+
+        Solo se archivan semestres cerrados y sin alertas abiertas (la
+        bandeja de alertas solo lee filas vivas). Si algo falla se revierte
+        la transacción y se descartan los archivos y la entrada del manifiesto.
+
+        Raises:
+            ValueError: si el semestre no se puede archivar
+        """
+        clave = f"{anio}_{semestre}"
+        manifiesto = json.loads(json.dumps(ArchivoService.leer_manifiesto()))
+        if clave in manifiesto["semestres"]:
+            raise ValueError(f"El semestre {anio}-{semestre} ya está archivado")
+
+        desde, hasta = ParticionesService.rango_semestre(anio, semestre)
+        inicio_actual, _ = ParticionesService.rango_semestre(*ParticionesService.semestre_de(datetime.utcnow()))
+        if hasta > inicio_actual:
+            raise ValueError(f"El semestre {anio}-{semestre} no está cerrado")
+
+        directorio = ArchivoService._ruta(clave)
+        manifiesto_guardado = False
+        try:
+            with motores().engine.begin() as conn:
+                abiertas = conn.execute(select(func.count(Alerta.id)).where(
+                    Alerta.encuesta_created_at >= desde,
+                    Alerta.encuesta_created_at < hasta,
+                    Alerta.estado != "resuelta"
+                )).scalar()
+                if abiertas:
+                    raise ValueError(f"Hay {abiertas} alertas sin resolver en el semestre {anio}-{semestre}")
+
+                os.makedirs(directorio, exist_ok=True)
+                archivos = {
+                    nombre: ArchivoService._escribir_parquet(conn, nombre, desde, hasta, directorio)
+                    for nombre in TABLAS
+                }
+                if not archivos["encuestas"]["filas"]:
+                    raise ValueError(f"El semestre {anio}-{semestre} no tiene encuestas")
+
+                entrada = {
+                    "desde": desde.isoformat(),
+                    "hasta": hasta.isoformat(),
+                    "archivado_en": datetime.utcnow().isoformat(timespec="seconds"),
+                    "compresion": settings.ARCHIVO_COMPRESION,
+                    "tablas": archivos,
+                }
+                manifiesto["semestres"][clave] = entrada
+                ArchivoService._guardar_manifiesto(manifiesto)
+                manifiesto_guardado = True
+
+                ArchivoService._eliminar_filas(conn, anio, semestre)
+        except Exception:
+            if manifiesto_guardado:
+                del manifiesto["semestres"][clave]
+                ArchivoService._guardar_manifiesto(manifiesto)
+            shutil.rmtree(directorio, ignore_errors=True)
+            raise
+
+        logger.info("Semestre %s archivado: %s", clave, {n: a["filas"] for n, a in archivos.items()})
+        return entrada
+
+    @staticmethod
+    def restaurar_semestre(anio: int, semestre: int) -> Dict[str, int]:
+        """
+        Reinserta un semestre archivado en la base de datos y lo quita del archivo
+
+        Returns:
+            Filas restauradas por tabla
+        """
+        import pyarrow.parquet as pq
+
+        clave = f"{anio}_{semestre}"
+        manifiesto = json.loads(json.dumps(ArchivoService.leer_manifiesto()))
+        entrada = manifiesto["semestres"].get(clave)
+        if not entrada:
+            raise ValueError(f"El semestre {anio}-{semestre} no está archivado")
+        ArchivoService.verificar_semestre(clave, entrada)
+
+        restauradas = {}
+        with motores().engine.begin() as conn:
+            desde, _ = ParticionesService.rango_semestre(anio, semestre)
+            ParticionesService.asegurar_particiones(conn, 0, desde=desde)
+            for nombre, tabla in TABLAS.items():
+                archivo = pq.ParquetFile(ArchivoService._ruta(entrada["tablas"][nombre]["archivo"]))
+                restauradas[nombre] = 0
+                for lote in archivo.iter_batches(batch_size=FILAS_POR_LOTE):
+                    filas = lote.to_pylist()
+                    if filas:
+                        conn.execute(insert(tabla), filas)
+                        restauradas[nombre] += len(filas)
+
+        del manifiesto["semestres"][clave]
+        ArchivoService._guardar_manifiesto(manifiesto)
+        shutil.rmtree(ArchivoService._ruta(clave), ignore_errors=True)
+        logger.info("Semestre %s restaurado: %s", clave, restauradas)
+        return restauradas
+
+    @staticmethod
+    def verificar_semestre(clave: str, entrada: Dict) -> None:
+        """Comprueba que los archivos existen y su sha256 coincide con el manifiesto"""
+        for nombre, archivo in entrada["tablas"].items():
+            ruta = ArchivoService._ruta(archivo["archivo"])
+            if not os.path.exists(ruta):
+                raise ValueError(f"Falta {ruta} del semestre {clave}")
+            if _sha256(ruta) != archivo["sha256"]:
+                raise ValueError(f"El checksum de {ruta} no coincide con el manifiesto")
+
+    @staticmethod
+    def leer(nombre: str, columnas: Optional[List[str]] = None, filtro=None):
+        """
+        DataFrame con las filas archivadas de una tabla (None si no hay archivo)
+
+        `filtro` es una expresión de pyarrow.dataset que se empuja a la
+        lectura (proyección de columnas y estadísticas de row groups).
+        """
+        import pyarrow.dataset as ds
+
+        semestres = ArchivoService.leer_manifiesto()["semestres"].values()
+        rutas = [ArchivoService._ruta(s["tablas"][nombre]["archivo"]) for s in semestres]
+        if not rutas:
+            return None
+        dataset = ds.dataset(rutas, schema=_esquema_arrow(TABLAS[nombre]), format="parquet")
+        return dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+
+    @staticmethod
+    def _encuestas_archivadas():
+        """Columnas de encuestas que usan las métricas, cacheadas por versión del manifiesto"""
+        directorio = ArchivoService.directorio()
+        mtime = _cache_manifiesto[directorio]["mtime"] if ArchivoService.hay_archivo() else None
+        with _lock:
+            cache = _cache_encuestas.setdefault(directorio, {"mtime": None, "df": None})
+            if cache["mtime"] == mtime and cache["df"] is not None:
+                return cache["df"]
+        df = ArchivoService.leer("encuestas", ["usuario_id", "created_at", "completed_at", "puntaje_final"])
+        with _lock:
+            cache.update(mtime=mtime, df=df)
+        return df
+
+    @staticmethod
+    def encuestas_archivadas(fecha_desde: Optional[datetime] = None):
+        """Encuestas archivadas (usuario_id, fechas y puntaje) creadas desde `fecha_desde`"""
+        df = ArchivoService._encuestas_archivadas()
+        if df is None or fecha_desde is None:
+            return df
+        return df[df["created_at"] >= fecha_desde]
+
+    @staticmethod
+    def metricas(fecha_desde: Optional[datetime] = None, usuario_ids: Optional[Set[int]] = None) -> Dict:
+        """
+        Agregados de las encuestas archivadas para combinar con los vivos
+
+        total_encuestas y usuarios respetan el período y el filtro de
+        usuarios, como sus equivalentes en vivo; la distribución y el
+        promedio se calculan sobre todas las completadas.
+        """
+        df = ArchivoService._encuestas_archivadas()
+        resumen = {
+            "total_encuestas": 0, "usuarios": set(), "suma_puntaje": 0, "n_puntaje": 0,
+            "alerta": 0, "bajo": 0, "medio": 0, "alto": 0, "alertas": 0,
+        }
+        if df is None or df.empty:
+            return resumen
+
+        filtrado = df
+        if usuario_ids is not None:
+            filtrado = filtrado[filtrado["usuario_id"].isin(usuario_ids)]
+        resumen["usuarios"] = set(filtrado["usuario_id"].unique().tolist())
+        if fecha_desde is not None:
+            filtrado = filtrado[filtrado["created_at"] >= fecha_desde]
+        resumen["total_encuestas"] = int(len(filtrado))
+
+        puntajes = df.loc[df["completed_at"].notna(), "puntaje_final"].dropna()
+        resumen["suma_puntaje"] = int(puntajes.sum())
+        resumen["n_puntaje"] = int(puntajes.count())
+        resumen["alerta"] = int((puntajes < 13).sum())
+        resumen["bajo"] = int(((puntajes >= 13) & (puntajes < 51)).sum())
+        resumen["medio"] = int(((puntajes >= 51) & (puntajes < 76)).sum())
+        resumen["alto"] = int((puntajes >= 76).sum())
+
+        # Solo se archivan alertas resueltas
+        resumen["alertas"] = sum(
+            s["tablas"]["alertas"]["filas"] for s in ArchivoService.leer_manifiesto()["semestres"].values()
+        )
+        return resumen
+
+    @staticmethod
+    def filas_exportacion(usuario_ids: Optional[Set[int]] = None, es_alerta: Optional[bool] = None):
+        """
+        Encuestas archivadas con sus 5 respuestas en columnas y el estado de
+        la alerta, ordenadas de la más reciente a la más antigua
+        """
+        encuestas = ArchivoService.leer("encuestas")
+        if encuestas is None or encuestas.empty:
+            return None
+        if usuario_ids is not None:
+            encuestas = encuestas[encuestas["usuario_id"].isin(usuario_ids)]
+        if es_alerta is not None:
+            encuestas = encuestas[encuestas["es_alerta"] == es_alerta]
+
+        respuestas = ArchivoService.leer("respuestas", ["encuesta_id", "pregunta_numero", "valor"])
+        pivote = respuestas.pivot(index="encuesta_id", columns="pregunta_numero", values="valor").astype("Int64")
+        pivote.columns = [f"pregunta_{n}" for n in pivote.columns]
+        alertas = ArchivoService.leer("alertas", ["encuesta_id", "estado"]).rename(
+            columns={"encuesta_id": "alerta_encuesta_id", "estado": "estado_alerta"}
+        )
+
+        filas = (
+            encuestas
+            .merge(pivote, left_on="id", right_index=True, how="left")
+            .merge(alertas, left_on="id", right_on="alerta_encuesta_id", how="left")
+            .sort_values("created_at", ascending=False)
+        )
+        # Nulos de pandas (NaN, NaT, <NA>) como None para escribirlos tal cual
+        return filas.astype(object).where(filas.notna(), None)
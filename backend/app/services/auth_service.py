@@ -2,11 +2,16 @@ from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.usuario import Usuario, TipoUsuario
 from app.config.settings import settings
+from app.services.last_login_service import last_login_buffer
+from app.utils.bcrypt_policy import aplicar_politica
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+aplicar_politica(pwd_context, settings.BCRYPT_ROUNDS)
 
 class AuthService:
     
@@ -30,23 +35,26 @@ class AuthService:
         return encoded_jwt
     
     @staticmethod
-    def create_estudiante(db: Session, data: dict) -> Usuario:
+    async def create_estudiante(db: AsyncSession, data: dict) -> Usuario:
         """Crea usuario tipo estudiante"""
         
         # Verificar si el correo ya existe
-        if db.query(Usuario).filter(Usuario.correo_institucional == data['correo_institucional']).first():
+        if (await db.execute(select(Usuario.id).where(Usuario.correo_institucional == data['correo_institucional']))).first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Este correo ya está registrado"
             )
         
         # Verificar si el documento ya existe
-        if db.query(Usuario).filter(Usuario.numero_documento == data['numero_documento']).first():
+        if (await db.execute(select(Usuario.id).where(Usuario.numero_documento == data['numero_documento']))).first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Este documento ya está registrado"
             )
         
+        # bcrypt es CPU-bound: fuera del event loop
+        password_hash = await run_in_threadpool(AuthService.get_password_hash, data['password'])
+        
         # Crear usuario
         usuario = Usuario(
             tipo_usuario=TipoUsuario.ESTUDIANTE,
@@ -55,36 +63,39 @@ class AuthService:
             tipo_documento=data['tipo_documento'],
             numero_documento=data['numero_documento'],
             correo_institucional=data['correo_institucional'],
-            password_hash=AuthService.get_password_hash(data['password']),
+            password_hash=password_hash,
             programa=data['programa'],
             promocion=data['promocion'],
             rol="user"
         )
         
         db.add(usuario)
-        db.commit()
-        db.refresh(usuario)
+        await db.commit()
+        await db.refresh(usuario)
         
         return usuario
     
     @staticmethod
-    def create_personal(db: Session, data: dict) -> Usuario:
+    async def create_personal(db: AsyncSession, data: dict) -> Usuario:
         """Crea usuario tipo personal"""
         
         # Verificar si el correo ya existe
-        if db.query(Usuario).filter(Usuario.correo_institucional == data['correo_institucional']).first():
+        if (await db.execute(select(Usuario.id).where(Usuario.correo_institucional == data['correo_institucional']))).first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Este correo ya está registrado"
             )
         
         # Verificar si el documento ya existe
-        if db.query(Usuario).filter(Usuario.numero_documento == data['numero_documento']).first():
+        if (await db.execute(select(Usuario.id).where(Usuario.numero_documento == data['numero_documento']))).first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Este documento ya está registrado"
             )
         
+        # bcrypt es CPU-bound: fuera del event loop
+        password_hash = await run_in_threadpool(AuthService.get_password_hash, data['password'])
+        
         # Crear usuario
         usuario = Usuario(
             tipo_usuario=TipoUsuario.PERSONAL,
@@ -93,21 +104,22 @@ class AuthService:
             tipo_documento=data['tipo_documento'],
             numero_documento=data['numero_documento'],
             correo_institucional=data['correo_institucional'],
-            password_hash=AuthService.get_password_hash(data['password']),
+            password_hash=password_hash,
             cargo=data['cargo'],
             rol="user"
         )
         
         db.add(usuario)
-        db.commit()
-        db.refresh(usuario)
+        await db.commit()
+        await db.refresh(usuario)
         
         return usuario
     
     @staticmethod
-    def authenticate_user(db: Session, correo: str, password: str) -> Usuario:
+    async def authenticate_user(db: AsyncSession, correo: str, password: str) -> Usuario:
         """Autentica usuario"""
-        usuario = db.query(Usuario).filter(Usuario.correo_institucional == correo).first()
+        result = await db.execute(select(Usuario).where(Usuario.correo_institucional == correo))
+        usuario = result.scalars().first()
         
         if not usuario:
             raise HTTPException(
@@ -115,7 +127,8 @@ class AuthService:
                 detail="Correo o contraseña incorrectos"
             )
         
-        if not AuthService.verify_password(password, usuario.password_hash):
+        valido, nuevo_hash = await run_in_threadpool(pwd_context.verify_and_update, password, usuario.password_hash)
+        if not valido:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Correo o contraseña incorrectos"
@@ -127,8 +140,12 @@ class AuthService:
                 detail="Usuario inactivo"
             )
         
-        # Actualizar last_login
-        usuario.last_login = datetime.utcnow()
-        db.commit()
+        # Rehash transparente si el costo del hash está fuera de la política
+        if nuevo_hash:
+            usuario.password_hash = nuevo_hash
+            await db.commit()
+        
+        # Actualizar last_login (write-behind, sin commit en el login)
+        last_login_buffer.registrar(usuario.id, datetime.utcnow())
         
         return usuario
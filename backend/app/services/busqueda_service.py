@@ -0,0 +1,259 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, column, func, literal, literal_column, or_, select, table, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.instituciones import institucion_actual
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario
+
+# PostgreSQL: configuración con stemming en español y columnas tsvector
+# generadas por la migración 0009 (no están en los modelos)
+CONFIGURACION = literal_column("'spanish'::regconfig")
+COMENTARIO_TSV = literal_column("encuestas.comentario_tsv")
+NOTAS_TSV = literal_column("alertas.notas_tsv")
+INDICE_TRIGRAMAS = "ix_encuestas_comentario_trgm"
+
+# SQLite: tablas FTS5 de contenido externo (rowid = id de la fila)
+ENCUESTAS_FTS = table("encuestas_fts", column("rowid"))
+ALERTAS_FTS = table("alertas_fts", column("rowid"))
+
+FUENTES = ("comentario", "notas")
+MARCA_INICIO, MARCA_FIN = "«", "»"
+MAX_TERMINOS = 8
+# Largo mínimo para buscar también dentro de las palabras (trigramas)
+MIN_INFIJO = 3
+
+# Si la base tiene índices de trigramas (pg_trgm es opcional), por institución
+_trigramas: Dict[str, bool] = {}
+
+class BusquedaService:
+    """
+    Búsqueda de texto en los comentarios de las encuestas y en las notas de
+    atención de las alertas (accion_tomada y notas_psicologo)
+
+    En PostgreSQL cada término se busca como prefijo sobre las columnas
+    tsvector (índices GIN, stemming en español), así que "ansie" encuentra
+    "ansiedad" y "preocupaciones" encuentra "preocupado"; con pg_trgm
+    instalado se agrega la coincidencia dentro de las palabras (ILIKE con
+    índice de trigramas). En SQLite se usa FTS5 con los mismos términos
+    como prefijo, sin stemming.
+
+    Los resultados se ordenan por fecha descendente y se paginan por
+    cursor (fecha, fuente, id). El fragmento resaltado (ts_headline o
+    snippet) se calcula solo para las filas de la página.
+    """
+
+    @staticmethod
+    def terminos(texto: str) -> List[str]:
+        """Palabras de la búsqueda, sin operadores ni signos"""
+        return re.findall(r"[^\W_]+", texto.lower())[:MAX_TERMINOS]
+
+    @staticmethod
+    def cursor(fila) -> str:
+        return f"{fila.fecha.isoformat()}|{fila.fuente}|{fila.id}"
+
+    @staticmethod
+    def leer_cursor(valor: str) -> Tuple[datetime, str, int]:
+        """
+        Raises:
+            ValueError: si el cursor no tiene el formato de cursor()
+        """
+        fecha, fuente, id_ = valor.split("|")
+        if fuente not in FUENTES:
+            raise ValueError(f"Fuente desconocida: {fuente}")
+        return datetime.fromisoformat(fecha), fuente, int(id_)
+
+    @staticmethod
+    async def _hay_trigramas(db: AsyncSession) -> bool:
+        clave = institucion_actual().clave
+        if clave not in _trigramas:
+            _trigramas[clave] = (await db.execute(
+                select(func.to_regclass(INDICE_TRIGRAMAS).isnot(None))
+            )).scalar()
+        return _trigramas[clave]
+
+    @staticmethod
+    def _despues(fecha, id_, fuente: str, cursor: Tuple[datetime, str, int]):
+        # (fecha, fuente, id) < cursor con la fuente fija de la rama
+        fecha_cursor, fuente_cursor, id_cursor = cursor
+        if fuente < fuente_cursor:
+            return fecha <= fecha_cursor
+        if fuente > fuente_cursor:
+            return fecha < fecha_cursor
+        return tuple_(fecha, id_) < tuple_(fecha_cursor, id_cursor)
+
+    @staticmethod
+    def _rama(
+        fuente: str,
+        dialecto: str,
+        terminos: List[str],
+        infijo: Optional[str],
+        filtros: Dict,
+        cursor: Optional[Tuple[datetime, str, int]],
+        limite: int,
+    ):
+        """Coincidencias de una fuente, con filtros y cursor, hasta limite filas"""
+        if fuente == "comentario":
+            fecha, id_ = Encuesta.created_at, Encuesta.id
+            query = select(
+                literal("comentario").label("fuente"), Encuesta.id.label("id"),
+                Encuesta.id.label("encuesta_id"), Alerta.id.label("alerta_id"),
+                fecha.label("fecha"), Alerta.estado.label("estado"), Encuesta.usuario_id.label("usuario_id"),
+            ).select_from(Encuesta).outerjoin(Alerta, and_(
+                Alerta.encuesta_id == Encuesta.id, Alerta.encuesta_created_at == Encuesta.created_at
+            ))
+            usuario_id = Encuesta.usuario_id
+            if dialecto == "sqlite":
+                query = query.add_columns(func.snippet(
+                    literal_column("encuestas_fts"), 0, MARCA_INICIO, MARCA_FIN, "…", 16
+                ).label("texto")).join(ENCUESTAS_FTS, ENCUESTAS_FTS.c.rowid == Encuesta.id)
+            else:
+                query = query.add_columns(Encuesta.comentario.label("texto"))
+                columnas = [Encuesta.comentario]
+        else:
+            fecha, id_ = Alerta.created_at, Alerta.id
+            query = select(
+                literal("notas").label("fuente"), Alerta.id.label("id"),
+                Alerta.encuesta_id.label("encuesta_id"), Alerta.id.label("alerta_id"),
+                fecha.label("fecha"), Alerta.estado.label("estado"), Alerta.usuario_id.label("usuario_id"),
+            ).select_from(Alerta)
+            usuario_id = Alerta.usuario_id
+            if dialecto == "sqlite":
+                query = query.add_columns(func.snippet(
+                    literal_column("alertas_fts"), -1, MARCA_INICIO, MARCA_FIN, "…", 16
+                ).label("texto")).join(ALERTAS_FTS, ALERTAS_FTS.c.rowid == Alerta.id)
+            else:
+                query = query.add_columns(func.concat_ws(" ", Alerta.accion_tomada, Alerta.notas_psicologo).label("texto"))
+                columnas = [Alerta.accion_tomada, Alerta.notas_psicologo]
+
+        if dialecto == "sqlite":
+            # Cada término entre comillas (sin sintaxis FTS5) y como prefijo
+            nombre = "encuestas_fts" if fuente == "comentario" else "alertas_fts"
+            coincide = literal_column(nombre).op("MATCH")(" ".join(f'"{t}"*' for t in terminos))
+        else:
+            tsv = COMENTARIO_TSV if fuente == "comentario" else NOTAS_TSV
+            coincide = tsv.op("@@")(BusquedaService.tsquery(terminos))
+            if infijo is not None:
+                patron = "%" + re.sub(r"([\\%_])", r"\\\1", infijo) + "%"
+                coincide = or_(coincide, *[c.ilike(patron, escape="\\") for c in columnas])
+        query = query.where(coincide)
+
+        if filtros.get("estado"):
+            query = query.where(Alerta.estado == filtros["estado"])
+        if filtros.get("programa"):
+            query = query.where(usuario_id.in_(select(Usuario.id).where(Usuario.programa == filtros["programa"])))
+        if filtros.get("desde"):
+            query = query.where(fecha >= filtros["desde"])
+        if filtros.get("hasta"):
+            query = query.where(fecha < filtros["hasta"])
+        if cursor is not None:
+            query = query.where(BusquedaService._despues(fecha, id_, fuente, cursor))
+        orden = fecha
+        if dialecto != "sqlite":
+            # Ordenar por una expresión que el índice de created_at no cubre
+            # obliga a buscar primero en el GIN y ordenar las coincidencias:
+            # si no, con LIMIT el planificador recorre las filas por fecha y
+            # una búsqueda sin resultados lee la tabla completa
+            orden = fecha + literal_column("interval '0 seconds'")
+        return query.order_by(orden.desc(), id_.desc()).limit(limite).subquery()
+
+    @staticmethod
+    def tsquery(terminos: List[str]):
+        """Todos los términos, cada uno como prefijo: to_tsquery('ansie:* & sueño:*')"""
+        return func.to_tsquery(CONFIGURACION, " & ".join(f"{t}:*" for t in terminos))
+
+    @staticmethod
+    def consulta(
+        dialecto: str,
+        terminos: List[str],
+        infijo: Optional[str] = None,
+        fuentes: Tuple[str, ...] = FUENTES,
+        filtros: Optional[Dict] = None,
+        cursor: Optional[Tuple[datetime, str, int]] = None,
+        limite: int = 20,
+    ):
+        """
+        Página de resultados (limite + 1 filas para saber si hay otra)
+
+        Args:
+            infijo: texto a buscar también dentro de las palabras (solo
+                PostgreSQL con índices de trigramas)
+            filtros: estado (de la alerta), programa (del usuario) y el
+                rango [desde, hasta) de fechas
+        """
+        ramas = [
+            select(BusquedaService._rama(fuente, dialecto, terminos, infijo, filtros or {}, cursor, limite + 1))
+            for fuente in fuentes
+        ]
+        union = (ramas[0] if len(ramas) == 1 else union_all(*ramas)).subquery("coincidencias")
+        pagina = (
+            select(union)
+            .order_by(union.c.fecha.desc(), union.c.fuente.desc(), union.c.id.desc())
+            .limit(limite + 1)
+            .subquery("pagina")
+        )
+        if dialecto == "sqlite":
+            fragmento = pagina.c.texto
+        else:
+            fragmento = func.ts_headline(
+                CONFIGURACION, pagina.c.texto, BusquedaService.tsquery(terminos),
+                f"StartSel={MARCA_INICIO}, StopSel={MARCA_FIN}, MaxFragments=2, MaxWords=20, MinWords=8, "
+                "FragmentDelimiter=\" … \""
+            )
+        return (
+            select(
+                pagina.c.fuente, pagina.c.id, pagina.c.encuesta_id, pagina.c.alerta_id, pagina.c.fecha,
+                pagina.c.estado, pagina.c.usuario_id, Usuario.nombres, Usuario.apellidos, Usuario.programa,
+                fragmento.label("fragmento"),
+            )
+            .join(Usuario, Usuario.id == pagina.c.usuario_id)
+            .order_by(pagina.c.fecha.desc(), pagina.c.fuente.desc(), pagina.c.id.desc())
+        )
+
+    @staticmethod
+    async def buscar(
+        db: AsyncSession,
+        texto: str,
+        fuentes: Tuple[str, ...],
+        filtros: Dict,
+        cursor: Optional[Tuple[datetime, str, int]],
+        limite: int,
+    ) -> Dict:
+        """
+        Returns:
+            Dict con los resultados y el cursor `siguiente` (None en la última página)
+        """
+        terminos = BusquedaService.terminos(texto)
+        dialecto = db.bind.dialect.name
+        infijo = None
+        texto = texto.strip()
+        if dialecto == "postgresql" and len(texto) >= MIN_INFIJO and await BusquedaService._hay_trigramas(db):
+            infijo = texto
+
+        filas = (await db.execute(
+            BusquedaService.consulta(dialecto, terminos, infijo, fuentes, filtros, cursor, limite)
+        )).all()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        return {
+            "resultados": [
+                {
+                    "fuente": fila.fuente,
+                    "encuesta_id": fila.encuesta_id,
+                    "alerta_id": fila.alerta_id,
+                    "fecha": fila.fecha,
+                    "estado": fila.estado,
+                    "usuario": {
+                        "id": fila.usuario_id,
+                        "nombres": fila.nombres,
+                        "apellidos": fila.apellidos,
+                        "programa": fila.programa,
+                    },
+                    "fragmento": fila.fragmento,
+                }
+                for fila in filas
+            ],
+            "siguiente": BusquedaService.cursor(filas[-1]) if hay_mas else None,
+        }
@@ -1,13 +1,93 @@
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, subqueryload
 from app.models.encuesta import Encuesta
 from app.models.usuario import Usuario
-from app.models.alerta import Alerta
+from app.services.archivo_service import ArchivoService
 import io
 
 class ExportService:
     
+    @staticmethod
+    def _columnas_usuario(usuario: Usuario) -> list:
+        """Columnas Tipo Usuario .. Promoción de una fila"""
+        # Programa o Cargo según tipo de usuario
+        programa_cargo = usuario.programa if usuario.tipo_usuario == "estudiante" else usuario.cargo
+        promocion = usuario.promocion if usuario.tipo_usuario == "estudiante" else ""
+        return [
+            usuario.tipo_usuario,
+            f"{usuario.tipo_documento} {usuario.numero_documento}",
+            usuario.nombres,
+            usuario.apellidos,
+            programa_cargo,
+            promocion,
+        ]
+    
+    @staticmethod
+    def _fila_encuesta(encuesta: Encuesta) -> list:
+        """Fila del Excel para una encuesta viva (usuario, alerta y respuestas ya cargados)"""
+        # Obtener respuestas
+        respuestas = {r.pregunta_numero: r.valor for r in encuesta.respuestas}
+        
+        # Obtener estado de alerta
+        estado_alerta = encuesta.alerta.estado if encuesta.alerta else "N/A"
+        
+        return [
+            encuesta.id,
+            encuesta.completed_at.strftime("%d/%m/%Y %H:%M") if encuesta.completed_at else "",
+            *ExportService._columnas_usuario(encuesta.usuario),
+            respuestas.get(1, ""),
+            respuestas.get(2, ""),
+            respuestas.get(3, ""),
+            respuestas.get(4, ""),
+            respuestas.get(5, ""),
+            encuesta.puntaje_raw,
+            encuesta.puntaje_final,
+            "SÍ" if encuesta.es_alerta else "NO",
+            estado_alerta,
+            encuesta.comentario or ""
+        ]
+    
+    @staticmethod
+    def _filas_archivadas(db: Session, filtros: dict):
+        """Filas de los semestres archivados, con los mismos filtros que las vivas"""
+        if not ArchivoService.hay_archivo():
+            return
+        
+        usuario_ids = None
+        if filtros.get('tipo_usuario') or filtros.get('programa'):
+            query_usuarios = db.query(Usuario.id)
+            if filtros.get('tipo_usuario'):
+                query_usuarios = query_usuarios.filter(Usuario.tipo_usuario == filtros['tipo_usuario'])
+            if filtros.get('programa'):
+                query_usuarios = query_usuarios.filter(Usuario.programa == filtros['programa'])
+            usuario_ids = {usuario_id for (usuario_id,) in query_usuarios}
+        
+        archivadas = ArchivoService.filas_exportacion(usuario_ids, filtros.get('es_alerta'))
+        if archivadas is None or archivadas.empty:
+            return
+        
+        usuarios = {
+            usuario.id: usuario
+            for usuario in db.query(Usuario).filter(Usuario.id.in_(archivadas["usuario_id"].unique().tolist()))
+        }
+        for fila in archivadas.itertuples(index=False):
+            usuario = usuarios.get(fila.usuario_id)
+            if usuario is None:
+                continue
+            yield [
+                fila.id,
+                fila.completed_at.strftime("%d/%m/%Y %H:%M") if fila.completed_at else "",
+                *ExportService._columnas_usuario(usuario),
+                *[
+                    valor if valor is not None else ""
+                    for valor in (getattr(fila, f"pregunta_{n}", None) for n in range(1, 6))
+                ],
+                fila.puntaje_raw,
+                fila.puntaje_final,
+                "SÍ" if fila.es_alerta else "NO",
+                fila.estado_alerta or "N/A",
+                fila.comentario or ""
+            ]
+    
     @staticmethod
     def export_to_excel(db: Session, filtros: dict = None) -> bytes:
         """
@@ -21,6 +101,10 @@ class ExportService:
             Bytes del archivo Excel
         """
         
+        # Import diferido: openpyxl (y numpy) encarecen el arranque de cada worker
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        
         # Crear workbook
         wb = Workbook()
         ws = wb.active
@@ -60,8 +144,20 @@ class ExportService:
             cell.fill = header_fill
             cell.alignment = header_alignment
         
-        # Query encuestas
-        query = db.query(Encuesta).join(Usuario)
+        # Query encuestas: usuario y alerta en el mismo SELECT (una alerta por
+        # encuesta como máximo) y todas las respuestas en una segunda consulta
+        # (subqueryload repite los filtros; selectinload haría una cada 500
+        # encuestas), en vez de tres consultas por fila
+        query = (
+            db.query(Encuesta)
+            .join(Encuesta.usuario)
+            .outerjoin(Encuesta.alerta)
+            .options(
+                contains_eager(Encuesta.usuario),
+                contains_eager(Encuesta.alerta),
+                subqueryload(Encuesta.respuestas)
+            )
+        )
         
         # Aplicar filtros si existen
         if filtros:
@@ -76,43 +172,17 @@ class ExportService:
         
         # Escribir datos
         for row_num, encuesta in enumerate(encuestas, start=2):
-            usuario = encuesta.usuario
-            
-            # Obtener respuestas
-            respuestas = {r.pregunta_numero: r.valor for r in encuesta.respuestas}
-            
-            # Obtener estado de alerta
-            alerta = db.query(Alerta).filter(Alerta.encuesta_id == encuesta.id).first()
-            estado_alerta = alerta.estado if alerta else "N/A"
-            
-            # Programa o Cargo según tipo de usuario
-            programa_cargo = usuario.programa if usuario.tipo_usuario == "estudiante" else usuario.cargo
-            promocion = usuario.promocion if usuario.tipo_usuario == "estudiante" else ""
-            
-            # Escribir fila
-            row_data = [
-                encuesta.id,
-                encuesta.completed_at.strftime("%d/%m/%Y %H:%M") if encuesta.completed_at else "",
-                usuario.tipo_usuario,
-                f"{usuario.tipo_documento} {usuario.numero_documento}",
-                usuario.nombres,
-                usuario.apellidos,
-                programa_cargo,
-                promocion,
-                respuestas.get(1, ""),
-                respuestas.get(2, ""),
-                respuestas.get(3, ""),
-                respuestas.get(4, ""),
-                respuestas.get(5, ""),
-                encuesta.puntaje_raw,
-                encuesta.puntaje_final,
-                "SÍ" if encuesta.es_alerta else "NO",
-                estado_alerta,
-                encuesta.comentario or ""
-            ]
-            
+            row_data = ExportService._fila_encuesta(encuesta)
+            for col, value in enumerate(row_data, start=1):
+                ws.cell(row=row_num, column=col, value=value)
+        
+        # Semestres archivados: siempre más antiguos que las filas vivas, así
+        # que van al final sin romper el orden por fecha descendente
+        row_num = len(encuestas) + 2
+        for row_data in ExportService._filas_archivadas(db, filtros or {}):
             for col, value in enumerate(row_data, start=1):
                 ws.cell(row=row_num, column=col, value=value)
+            row_num += 1
         
         # Ajustar ancho de columnas
         for column in ws.columns:
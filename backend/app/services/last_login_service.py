@@ -0,0 +1,127 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import update, case
+from app.config.database import motores
+from app.config.instituciones import institucion_actual, obtener_institucion
+from app.config.settings import settings
+from app.models.usuario import Usuario
+
+logger = logging.getLogger(__name__)
+
+class LastLoginBuffer:
+    """
+    Buffer write-behind para las actualizaciones de last_login
+
+    El login solo registra el timestamp en memoria; un hilo de fondo
+    escribe todos los pendientes en un único UPDATE cada
+    LAST_LOGIN_FLUSH_SEGUNDOS o cuando se acumulan
+    LAST_LOGIN_FLUSH_MAX_ENTRADAS usuarios distintos.
+    Varios logins del mismo usuario se coalescen en una sola fila. Las
+    entradas llevan la institución del login: cada una se escribe en su base.
+    """
+
+    def __init__(self, intervalo_segundos: float, max_entradas: int):
+        self.intervalo_segundos = intervalo_segundos
+        self.max_entradas = max_entradas
+        self._pendientes: Dict[Tuple[str, int], datetime] = {}
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def registrar(self, usuario_id: int, fecha: datetime) -> None:
+        """Registra un login de la institución actual; no toca la base de datos"""
+        clave = (institucion_actual().clave, usuario_id)
+        with self._lock:
+            anterior = self._pendientes.get(clave)
+            if anterior is None or fecha > anterior:
+                self._pendientes[clave] = fecha
+            lleno = len(self._pendientes) >= self.max_entradas
+
+        # El flush ocurre en el hilo de fondo, nunca en el request
+        if lleno:
+            self._despertar.set()
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return len(self._pendientes)
+
+    def flush(self) -> int:
+        """
+        Escribe los timestamps pendientes en la base de datos
+
+        Returns:
+            Número de usuarios actualizados
+        """
+        with self._lock:
+            if not self._pendientes:
+                return 0
+            lote, self._pendientes = self._pendientes, {}
+
+        por_institucion: Dict[str, Dict[int, datetime]] = {}
+        for (institucion, usuario_id), fecha in lote.items():
+            por_institucion.setdefault(institucion, {})[usuario_id] = fecha
+
+        escritos = 0
+        for institucion, pendientes in por_institucion.items():
+            if self._escribir(institucion, pendientes):
+                escritos += len(pendientes)
+                continue
+            # Devolver el lote sin pisar logins más recientes
+            with self._lock:
+                for usuario_id, fecha in pendientes.items():
+                    actual = self._pendientes.get((institucion, usuario_id))
+                    if actual is None or fecha > actual:
+                        self._pendientes[(institucion, usuario_id)] = fecha
+        return escritos
+
+    def _escribir(self, institucion: str, lote: Dict[int, datetime]) -> bool:
+        db = motores(obtener_institucion(institucion)).SessionLocal()
+        try:
+            ids = list(lote.keys())
+            for inicio in range(0, len(ids), self.max_entradas):
+                bloque = {i: lote[i] for i in ids[inicio:inicio + self.max_entradas]}
+                db.execute(
+                    update(Usuario)
+                    .where(Usuario.id.in_(bloque.keys()))
+                    .values(last_login=case(bloque, value=Usuario.id))
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            logger.exception("Error escribiendo last_login de %s; se reintentará en el próximo flush", institucion)
+            return False
+        finally:
+            db.close()
+
+    def iniciar(self) -> None:
+        """Arranca el hilo de flush periódico"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="last-login-flush", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Detiene el hilo y escribe lo que quede pendiente"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+        self.flush()
+
+    def _ejecutar(self) -> None:
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo_segundos)
+            self._despertar.clear()
+            self.flush()
+
+last_login_buffer = LastLoginBuffer(
+    intervalo_segundos=settings.LAST_LOGIN_FLUSH_SEGUNDOS,
+    max_entradas=settings.LAST_LOGIN_FLUSH_MAX_ENTRADAS
+)
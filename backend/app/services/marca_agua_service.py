@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario
+from app.services.archivo_service import ArchivoService
+
+class MarcaAguaService:
+    """
+    Marcas de agua baratas de los datos del dashboard
+
+    Cada marca cambia siempre que cambia la respuesta del endpoint y se
+    obtiene en una sola consulta resuelta con índices (máximos de PK y de
+    columnas indexadas), sin recorrer las tablas. Alimentan el ETag del
+    caché condicional (ver app/utils/cache_http.py).
+    """
+
+    @staticmethod
+    async def metricas(db: AsyncSession, fecha_desde: Optional[datetime], ahora: datetime) -> Dict:
+        """
+        Marca de obtener_metricas
+
+        - max(encuestas.id) y max(encuestas.created_at): encuestas nuevas
+        - max(usuarios.id): usuarios nuevos (total y tasa de participación)
+        - max(alertas.updated_at): alertas nuevas o atendidas
+        - con período, la encuesta más antigua dentro de la ventana: cambia
+          cuando una encuesta sale de la ventana aunque no haya datos nuevos
+        - los semestres archivados
+        """
+        columnas = [
+            select(func.max(Encuesta.id)).scalar_subquery().label("encuesta_id"),
+            select(func.max(Encuesta.created_at)).scalar_subquery().label("encuesta_fecha"),
+            select(func.max(Usuario.id)).scalar_subquery().label("usuario_id"),
+            select(func.max(Alerta.updated_at)).scalar_subquery().label("alerta_fecha"),
+        ]
+        if fecha_desde is not None:
+            columnas.append(
+                select(func.min(Encuesta.created_at))
+                .where(Encuesta.created_at.between(fecha_desde, ahora))
+                .scalar_subquery().label("ventana_desde")
+            )
+        marca = dict((await db.execute(select(*columnas))).one()._mapping)
+        marca["archivo"] = sorted(ArchivoService.leer_manifiesto()["semestres"])
+        return marca
+
+    @staticmethod
+    async def alertas(db: AsyncSession) -> Dict:
+        """Marca de listar_alertas: alertas nuevas o atendidas"""
+        fila = (await db.execute(select(func.max(Alerta.id), func.max(Alerta.updated_at)))).one()
+        return {"alerta_id": fila[0], "alerta_fecha": fila[1]}
+
+    @staticmethod
+    def ultima_modificacion(marca: Dict) -> Optional[datetime]:
+        """Fecha del último cambio registrado en la marca (para Last-Modified)"""
+        fechas = [marca.get(clave) for clave in ("encuesta_fecha", "alerta_fecha")]
+        fechas = [fecha for fecha in fechas if fecha is not None]
+        return max(fechas) if fechas else None
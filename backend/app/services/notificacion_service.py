@@ -0,0 +1,365 @@
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+from app.config.database import motores
+from app.config.instituciones import INSTITUCIONES, Institucion, institucion_actual, usar_institucion
+from app.config.settings import settings
+from app.models.notificacion import Notificacion
+from app.models.usuario import Rol, Usuario
+from app.utils.rate_limit import MemoriaBackend
+
+logger = logging.getLogger(__name__)
+
+class ConexionSMTP:
+    """
+    Conexión SMTP reutilizada entre envíos
+
+    Abrir la conexión (TCP, STARTTLS y AUTH) cuesta varias idas y vueltas:
+    se mantiene abierta entre lotes y se reabre si el servidor la cerró o
+    si lleva más de `inactividad_maxima` segundos sin uso (los servidores
+    cortan las conexiones ociosas).
+    """
+
+    def __init__(self, inactividad_maxima: float = 60.0):
+        self.inactividad_maxima = inactividad_maxima
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._ultimo_uso = 0.0
+        self.conexiones_abiertas = 0
+
+    def _abrir(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SEGUNDOS)
+        try:
+            if settings.SMTP_STARTTLS:
+                smtp.starttls()
+            if settings.SMTP_PASSWORD:
+                smtp.login(settings.SMTP_EMAIL, settings.SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self.conexiones_abiertas += 1
+        return smtp
+
+    def enviar(self, mensaje: EmailMessage, destinatarios: List[str]) -> None:
+        if self._smtp is not None and time.monotonic() - self._ultimo_uso > self.inactividad_maxima:
+            self.cerrar()
+        for intento in range(2):
+            if self._smtp is None:
+                self._smtp = self._abrir()
+            try:
+                self._smtp.send_message(mensaje, to_addrs=destinatarios)
+                self._ultimo_uso = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                # El servidor cerró la conexión reutilizada: reabrir una vez
+                self._smtp = None
+                if intento:
+                    raise
+
+    def cerrar(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+class DespachadorNotificaciones:
+    """
+    Despacha la bandeja de salida de notificaciones en un hilo de fondo
+
+    Cada pasada toma hasta NOTIFICACIONES_LOTE pendientes vencidas con
+    SELECT ... FOR UPDATE SKIP LOCKED, las reserva (varios workers no envían
+    la misma fila) y arma los envíos:
+
+    - prioridad alta: un correo por alerta, sin esperar
+    - el resto: un resumen con todas las pendientes, cuando la más antigua
+      lleva NOTIFICACIONES_RESUMEN_MINUTOS esperando
+
+    Cada correo va a los psicólogos activos en copia oculta, por la misma
+    conexión SMTP y fuera de toda transacción. Un token bucket limita los
+    correos por minuto (por worker); lo que no entra queda para la pasada
+    siguiente. Si un envío falla se reintenta con espera exponencial hasta
+    NOTIFICACIONES_MAX_INTENTOS y luego queda como fallida.
+
+    Los correos no incluyen datos personales del estudiante: solo la
+    alerta y el enlace al dashboard, donde el acceso está autenticado.
+    Cada pasada recorre la bandeja de cada institución, con sus psicólogos
+    y su nombre en el asunto.
+    """
+
+    def __init__(self, intervalo_segundos: float):
+        self.intervalo_segundos = intervalo_segundos
+        self.conexion = ConexionSMTP()
+        self._limite = MemoriaBackend(max_claves=1)
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._espera_limite = 0.0
+        self._metricas: Dict[str, int] = {
+            "correos_enviados": 0,
+            "notificaciones_enviadas": 0,
+            "reintentos": 0,
+            "fallidas": 0,
+            "limitadas": 0,
+        }
+
+    def _contar(self, nombre: str, n: int = 1) -> None:
+        with self._lock:
+            self._metricas[nombre] += n
+
+    def metricas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metricas)
+
+    def despertar(self) -> None:
+        """Adelanta la próxima pasada (una alerta alta recién creada); no bloquea"""
+        self._despertar.set()
+
+    @staticmethod
+    def _destinatarios(db: Session) -> List[str]:
+        return list(db.execute(
+            select(Usuario.correo_institucional)
+            .where(Usuario.rol == Rol.PSICOLOGO, Usuario.is_active.is_(True))
+            .order_by(Usuario.id)
+        ).scalars().all())
+
+    @staticmethod
+    def _linea(notificacion: Notificacion) -> str:
+        alerta = notificacion.alerta
+        return (
+            f"- Alerta #{alerta.id} ({alerta.tipo}, prioridad {alerta.prioridad}): "
+            f"puntaje {alerta.puntaje_obtenido}, {alerta.created_at:%d/%m/%Y %H:%M}"
+        )
+
+    @staticmethod
+    def _mensaje(grupo: List[Notificacion], destinatarios: List[str], institucion: Institucion) -> EmailMessage:
+        mensaje = EmailMessage()
+        if len(grupo) == 1 and grupo[0].prioridad == "alta":
+            mensaje["Subject"] = f"[{institucion.nombre}] Alerta de bienestar de prioridad alta #{grupo[0].alerta_id}"
+            encabezado = "Se registró una alerta de prioridad alta:"
+        else:
+            mensaje["Subject"] = f"[{institucion.nombre}] Resumen: {len(grupo)} alertas de bienestar nuevas"
+            encabezado = f"Se registraron {len(grupo)} alertas nuevas:"
+        mensaje["From"] = settings.SMTP_EMAIL
+        mensaje["To"] = settings.SMTP_EMAIL
+        lineas = [encabezado, ""] + [DespachadorNotificaciones._linea(n) for n in grupo]
+        lineas += ["", f"Revísalas en el dashboard: {settings.NOTIFICACIONES_URL_DASHBOARD}"]
+        mensaje.set_content("\n".join(lineas))
+        # Los psicólogos van en copia oculta: no ven las direcciones de los demás
+        return mensaje
+
+    @staticmethod
+    def _fallo(grupo: List[Notificacion], error: str, ahora: datetime) -> int:
+        """Programa el reintento con espera exponencial; devuelve las que quedan fallidas"""
+        fallidas = 0
+        for notificacion in grupo:
+            notificacion.intentos += 1
+            notificacion.ultimo_error = error[:500]
+            if notificacion.intentos >= settings.NOTIFICACIONES_MAX_INTENTOS:
+                notificacion.estado = "fallida"
+                fallidas += 1
+            else:
+                espera = settings.NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS * 2 ** (notificacion.intentos - 1)
+                notificacion.proximo_intento = ahora + timedelta(seconds=espera)
+        return fallidas
+
+    def despachar(self) -> int:
+        """
+        Una pasada sobre la bandeja de salida de cada institución
+
+        Returns:
+            Notificaciones enviadas
+        """
+        enviadas = 0
+        for clave in INSTITUCIONES:
+            with usar_institucion(clave):
+                enviadas += self.despachar_institucion()
+        return enviadas
+
+    def despachar_institucion(self) -> int:
+        """
+        Una pasada sobre la bandeja de salida de la institución actual
+
+        Las filas se reservan en una transacción corta y los correos se
+        envían fuera de ella: un servidor SMTP lento o colgado no retiene
+        bloqueos ni conexiones del pool. El resultado se registra después
+        en otra transacción corta.
+        """
+        institucion = institucion_actual()
+        try:
+            envios, reserva = self._reservar(institucion)
+        except Exception:
+            logger.exception("Error reservando notificaciones de %s; se reintentará en la próxima pasada", institucion.clave)
+            return 0
+        if not envios:
+            return 0
+
+        resultados = []
+        for ids, mensaje, destinatarios in envios:
+            try:
+                self.conexion.enviar(mensaje, destinatarios)
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning("Error enviando %d notificaciones: %s", len(ids), e)
+                self.conexion.cerrar()
+                resultados.append((ids, f"{type(e).__name__}: {e}"))
+                continue
+            resultados.append((ids, None))
+            self._contar("correos_enviados")
+
+        try:
+            return self._registrar(resultados, reserva)
+        except Exception:
+            logger.exception("Error registrando envíos de %s; las filas vuelven a la cola al vencer la reserva", institucion.clave)
+            return 0
+
+    def _reservar(self, institucion: Institucion) -> Tuple[List[Tuple[List[int], EmailMessage, List[str]]], datetime]:
+        """
+        Toma las pendientes vencidas y arma los correos que caben en el límite
+
+        SELECT ... FOR UPDATE SKIP LOCKED evita que dos workers tomen la
+        misma fila; al confirmar, las reservadas quedan con proximo_intento
+        en el vencimiento de la reserva y ningún worker las vuelve a tomar
+        mientras se envían. Si el proceso muere antes de registrar el
+        resultado, vuelven a la cola cuando vence.
+
+        Returns:
+            ([(ids, mensaje, destinatarios)], vencimiento de la reserva)
+        """
+        ahora = datetime.utcnow()
+        db = motores().SessionLocal()
+        try:
+            pendientes = db.execute(
+                select(Notificacion)
+                .where(Notificacion.estado == "pendiente", Notificacion.proximo_intento <= ahora)
+                .order_by(Notificacion.id)
+                .limit(settings.NOTIFICACIONES_LOTE)
+                .options(selectinload(Notificacion.alerta))
+                .with_for_update(skip_locked=True, of=Notificacion)
+            ).scalars().all()
+
+            grupos = [[n] for n in pendientes if n.prioridad == "alta"]
+            resumen = [n for n in pendientes if n.prioridad != "alta"]
+            vence = ahora - timedelta(minutes=settings.NOTIFICACIONES_RESUMEN_MINUTOS)
+            if resumen and (min(n.created_at for n in resumen) <= vence or len(resumen) >= settings.NOTIFICACIONES_LOTE):
+                grupos.append(resumen)
+
+            destinatarios = self._destinatarios(db) if grupos else []
+            envios, reservadas = [], []
+            for indice, grupo in enumerate(grupos):
+                if not destinatarios:
+                    self._contar("fallidas", self._fallo(grupo, "No hay psicólogos activos a quienes notificar", ahora))
+                    self._contar("reintentos", len(grupo))
+                    continue
+                espera = self._limite.consumir(
+                    "smtp", max(1, int(settings.NOTIFICACIONES_MAX_POR_MINUTO)), settings.NOTIFICACIONES_MAX_POR_MINUTO / 60
+                )
+                if espera > 0:
+                    # Límite de envío: el resto sigue pendiente sin gastar intentos
+                    self._espera_limite = espera
+                    self._contar("limitadas", sum(len(g) for g in grupos[indice:]))
+                    break
+                # El mensaje se arma aquí: después del commit las filas expiran
+                envios.append(([n.id for n in grupo], self._mensaje(grupo, destinatarios, institucion), destinatarios))
+                reservadas += grupo
+
+            # Cada envío puede tardar hasta abrir la conexión, reintentar y
+            # enviar (tres timeouts SMTP); un minuto de margen
+            reserva = ahora + timedelta(seconds=60 + 3 * settings.SMTP_TIMEOUT_SEGUNDOS * len(envios))
+            for notificacion in reservadas:
+                notificacion.proximo_intento = reserva
+            db.commit()
+            return envios, reserva
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _registrar(self, resultados: List[Tuple[List[int], Optional[str]]], reserva: datetime) -> int:
+        """
+        Marca como enviadas las filas de los correos que salieron y programa el
+        reintento de las demás
+
+        Solo toca las que siguen reservadas por esta pasada: si la reserva
+        venció, otro worker pudo tomarlas de nuevo.
+
+        Returns:
+            Notificaciones enviadas
+        """
+        ahora = datetime.utcnow()
+        db = motores().SessionLocal()
+        try:
+            ids = [i for ids_grupo, _ in resultados for i in ids_grupo]
+            vigentes = {
+                n.id: n for n in db.execute(
+                    select(Notificacion)
+                    .where(
+                        Notificacion.id.in_(ids),
+                        Notificacion.estado == "pendiente",
+                        Notificacion.proximo_intento == reserva
+                    )
+                    .with_for_update()
+                ).scalars()
+            }
+            enviadas = 0
+            for ids_grupo, error in resultados:
+                grupo = [vigentes[i] for i in ids_grupo if i in vigentes]
+                if error is not None:
+                    self._contar("fallidas", self._fallo(grupo, error, ahora))
+                    self._contar("reintentos", len(grupo))
+                    continue
+                for notificacion in grupo:
+                    notificacion.estado = "enviada"
+                    notificacion.intentos += 1
+                    notificacion.enviada_at = ahora
+                enviadas += len(grupo)
+            db.commit()
+            self._contar("notificaciones_enviadas", enviadas)
+            return enviadas
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def conteo(db: Session) -> Dict[str, int]:
+        """Notificaciones por estado"""
+        filas = db.execute(select(Notificacion.estado, func.count()).group_by(Notificacion.estado)).all()
+        return {estado: n for estado, n in filas}
+
+    def iniciar(self) -> None:
+        """Arranca el hilo del despachador"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="notificaciones", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Detiene el hilo y cierra la conexión SMTP; lo pendiente queda en la bandeja"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+        self.conexion.cerrar()
+
+    def _ejecutar(self) -> None:
+        while not self._detener.is_set():
+            self.despachar()
+            espera, self._espera_limite = max(self.intervalo_segundos, self._espera_limite), 0.0
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+despachador_notificaciones = DespachadorNotificaciones(
+    intervalo_segundos=settings.NOTIFICACIONES_INTERVALO_SEGUNDOS
+)
@@ -0,0 +1,166 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.config.database import motores
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Tablas particionadas por semestre y su columna de partición
+TABLAS_PARTICIONADAS = {
+    "encuestas": "created_at",
+    "respuestas": "encuesta_created_at",
+}
+
+# Clave del advisory lock: varios workers pueden arrancar a la vez
+LOCK_PARTICIONES = 503_001
+
+class ParticionesService:
+    """
+    Particiones por semestre académico de encuestas y respuestas (solo PostgreSQL)
+
+    Semestre 1: enero a junio; semestre 2: julio a diciembre. Cada tabla
+    tiene una partición por semestre (encuestas_2025_1, respuestas_2025_1)
+    y una DEFAULT que debería quedar vacía: si recibe filas es porque no se
+    crearon a tiempo las particiones futuras. En otros motores todas las
+    operaciones son no-op.
+    """
+
+    @staticmethod
+    def semestre_de(fecha: datetime) -> Tuple[int, int]:
+        return fecha.year, 1 if fecha.month <= 6 else 2
+
+    @staticmethod
+    def semestre_siguiente(anio: int, semestre: int) -> Tuple[int, int]:
+        return (anio, 2) if semestre == 1 else (anio + 1, 1)
+
+    @staticmethod
+    def rango_semestre(anio: int, semestre: int) -> Tuple[datetime, datetime]:
+        """Límites [desde, hasta) del semestre"""
+        if semestre == 1:
+            return datetime(anio, 1, 1), datetime(anio, 7, 1)
+        return datetime(anio, 7, 1), datetime(anio + 1, 1, 1)
+
+    @staticmethod
+    def nombre_particion(tabla: str, anio: int, semestre: int) -> str:
+        return f"{tabla}_{anio}_{semestre}"
+
+    @staticmethod
+    def esta_particionada(conn: Connection, tabla: str = "encuestas") -> bool:
+        if conn.dialect.name != "postgresql":
+            return False
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :tabla AND pg_table_is_visible(c.oid))"
+        ), {"tabla": tabla}).scalar()
+
+    @staticmethod
+    def listar_particiones(conn: Connection) -> List[Dict]:
+        """Particiones actuales con sus límites y filas estimadas"""
+        if not ParticionesService.esta_particionada(conn):
+            return []
+        filas = conn.execute(text(
+            "SELECT padre.relname AS tabla, hija.relname AS particion, "
+            "pg_get_expr(hija.relpartbound, hija.oid) AS limites, hija.reltuples::bigint AS filas_estimadas "
+            "FROM pg_inherits i "
+            "JOIN pg_class padre ON padre.oid = i.inhparent "
+            "JOIN pg_class hija ON hija.oid = i.inhrelid "
+            "WHERE padre.relname = ANY(:tablas) AND pg_table_is_visible(padre.oid) "
+            "ORDER BY padre.relname, hija.relname"
+        ), {"tablas": list(TABLAS_PARTICIONADAS)}).mappings().all()
+        return [dict(fila) for fila in filas]
+
+    @staticmethod
+    def asegurar_particiones(
+        conn: Connection,
+        semestres_adelante: int,
+        desde: Optional[datetime] = None
+    ) -> List[str]:
+        """
+        Crea las particiones que falten desde el semestre de `desde` (hoy
+        por defecto) hasta `semestres_adelante` semestres después del actual
+
+        Debe ejecutarse antes de insertar filas de esos semestres: si la
+        partición DEFAULT ya tiene filas del rango, PostgreSQL rechaza el
+        CREATE TABLE ... PARTITION OF.
+
+        Returns:
+            Nombres de las particiones creadas
+        """
+        if not ParticionesService.esta_particionada(conn):
+            return []
+
+        conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_PARTICIONES})
+        existentes = {p["particion"] for p in ParticionesService.listar_particiones(conn)}
+
+        ahora = datetime.utcnow()
+        ultimo = ParticionesService.semestre_de(ahora)
+        for _ in range(semestres_adelante):
+            ultimo = ParticionesService.semestre_siguiente(*ultimo)
+
+        creadas = []
+        anio, semestre = ParticionesService.semestre_de(min(desde or ahora, ahora))
+        while (anio, semestre) <= ultimo:
+            inicio, fin = ParticionesService.rango_semestre(anio, semestre)
+            for tabla in TABLAS_PARTICIONADAS:
+                nombre = ParticionesService.nombre_particion(tabla, anio, semestre)
+                if nombre in existentes:
+                    continue
+                conn.execute(text(
+                    f"CREATE TABLE {nombre} PARTITION OF {tabla} "
+                    f"FOR VALUES FROM ('{inicio:%Y-%m-%d}') TO ('{fin:%Y-%m-%d}')"
+                ))
+                creadas.append(nombre)
+            anio, semestre = ParticionesService.semestre_siguiente(anio, semestre)
+        return creadas
+
+    @staticmethod
+    def asegurar(semestres_adelante: Optional[int] = None) -> List[str]:
+        """asegurar_particiones en su propia transacción, en la base de la institución actual (arranque y cron)"""
+        if semestres_adelante is None:
+            semestres_adelante = settings.PARTICIONES_SEMESTRES_ADELANTE
+        with motores().engine.begin() as conn:
+            creadas = ParticionesService.asegurar_particiones(conn, semestres_adelante)
+        if creadas:
+            logger.info("Particiones creadas: %s", ", ".join(creadas))
+        return creadas
+
+    @staticmethod
+    def desvincular_semestre(conn: Connection, anio: int, semestre: int) -> List[str]:
+        """
+        Separa (DETACH) las particiones de un semestre sin copiar datos
+
+        Las tablas quedan como tablas independientes, sin FKs, listas para
+        archivarse o eliminarse con DROP TABLE. Las alertas del semestre
+        referencian sus encuestas y deben archivarse antes.
+
+        El DETACH solo toca el catálogo, pero toma un lock exclusivo breve
+        sobre la tabla padre (CONCURRENTLY no se permite con partición DEFAULT).
+        """
+        if not ParticionesService.esta_particionada(conn):
+            raise ValueError("Las tablas no están particionadas en esta base de datos")
+
+        inicio, fin = ParticionesService.rango_semestre(anio, semestre)
+        alertas = conn.execute(text(
+            "SELECT count(*) FROM alertas WHERE encuesta_created_at >= :inicio AND encuesta_created_at < :fin"
+        ), {"inicio": inicio, "fin": fin}).scalar()
+        if alertas:
+            raise ValueError(
+                f"Hay {alertas} alertas del semestre {anio}-{semestre}; archívelas antes de separar sus particiones"
+            )
+
+        desvinculadas = []
+        # respuestas primero: referencia a encuestas
+        for tabla in ("respuestas", "encuestas"):
+            nombre = ParticionesService.nombre_particion(tabla, anio, semestre)
+            conn.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {nombre}"))
+            restricciones = conn.execute(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:tabla AS regclass) AND contype = 'f'"
+            ), {"tabla": nombre}).scalars().all()
+            for restriccion in restricciones:
+                conn.execute(text(f'ALTER TABLE {nombre} DROP CONSTRAINT "{restriccion}"'))
+            desvinculadas.append(nombre)
+        return desvinculadas
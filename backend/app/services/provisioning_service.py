@@ -0,0 +1,282 @@
+import csv
+import enum
+import io
+import multiprocessing
+import os
+import secrets
+import string
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import List, Optional
+from passlib.hash import bcrypt
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+from app.config.instituciones import institucion_actual
+from app.config.settings import settings
+from app.models.usuario import Usuario, TipoUsuario, Rol
+from app.schemas.usuario import EstudianteRegistro, PersonalRegistro
+from app.services.auth_service import pwd_context
+from app.utils.bcrypt_policy import rounds_actuales
+
+# Columnas que se insertan; el orden es el del COPY en PostgreSQL
+COLUMNAS = [
+    "tipo_usuario", "nombres", "apellidos", "tipo_documento", "numero_documento",
+    "correo_institucional", "password_hash", "rol", "programa", "promocion", "cargo",
+    "consent_accepted", "can_contact", "created_at", "updated_at", "is_active"
+]
+
+def _hash_password(password: str, rounds: int) -> str:
+    """
+    Función de nivel de módulo para poder enviarse al pool de procesos
+
+    El costo se pasa explícito porque un proceso hijo no hereda la
+    calibración hecha en el arranque del padre.
+    """
+    return bcrypt.using(rounds=rounds).hash(password)
+
+class ProvisioningService:
+    """
+    Aprovisionamiento masivo de usuarios desde el roster CSV de registro académico
+
+    Estudiantes: nombres, apellidos, tipo_documento, numero_documento,
+    correo_institucional, programa, promocion [, password]
+    Personal: nombres, apellidos, tipo_documento, numero_documento,
+    correo_institucional, cargo [, password]
+
+    Si la fila no trae password se genera una contraseña inicial que
+    cumple la política y se devuelve en las credenciales del resultado.
+    """
+
+    @staticmethod
+    def generar_password() -> str:
+        """Genera una contraseña inicial que cumple la política de registro"""
+        rng = secrets.SystemRandom()
+        caracteres = [
+            secrets.choice(string.ascii_uppercase),
+            secrets.choice(string.ascii_lowercase),
+            secrets.choice(string.digits),
+        ] + [secrets.choice(string.ascii_letters + string.digits) for _ in range(9)]
+        rng.shuffle(caracteres)
+        return "".join(caracteres)
+
+    @staticmethod
+    def leer_csv(contenido: str) -> List[dict]:
+        """Lee el roster aceptando ',' o ';' como separador"""
+        contenido = contenido.lstrip("\ufeff")
+        try:
+            dialecto = csv.Sniffer().sniff(contenido[:4096], delimiters=",;")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.DictReader(io.StringIO(contenido), dialect=dialecto)
+        return [
+            {(k or "").strip().lower(): (v or "").strip() for k, v in fila.items()}
+            for fila in lector
+        ]
+
+    @staticmethod
+    def validar_filas(filas: List[dict], tipo: TipoUsuario) -> tuple:
+        """
+        Valida cada fila con las mismas reglas del registro individual
+
+        Returns:
+            (validas, errores, credenciales) donde validas es una lista de
+            (numero_fila, datos) y errores una lista de dicts para el reporte
+        """
+        schema = EstudianteRegistro if tipo == TipoUsuario.ESTUDIANTE else PersonalRegistro
+        institucion = institucion_actual()
+        validas = []
+        errores = []
+        credenciales = []
+        correos_vistos = set()
+        documentos_vistos = set()
+
+        # La fila 1 es el encabezado
+        for numero_fila, fila in enumerate(filas, start=2):
+            generada = not fila.get("password")
+            if generada:
+                fila["password"] = ProvisioningService.generar_password()
+
+            try:
+                datos = schema(**fila).dict()
+            except ValidationError as e:
+                errores.append({
+                    "fila": numero_fila,
+                    "correo": fila.get("correo_institucional", ""),
+                    "errores": [f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors()]
+                })
+                continue
+
+            mensajes = []
+            error_correo = institucion.error_correo(datos["correo_institucional"], tipo == TipoUsuario.ESTUDIANTE)
+            if error_correo:
+                mensajes.append(error_correo)
+            if tipo == TipoUsuario.ESTUDIANTE and datos["programa"] not in institucion.programas:
+                mensajes.append("Programa no válido")
+            if tipo == TipoUsuario.PERSONAL and datos["cargo"] not in institucion.cargos:
+                mensajes.append("Cargo no válido")
+            if datos["correo_institucional"] in correos_vistos:
+                mensajes.append("Correo repetido en el archivo")
+            if datos["numero_documento"] in documentos_vistos:
+                mensajes.append("Documento repetido en el archivo")
+
+            if mensajes:
+                errores.append({"fila": numero_fila, "correo": datos["correo_institucional"], "errores": mensajes})
+                continue
+
+            correos_vistos.add(datos["correo_institucional"])
+            documentos_vistos.add(datos["numero_documento"])
+            validas.append((numero_fila, datos))
+            if generada:
+                credenciales.append({"correo": datos["correo_institucional"], "password": datos["password"]})
+
+        return validas, errores, credenciales
+
+    @staticmethod
+    def filtrar_existentes(db: Session, validas: list) -> tuple:
+        """Detecta con una sola consulta los correos/documentos ya registrados"""
+        if not validas:
+            return validas, []
+
+        correos = {datos["correo_institucional"] for _, datos in validas}
+        documentos = {datos["numero_documento"] for _, datos in validas}
+
+        existentes = db.execute(
+            select(Usuario.correo_institucional, Usuario.numero_documento).where(
+                or_(
+                    Usuario.correo_institucional.in_(correos),
+                    Usuario.numero_documento.in_(documentos)
+                )
+            )
+        ).all()
+        correos_existentes = {fila.correo_institucional for fila in existentes}
+        documentos_existentes = {fila.numero_documento for fila in existentes}
+
+        nuevas = []
+        errores = []
+        for numero_fila, datos in validas:
+            mensajes = []
+            if datos["correo_institucional"] in correos_existentes:
+                mensajes.append("Este correo ya está registrado")
+            if datos["numero_documento"] in documentos_existentes:
+                mensajes.append("Este documento ya está registrado")
+            if mensajes:
+                errores.append({"fila": numero_fila, "correo": datos["correo_institucional"], "errores": mensajes})
+            else:
+                nuevas.append((numero_fila, datos))
+
+        return nuevas, errores
+
+    @staticmethod
+    def hashear_passwords(passwords: List[str], workers: Optional[int] = None) -> List[str]:
+        """
+        Hashea las contraseñas en paralelo usando un pool de procesos
+
+        Los procesos salen de un forkserver (spawn donde no lo hay) y no de
+        un fork del proceso actual: un hijo de fork hereda los locks que otro
+        hilo tenga tomados en ese momento (logging, pools, hilos de fondo) y
+        puede quedar bloqueado para siempre.
+        """
+        workers = workers or settings.PROVISIONAMIENTO_WORKERS or os.cpu_count() or 1
+        hashear = partial(_hash_password, rounds=rounds_actuales(pwd_context))
+        if workers == 1 or len(passwords) < 2 * workers:
+            return [hashear(p) for p in passwords]
+
+        chunksize = max(1, len(passwords) // (workers * 4))
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(metodo)) as pool:
+            return list(pool.map(hashear, passwords, chunksize=chunksize))
+
+    @staticmethod
+    def insertar(db: Session, filas: List[dict]) -> None:
+        """Inserta con COPY en PostgreSQL y con INSERT multi-fila en otros motores"""
+        if not filas:
+            return
+
+        conexion = db.connection()
+        if conexion.dialect.name == "postgresql" and conexion.dialect.driver == "psycopg2":
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            for fila in filas:
+                escritor.writerow([
+                    "" if fila[c] is None else (fila[c].name if isinstance(fila[c], enum.Enum) else fila[c])
+                    for c in COLUMNAS
+                ])
+            buffer.seek(0)
+            cursor = conexion.connection.cursor()
+            cursor.copy_expert(
+                f"COPY {Usuario.__tablename__} ({', '.join(COLUMNAS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        else:
+            db.execute(insert(Usuario.__table__), filas)
+
+    @staticmethod
+    def provisionar(db: Session, contenido: str, tipo: TipoUsuario, workers: Optional[int] = None) -> dict:
+        """
+        Ejecuta el aprovisionamiento completo de un roster
+
+        Args:
+            db: Sesión de base de datos
+            contenido: Texto del CSV
+            tipo: estudiante o personal
+            workers: Procesos para el hash (por defecto uno por CPU)
+
+        Returns:
+            Dict con totales, errores por fila y credenciales generadas
+        """
+        if tipo not in (TipoUsuario.ESTUDIANTE, TipoUsuario.PERSONAL):
+            raise ValueError("Solo se pueden aprovisionar estudiantes o personal")
+
+        filas = ProvisioningService.leer_csv(contenido)
+        validas, errores, credenciales = ProvisioningService.validar_filas(filas, tipo)
+        nuevas, errores_existentes = ProvisioningService.filtrar_existentes(db, validas)
+        errores.extend(errores_existentes)
+
+        hashes = ProvisioningService.hashear_passwords([datos["password"] for _, datos in nuevas], workers)
+
+        ahora = datetime.utcnow()
+        registros = []
+        for (_, datos), password_hash in zip(nuevas, hashes):
+            registros.append({
+                "tipo_usuario": tipo,
+                "nombres": datos["nombres"],
+                "apellidos": datos["apellidos"],
+                "tipo_documento": datos["tipo_documento"],
+                "numero_documento": datos["numero_documento"],
+                "correo_institucional": datos["correo_institucional"],
+                "password_hash": password_hash,
+                "rol": Rol.USER,
+                "programa": datos.get("programa"),
+                "promocion": datos.get("promocion"),
+                "cargo": datos.get("cargo"),
+                "consent_accepted": False,
+                "can_contact": False,
+                "created_at": ahora,
+                "updated_at": ahora,
+                "is_active": True
+            })
+
+        ProvisioningService.insertar(db, registros)
+        db.commit()
+
+        creados = {r["correo_institucional"] for r in registros}
+        errores.sort(key=lambda e: e["fila"])
+        return {
+            "total_filas": len(filas),
+            "creados": len(registros),
+            "con_errores": len(errores),
+            "errores": errores,
+            "credenciales": [c for c in credenciales if c["correo"] in creados]
+        }
+
+    @staticmethod
+    def reporte_errores_csv(errores: List[dict]) -> str:
+        """Genera el reporte de errores en CSV"""
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(["fila", "correo", "errores"])
+        for error in errores:
+            escritor.writerow([error["fila"], error["correo"], "; ".join(error["errores"])])
+        return buffer.getvalue()
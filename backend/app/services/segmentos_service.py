@@ -0,0 +1,190 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, case, func, literal, null, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario
+from app.services.archivo_service import ArchivoService
+
+# Dimensiones del desglose, en el orden de la respuesta
+DIMENSIONES = {
+    "programa": Usuario.programa,
+    "promocion": Usuario.promocion,
+    "cargo": Usuario.cargo,
+}
+
+# Rangos de puntaje de la distribución (los mismos de /metricas)
+RANGOS = ("alerta", "bajo", "medio", "alto")
+
+class SegmentosService:
+    """
+    Participación, puntaje promedio, tasa de alerta y distribución de
+    puntajes por programa, promoción y cargo, más los totales
+
+    Los datos vivos salen de una sola consulta: usuarios LEFT JOIN encuestas del
+    período, agrupada con GROUPING SETS en PostgreSQL y con UNION ALL de
+    los mismos agregados en SQLite. Los usuarios sin valor en una dimensión
+    (personal sin programa, estudiantes sin cargo) cuentan en los totales
+    pero no forman segmento.
+    """
+
+    @staticmethod
+    def _agregados() -> list:
+        completada = Encuesta.completed_at.isnot(None)
+        puntaje = Encuesta.puntaje_final
+
+        def contar(condicion):
+            return func.sum(case((and_(completada, condicion), 1), else_=0))
+
+        return [
+            func.count(func.distinct(Usuario.id)).label("usuarios"),
+            func.count(func.distinct(Encuesta.usuario_id)).label("respondieron"),
+            func.count(Encuesta.id).label("encuestas"),
+            func.sum(case((completada, puntaje))).label("suma"),
+            func.count(case((completada, puntaje))).label("n"),
+            contar(puntaje < 13).label("alerta"),
+            contar(and_(puntaje >= 13, puntaje < 51)).label("bajo"),
+            contar(and_(puntaje >= 51, puntaje < 76)).label("medio"),
+            contar(puntaje >= 76).label("alto"),
+        ]
+
+    @staticmethod
+    def consulta(dialecto: str, fecha_desde: Optional[datetime], ahora: datetime):
+        """
+        Consulta de agregados por segmento
+
+        Devuelve filas (dimension, segmento, agregados...); dimension es
+        None en la fila de totales.
+        """
+        condicion = Encuesta.usuario_id == Usuario.id
+        if fecha_desde is not None:
+            # En el ON y no en el WHERE: los usuarios sin encuestas en el
+            # período siguen contando para la participación
+            condicion = and_(condicion, Encuesta.created_at.between(fecha_desde, ahora))
+        columnas = list(DIMENSIONES.values())
+
+        if dialecto == "postgresql":
+            # grouping(programa, promocion, cargo) es una máscara de bits: 1
+            # en las columnas agregadas. 0b011 = agrupado por programa, etc.
+            mascara = func.grouping(*columnas)
+            dimension = case(
+                *((mascara == (0b111 ^ (1 << (len(columnas) - 1 - i))), literal(nombre))
+                  for i, nombre in enumerate(DIMENSIONES)),
+                else_=null(),
+            )
+            return (
+                select(dimension.label("dimension"), func.coalesce(*columnas).label("segmento"),
+                       *SegmentosService._agregados())
+                .select_from(Usuario)
+                .outerjoin(Encuesta, condicion)
+                .group_by(func.grouping_sets(*(tuple_(columna) for columna in columnas), tuple_()))
+            )
+
+        partes = [
+            select(literal(nombre).label("dimension"), columna.label("segmento"), *SegmentosService._agregados())
+            .select_from(Usuario).outerjoin(Encuesta, condicion)
+            .where(columna.isnot(None))
+            .group_by(columna)
+            for nombre, columna in DIMENSIONES.items()
+        ]
+        partes.append(
+            select(null().label("dimension"), null().label("segmento"), *SegmentosService._agregados())
+            .select_from(Usuario).outerjoin(Encuesta, condicion)
+        )
+        return union_all(*partes)
+
+    @staticmethod
+    async def calcular(db: AsyncSession, fecha_desde: Optional[datetime], ahora: datetime) -> Dict:
+        """Desglose completo, con los semestres archivados sumados a los vivos"""
+        consulta = SegmentosService.consulta(db.bind.dialect.name, fecha_desde, ahora)
+        filas = [dict(fila._mapping) for fila in (await db.execute(consulta)).all()]
+        # En GROUPING SETS, los NULL de la dimensión forman su propio grupo
+        filas = [f for f in filas if f["dimension"] is None or f["segmento"] is not None]
+
+        if ArchivoService.hay_archivo(fecha_desde):
+            # El archivo guarda usuario_id: hacen falta las dimensiones de
+            # los usuarios y los que respondieron en vivo, para no contar
+            # dos veces a quien tiene encuestas vivas y archivadas
+            usuarios = (await db.execute(select(Usuario.id, *DIMENSIONES.values()))).all()
+            query_vivos = select(Encuesta.usuario_id).distinct()
+            if fecha_desde is not None:
+                query_vivos = query_vivos.where(Encuesta.created_at.between(fecha_desde, ahora))
+            vivos = (await db.execute(query_vivos)).scalars().all()
+            filas = await run_in_threadpool(
+                SegmentosService._sumar_archivo, filas, usuarios, vivos, fecha_desde
+            )
+
+        return SegmentosService._respuesta(filas)
+
+    @staticmethod
+    def _sumar_archivo(filas: List[Dict], usuarios: list, vivos: list, fecha_desde: Optional[datetime]) -> List[Dict]:
+        # pandas solo hace falta con semestres archivados (ya en el threadpool)
+        import pandas as pd
+
+        archivadas = ArchivoService.encuestas_archivadas(fecha_desde)
+        if archivadas is None or archivadas.empty:
+            return filas
+
+        dimensiones = pd.DataFrame(usuarios, columns=["usuario_id", *DIMENSIONES]).set_index("usuario_id")
+        # Left: las encuestas de usuarios ya eliminados cuentan en los totales
+        df = archivadas.join(dimensiones, on="usuario_id", how="left")
+        puntaje = df["puntaje_final"].where(df["completed_at"].notna())
+        df = df.assign(
+            completada=puntaje.notna().astype(int),
+            puntaje=puntaje.fillna(0).astype(int),
+            alerta=(puntaje < 13).astype(int),
+            bajo=((puntaje >= 13) & (puntaje < 51)).astype(int),
+            medio=((puntaje >= 51) & (puntaje < 76)).astype(int),
+            alto=(puntaje >= 76).astype(int),
+        )
+        # Respondieron: vivos o archivados, una sola vez por usuario
+        respondieron = dimensiones.assign(
+            respondio=dimensiones.index.isin(set(vivos).union(df["usuario_id"].unique().tolist()))
+        )
+
+        def sumar(fila: Dict, grupo: pd.DataFrame, respondio: pd.Series) -> None:
+            fila["respondieron"] = int(respondio.sum())
+            fila["encuestas"] += len(grupo)
+            fila["suma"] = (fila["suma"] or 0) + int(grupo["puntaje"].sum())
+            fila["n"] += int(grupo["completada"].sum())
+            for rango in RANGOS:
+                fila[rango] = (fila[rango] or 0) + int(grupo[rango].sum())
+
+        for fila in filas:
+            if fila["dimension"] is None:
+                sumar(fila, df, respondieron["respondio"])
+            else:
+                columna = fila["dimension"]
+                sumar(fila, df[df[columna] == fila["segmento"]],
+                      respondieron.loc[respondieron[columna] == fila["segmento"], "respondio"])
+        return filas
+
+    @staticmethod
+    def _indicadores(fila: Dict) -> Dict:
+        usuarios, n = fila["usuarios"], fila["n"]
+        return {
+            "total_usuarios": usuarios,
+            "total_encuestas": fila["encuestas"],
+            "tasa_participacion": round(fila["respondieron"] / usuarios * 100, 2) if usuarios else 0,
+            "puntaje_promedio": round(float(fila["suma"] or 0) / n, 2) if n else 0.0,
+            "tasa_alerta": round((fila["alerta"] or 0) / n * 100, 2) if n else 0,
+            "distribucion_puntajes": {
+                "alerta_0_12": fila["alerta"] or 0,
+                "bajo_13_50": fila["bajo"] or 0,
+                "medio_51_75": fila["medio"] or 0,
+                "alto_76_100": fila["alto"] or 0,
+            },
+        }
+
+    @staticmethod
+    def _respuesta(filas: List[Dict]) -> Dict:
+        respuesta = {"totales": None, **{f"por_{nombre}": [] for nombre in DIMENSIONES}}
+        for fila in sorted(filas, key=lambda f: (f["dimension"] or "", f["segmento"] or "")):
+            if fila["dimension"] is None:
+                respuesta["totales"] = SegmentosService._indicadores(fila)
+            else:
+                respuesta[f"por_{fila['dimension']}"].append(
+                    {"segmento": fila["segmento"], **SegmentosService._indicadores(fila)}
+                )
+        return respuesta
@@ -0,0 +1,226 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.settings import settings
+from app.models.encuesta import Encuesta
+from app.models.tendencia import TendenciaUsuario
+from app.models.usuario import Usuario
+from app.services.archivo_service import ArchivoService
+
+class TendenciaService:
+    """
+    Tendencia longitudinal de los puntajes WHO-5 de cada usuario
+
+    Por usuario se guarda un estado que se actualiza en O(1) con cada
+    encuesta (actualizar) y que también se calcula en lote sobre todo el
+    historial (calcular_lote); ambos producen los mismos valores:
+
+    - ewma: media móvil exponencial, ewma = alfa * puntaje + (1 - alfa) * ewma
+    - pendiente: mínimos cuadrados sobre los últimos TENDENCIA_VENTANA puntajes
+    - descensos_consecutivos: puntajes seguidos menores que el anterior
+
+    Motivos de alerta de deterioro:
+    - "caida": el puntaje queda WHO5_CAMBIO_SIGNIFICATIVO o más por debajo de
+      la media móvil previa
+    - "descenso_sostenido": TENDENCIA_DESCENSOS descensos seguidos; el
+      contador vuelve a cero al alertar para no repetir la alerta en cada
+      encuesta siguiente
+    """
+
+    @staticmethod
+    def pendiente(puntajes: List[int]) -> float:
+        """Pendiente de mínimos cuadrados de los puntajes contra 0..n-1"""
+        n = len(puntajes)
+        if n < 2:
+            return 0.0
+        media_x = (n - 1) / 2
+        media_y = sum(puntajes) / n
+        covarianza = sum((x - media_x) * (y - media_y) for x, y in enumerate(puntajes))
+        varianza = sum((x - media_x) ** 2 for x in range(n))
+        return covarianza / varianza
+
+    @staticmethod
+    async def bloquear(db: AsyncSession, usuario_id: int) -> TendenciaUsuario:
+        """
+        Fila de tendencia del usuario, bloqueada hasta el commit
+
+        Si aún no existe se crea antes con INSERT ... ON CONFLICT DO NOTHING:
+        un SELECT ... FOR UPDATE sobre una fila inexistente no bloquea nada,
+        y dos primeras encuestas simultáneas (doble clic) insertarían la
+        misma llave. Así la segunda espera el bloqueo y ve la fila de la
+        primera ya actualizada.
+        """
+        construir = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        await db.execute(
+            construir(TendenciaUsuario).values(usuario_id=usuario_id)
+            .on_conflict_do_nothing(index_elements=[TendenciaUsuario.usuario_id])
+        )
+        return (await db.execute(
+            select(TendenciaUsuario)
+            .where(TendenciaUsuario.usuario_id == usuario_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )).scalar_one()
+
+    @staticmethod
+    def actualizar(tendencia: TendenciaUsuario, puntaje: int, fecha: datetime) -> Optional[str]:
+        """
+        Incorpora un puntaje al estado del usuario
+
+        Returns:
+            Motivo de la alerta de deterioro, o None
+        """
+        anteriores = list(tendencia.ultimos_puntajes or [])
+        ewma_previa = tendencia.ewma
+
+        if anteriores and puntaje < anteriores[-1]:
+            descensos = (tendencia.descensos_consecutivos or 0) + 1
+        else:
+            descensos = 0
+
+        motivo = None
+        if ewma_previa is not None and ewma_previa - puntaje >= settings.WHO5_CAMBIO_SIGNIFICATIVO:
+            motivo = "caida"
+        elif descensos >= settings.TENDENCIA_DESCENSOS:
+            motivo = "descenso_sostenido"
+        if motivo is not None:
+            descensos = 0
+
+        alfa = settings.TENDENCIA_ALFA_EWMA
+        ultimos = (anteriores + [puntaje])[-settings.TENDENCIA_VENTANA:]
+        tendencia.n_encuestas = (tendencia.n_encuestas or 0) + 1
+        tendencia.ewma = float(puntaje) if ewma_previa is None else alfa * puntaje + (1 - alfa) * ewma_previa
+        tendencia.ultimos_puntajes = ultimos
+        tendencia.pendiente = TendenciaService.pendiente(ultimos)
+        tendencia.descensos_consecutivos = descensos
+        tendencia.ultima_encuesta_fecha = fecha
+        return motivo
+
+    @staticmethod
+    def calcular_lote(encuestas):
+        """
+        Estado de todos los usuarios a partir de su historial, vectorizado
+
+        pandas se importa aquí y en recalcular: solo lo usa el cálculo en
+        lote, y cargarlo con la ruta de encuestas encarecería el arranque.
+
+        Args:
+            encuestas: DataFrame con usuario_id, created_at y puntaje_final
+                de las encuestas completadas
+
+        Returns:
+            DataFrame con una fila por usuario y las columnas de TendenciaUsuario
+        """
+        import pandas as pd
+
+        columnas = [
+            "usuario_id", "n_encuestas", "ewma", "ultimos_puntajes", "pendiente",
+            "descensos_consecutivos", "ultima_encuesta_fecha",
+        ]
+        if encuestas.empty:
+            return pd.DataFrame(columns=columnas)
+
+        df = encuestas.sort_values(["usuario_id", "created_at"], kind="stable").reset_index(drop=True)
+        puntaje = df["puntaje_final"].astype(float)
+
+        # adjust=False es la misma recurrencia que actualizar()
+        df["ewma"] = puntaje.groupby(df["usuario_id"], sort=False).ewm(
+            alpha=settings.TENDENCIA_ALFA_EWMA, adjust=False
+        ).mean().reset_index(level=0, drop=True)
+        ewma_previa = df["ewma"].groupby(df["usuario_id"], sort=False).shift()
+        previo = puntaje.groupby(df["usuario_id"], sort=False).shift()
+
+        # Descensos seguidos: posición dentro de la racha de descensos
+        # actual, reiniciada en cada alerta. Sin caídas, la alerta por
+        # descenso sostenido reinicia el contador cada TENDENCIA_DESCENSOS
+        # pasos (módulo); una caída lo reinicia en su posición de la racha
+        desciende = puntaje < previo
+        caida = ewma_previa - puntaje >= settings.WHO5_CAMBIO_SIGNIFICATIVO
+        racha_id = (~desciende).cumsum()
+        racha = df.groupby(racha_id, sort=False).cumcount()
+        base = racha.where(caida & desciende).groupby(racha_id, sort=False).ffill().fillna(0)
+        df["descensos"] = ((racha - base) % settings.TENDENCIA_DESCENSOS).where(desciende, 0).astype(int)
+
+        por_usuario = df.groupby("usuario_id", sort=False)
+        ventana = por_usuario.tail(settings.TENDENCIA_VENTANA).copy()
+        ventana["x"] = ventana.groupby("usuario_id", sort=False).cumcount()
+        ventana["y"] = ventana["puntaje_final"].astype(float)
+        grupos = ventana.groupby("usuario_id", sort=False)
+        n = grupos["x"].transform("size")
+        dx = ventana["x"] - grupos["x"].transform("mean")
+        dy = ventana["y"] - grupos["y"].transform("mean")
+        sumas = pd.DataFrame({"usuario_id": ventana["usuario_id"], "xy": dx * dy, "xx": dx * dx, "n": n}).groupby(
+            "usuario_id", sort=False
+        ).agg(xy=("xy", "sum"), xx=("xx", "sum"), n=("n", "first"))
+        pendiente = (sumas["xy"] / sumas["xx"]).where(sumas["n"] >= 2, 0.0)
+        ultimos = grupos["puntaje_final"].agg(lambda serie: [int(v) for v in serie])
+
+        ultima = por_usuario.tail(1).set_index("usuario_id")
+        resultado = pd.DataFrame({
+            "n_encuestas": por_usuario.size(),
+            "ewma": ultima["ewma"],
+            "ultimos_puntajes": ultimos,
+            "pendiente": pendiente,
+            "descensos_consecutivos": ultima["descensos"],
+            "ultima_encuesta_fecha": ultima["created_at"],
+        })
+        return resultado.rename_axis("usuario_id").reset_index()[columnas]
+
+    @staticmethod
+    def recalcular(conn: Connection) -> int:
+        """
+        Reemplaza el estado de todos los usuarios por el calculado sobre su
+        historial completo (vivo y archivado), en una transacción
+
+        En PostgreSQL bloquea tendencias_usuario antes de leer las
+        encuestas: una encuesta que llegue mientras tanto espera en su
+        SELECT ... FOR UPDATE y se aplica después sobre el estado nuevo.
+
+        Returns:
+            Usuarios con estado
+        """
+        import pandas as pd
+
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("LOCK TABLE tendencias_usuario IN EXCLUSIVE MODE"))
+
+        encuestas = pd.read_sql(
+            select(Encuesta.usuario_id, Encuesta.created_at, Encuesta.puntaje_final)
+            .where(Encuesta.completed_at.isnot(None), Encuesta.puntaje_final.isnot(None)),
+            conn,
+        )
+        archivadas = ArchivoService.encuestas_archivadas()
+        if archivadas is not None and not archivadas.empty:
+            archivadas = archivadas[archivadas["completed_at"].notna() & archivadas["puntaje_final"].notna()]
+            encuestas = pd.concat(
+                [encuestas, archivadas[["usuario_id", "created_at", "puntaje_final"]]], ignore_index=True
+            )
+        encuestas["created_at"] = pd.to_datetime(encuestas["created_at"])
+
+        estado = TendenciaService.calcular_lote(encuestas)
+        # Solo usuarios que siguen existiendo (el archivo puede tener eliminados)
+        existentes = pd.read_sql(select(Usuario.id), conn)["id"]
+        estado = estado[estado["usuario_id"].isin(existentes)]
+
+        ahora = datetime.utcnow()
+        registros = [
+            {
+                "usuario_id": int(fila.usuario_id),
+                "n_encuestas": int(fila.n_encuestas),
+                "ewma": float(fila.ewma),
+                "ultimos_puntajes": fila.ultimos_puntajes,
+                "pendiente": float(fila.pendiente),
+                "descensos_consecutivos": int(fila.descensos_consecutivos),
+                "ultima_encuesta_fecha": fila.ultima_encuesta_fecha.to_pydatetime(),
+                "updated_at": ahora,
+            }
+            for fila in estado.itertuples(index=False)
+        ]
+        conn.execute(delete(TendenciaUsuario))
+        for inicio in range(0, len(registros), 5000):
+            conn.execute(insert(TendenciaUsuario), registros[inicio:inicio + 5000])
+        return len(registros)
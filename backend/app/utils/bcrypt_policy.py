@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+from app.config.settings import settings
+
+PASSWORD_PRUEBA = "Calibracion123"
+
+# Resultado de la calibración al arranque. Con gunicorn se calibra en el
+# proceso padre y los workers lo heredan con el fork
+_rounds_calibrados: Optional[int] = None
+
+def medir_hash_ms(rounds: int, muestras: int = 3) -> float:
+    """Mejor tiempo (ms) de un hash bcrypt con el costo indicado"""
+    hasher = bcrypt.using(rounds=rounds)
+    tiempos = []
+    for _ in range(muestras):
+        inicio = time.perf_counter()
+        hasher.hash(PASSWORD_PRUEBA)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tiempos)
+
+def calibrar_rounds(
+    objetivo_ms: float = None,
+    minimo: int = None,
+    maximo: int = None
+) -> int:
+    """
+    Elige el costo bcrypt más alto cuyo hash no supere el objetivo en este host
+
+    Cada round adicional duplica el tiempo, así que se mide en el mínimo y
+    se extrapola; luego se confirma midiendo el costo elegido.
+
+    Returns:
+        Rounds entre BCRYPT_ROUNDS_MIN y BCRYPT_ROUNDS_MAX
+    """
+    objetivo_ms = objetivo_ms or settings.BCRYPT_OBJETIVO_MS
+    minimo = minimo or settings.BCRYPT_ROUNDS_MIN
+    maximo = maximo or settings.BCRYPT_ROUNDS_MAX
+
+    base_ms = medir_hash_ms(minimo)
+    rounds = minimo
+    while rounds < maximo and base_ms * 2 ** (rounds + 1 - minimo) <= objetivo_ms:
+        rounds += 1
+
+    # Corregir la extrapolación con una medición real
+    while rounds > minimo and medir_hash_ms(rounds) > objetivo_ms:
+        rounds -= 1
+
+    return rounds
+
+def aplicar_politica(contexto: CryptContext, rounds: int, tolerancia: int = None) -> None:
+    """
+    Configura el costo de los hashes nuevos y el rango aceptado
+
+    Los hashes fuera de [rounds - tolerancia, rounds + tolerancia] quedan
+    marcados por needs_update() y se rehashean en el siguiente login.
+    """
+    tolerancia = settings.BCRYPT_TOLERANCIA_ROUNDS if tolerancia is None else tolerancia
+    contexto.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=max(4, rounds - tolerancia),
+        bcrypt__max_rounds=min(31, rounds + tolerancia)
+    )
+
+def calibrar_una_vez(contexto: CryptContext) -> int:
+    """
+    Calibra y aplica la política solo la primera vez en el árbol de procesos
+
+    Si cada worker calibrara por su cuenta, podrían elegir rounds distintos
+    y los logins rehashearían según el worker que los atienda; además cada
+    arranque pagaría la medición.
+    """
+    global _rounds_calibrados
+    if _rounds_calibrados is None:
+        _rounds_calibrados = calibrar_rounds()
+        aplicar_politica(contexto, _rounds_calibrados)
+    return _rounds_calibrados
+
+def rounds_actuales(contexto: CryptContext) -> int:
+    """Costo con el que el contexto genera hashes nuevos"""
+    return contexto.to_dict().get("bcrypt__default_rounds", bcrypt.default_rounds)
+
+def _verificaciones_por_segundo(args: tuple) -> float:
+    hash_prueba, segundos = args
+    total = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        bcrypt.verify(PASSWORD_PRUEBA, hash_prueba)
+        total += 1
+    return total / (time.perf_counter() - inicio)
+
+def benchmark_verify(rounds: int, segundos: float = 3.0, procesos: int = None) -> Dict:
+    """
+    Mide verificaciones bcrypt por segundo, por núcleo y en total
+
+    Returns:
+        Dict con rounds, ms por verificación y throughput
+    """
+    procesos = procesos or os.cpu_count() or 1
+    hash_prueba = bcrypt.using(rounds=rounds).hash(PASSWORD_PRUEBA)
+
+    por_nucleo = _verificaciones_por_segundo((hash_prueba, segundos))
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados: List[float] = list(pool.map(_verificaciones_por_segundo, [(hash_prueba, segundos)] * procesos))
+        total = sum(resultados)
+    else:
+        total = por_nucleo
+
+    return {
+        "rounds": rounds,
+        "ms_por_verificacion": round(1000 / por_nucleo, 2) if por_nucleo else None,
+        "verificaciones_por_segundo_por_nucleo": round(por_nucleo, 2),
+        "procesos": procesos,
+        "verificaciones_por_segundo_total": round(total, 2)
+    }
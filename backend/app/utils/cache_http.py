@@ -0,0 +1,73 @@
+"""
+Caché condicional HTTP (ETag / Last-Modified) a partir de una marca de agua
+
+El endpoint calcula primero una marca de agua barata de sus datos (ver
+MarcaAguaService) y, con ella y los parámetros del request, el ETag. Si el
+cliente ya tiene esa versión (If-None-Match, o If-Modified-Since cuando no
+envía ETag) se responde 304 sin ejecutar las consultas de agregación ni
+serializar nada; si no, la respuesta completa lleva ETag, Last-Modified y
+Cache-Control: private, no-cache (el navegador guarda la respuesta pero
+revalida en cada refresco).
+
+Los ETag son débiles (W/): identifican el contenido JSON, no los bytes,
+que cambian con la compresión negociada.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from app.config.instituciones import institucion_actual
+from app.config.settings import settings
+
+CACHE_CONTROL = "private, no-cache"
+
+def calcular_etag(*partes: Any) -> str:
+    """ETag débil de la marca de agua y los parámetros; incluye la versión de la API y la institución"""
+    huella = hashlib.blake2b(
+        repr((settings.VERSION, institucion_actual().clave) + partes).encode(), digest_size=16
+    ).hexdigest()
+    return f'W/"{huella}"'
+
+def _fecha_http(fecha: datetime) -> str:
+    # Las fechas de la base son UTC sin zona
+    return format_datetime(fecha.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def encabezados_cache(etag: str, ultima_modificacion: Optional[datetime] = None) -> Dict[str, str]:
+    encabezados = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if ultima_modificacion is not None:
+        encabezados["Last-Modified"] = _fecha_http(ultima_modificacion)
+    return encabezados
+
+def _coincide_etag(if_none_match: str, etag: str) -> bool:
+    # Comparación débil (RFC 9110 13.1.2): se ignora el prefijo W/
+    opaco = etag.removeprefix("W/")
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == opaco:
+            return True
+    return False
+
+def no_modificado(request: Request, etag: str, ultima_modificacion: Optional[datetime] = None) -> bool:
+    """
+    True si la copia del cliente sigue vigente
+
+    If-None-Match tiene prioridad; If-Modified-Since solo se evalúa sin
+    él, y solo si la ruta pasa una última modificación exacta.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _coincide_etag(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacion is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return ultima_modificacion.replace(tzinfo=timezone.utc, microsecond=0) <= desde
+    return False
+
+def respuesta_no_modificada(etag: str, ultima_modificacion: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=encabezados_cache(etag, ultima_modificacion))
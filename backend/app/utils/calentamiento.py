@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import Dict
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from app.config.database import MotoresInstitucion, motores
+from app.config.instituciones import INSTITUCIONES, usar_institucion
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados que las rutas importan al usarse (exportes, archivo):
+# con preload_app se importan una vez en el padre y los workers los heredan
+MODULOS_PESADOS = ("pandas", "pyarrow.dataset", "pyarrow.parquet", "openpyxl")
+
+def precargar_modulos() -> None:
+    """Importa los módulos pesados; los que no estén instalados se omiten"""
+    for nombre in MODULOS_PESADOS:
+        try:
+            importlib.import_module(nombre)
+        except ImportError:
+            pass
+
+def _limite(motor, n: int) -> int:
+    # Nunca más que pool_size: el resto serían conexiones de overflow que el
+    # pool cierra al devolverlas (y SQLite en memoria tiene una sola)
+    size = getattr(motor.pool, "size", None)
+    return min(n, size()) if callable(size) else 1
+
+async def _calentar_pools(actuales: MotoresInstitucion, n: int) -> None:
+    # Conexiones abiertas a la vez: el pool las conserva al devolverlas
+    conexiones = await asyncio.gather(
+        *(actuales.async_engine.connect() for _ in range(_limite(actuales.async_engine.sync_engine, n)))
+    )
+    try:
+        for conexion in conexiones:
+            await conexion.execute(text("SELECT 1"))
+    finally:
+        for conexion in conexiones:
+            await conexion.close()
+
+    def calentar_sync():
+        abiertas = []
+        try:
+            for _ in range(_limite(actuales.engine, n)):
+                abiertas.append(actuales.engine.connect())
+                abiertas[-1].execute(text("SELECT 1"))
+        finally:
+            for conexion in abiertas:
+                conexion.close()
+
+    await run_in_threadpool(calentar_sync)
+
+def _calentar_caches() -> None:
+    from app.services.archivo_service import ArchivoService
+
+    # Manifiesto y encuestas archivadas (las lee cada métrica del dashboard)
+    ArchivoService.encuestas_archivadas()
+
+async def calentar() -> Dict[str, float]:
+    """
+    Prepara el worker antes de su primer request: abre CALENTAR_CONEXIONES
+    conexiones en los pools sync y async de cada institución (hasta
+    INSTITUCIONES_MAX_MOTORES + la predeterminada) y carga las cachés
+
+    Es best-effort: si una base no responde se registra y el worker arranca
+    igual (las conexiones se abrirán con el primer request).
+
+    Returns:
+        Segundos que tomó cada institución
+    """
+    tiempos = {}
+    n = max(1, settings.CALENTAR_CONEXIONES)
+    for clave in list(INSTITUCIONES)[:settings.INSTITUCIONES_MAX_MOTORES + 1]:
+        inicio = time.perf_counter()
+        with usar_institucion(clave):
+            try:
+                await _calentar_pools(motores(), n)
+                await run_in_threadpool(_calentar_caches)
+            except Exception as e:
+                logger.warning("No se pudo calentar la institución %s: %s", clave, e)
+                continue
+        tiempos[clave] = round(time.perf_counter() - inicio, 3)
+    return tiempos
@@ -0,0 +1,296 @@
+"""
+Compresión negociada de respuestas (gzip, y Brotli/zstd si están instalados)
+
+El middleware elige el algoritmo según Accept-Encoding (valores q incluidos)
+y el orden de preferencia de COMPRESION_ALGORITMOS. Solo comprime tipos de
+contenido de texto (JSON, CSV, HTML, texto plano...): los formatos que ya
+vienen comprimidos, como .xlsx o .parquet, se envían tal cual porque
+volver a comprimirlos gasta CPU sin reducir el tamaño.
+
+- Respuestas de un solo cuerpo: se comprimen si superan
+  COMPRESION_MINIMO_BYTES.
+- Respuestas en streaming (StreamingResponse): los fragmentos se comprimen
+  según llegan y el compresor se vacía al cliente cada VACIADO_BYTES, sin
+  acumular el cuerpo completo.
+
+Por ruta se registran bytes antes y después y el tiempo de CPU de la
+compresión (expuesto en /metrics junto al resto de métricas HTTP).
+"""
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+from app.config.settings import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+# Tipos que vale la pena comprimir; el resto (xlsx, zip, imágenes, parquet,
+# octet-stream) ya está comprimido o es binario
+TIPOS_COMPRIMIBLES = (
+    "text/",
+    "application/json",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# En streaming se vacía el compresor cada tantos bytes de entrada: vaciar
+# en cada fragmento pequeño (una fila de CSV) arruina la tasa de compresión
+VACIADO_BYTES = 64 * 1024
+
+class _Gzip:
+    def __init__(self):
+        # wbits 31: formato gzip (cabecera y CRC), no zlib crudo
+        self._compresor = zlib.compressobj(settings.COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.compress(datos)
+
+    def vaciar(self) -> bytes:
+        return self._compresor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        return self._compresor.flush(zlib.Z_FINISH)
+
+class _Brotli:
+    def __init__(self):
+        self._compresor = brotli.Compressor(quality=settings.COMPRESION_NIVEL_BROTLI)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.process(datos)
+
+    def vaciar(self) -> bytes:
+        return self._compresor.flush()
+
+    def finalizar(self) -> bytes:
+        return self._compresor.finish()
+
+class _Zstd:
+    def __init__(self):
+        self._compresor = zstandard.ZstdCompressor(level=settings.COMPRESION_NIVEL_ZSTD).compressobj()
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.compress(datos)
+
+    def vaciar(self) -> bytes:
+        return self._compresor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finalizar(self) -> bytes:
+        return self._compresor.flush()
+
+COMPRESORES = {"gzip": _Gzip, "br": _Brotli, "zstd": _Zstd}
+
+def algoritmos_disponibles() -> List[str]:
+    """COMPRESION_ALGORITMOS en orden de preferencia, sin los que no están instalados"""
+    instalados = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [algoritmo for algoritmo in settings.COMPRESION_ALGORITMOS if instalados.get(algoritmo)]
+
+def elegir_algoritmo(accept_encoding: str) -> Optional[str]:
+    """
+    Algoritmo a usar según Accept-Encoding: el de mayor q aceptado por el
+    cliente y, a igual q, el primero en el orden de preferencia del servidor
+    """
+    pesos: Dict[str, float] = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        if not nombre:
+            continue
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        pesos[nombre.strip()] = q
+
+    candidatos = []
+    for preferencia, algoritmo in enumerate(algoritmos_disponibles()):
+        q = pesos.get(algoritmo, pesos.get("*", 0.0))
+        if q > 0:
+            candidatos.append((-q, preferencia, algoritmo))
+    return min(candidatos)[2] if candidatos else None
+
+class MetricasCompresion:
+    """Bytes y CPU de compresión por ruta y algoritmo, y respuestas omitidas por motivo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (ruta, algoritmo) -> [respuestas, bytes_entrada, bytes_salida, cpu_s]
+        self.comprimidas: Dict[Tuple[str, str], List[float]] = {}
+        self.omitidas: Dict[Tuple[str, str], int] = {}
+
+    def registrar(self, ruta: str, algoritmo: str, entrada: int, salida: int, cpu: float) -> None:
+        with self._lock:
+            acumulado = self.comprimidas.setdefault((ruta, algoritmo), [0, 0, 0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += entrada
+            acumulado[2] += salida
+            acumulado[3] += cpu
+
+    def omitir(self, ruta: str, motivo: str) -> None:
+        with self._lock:
+            self.omitidas[(ruta, motivo)] = self.omitidas.get((ruta, motivo), 0) + 1
+
+    def exponer(self) -> List[str]:
+        from app.utils.metricas_http import escapar
+
+        lineas = []
+        with self._lock:
+            for indice, nombre, tipo, ayuda in (
+                (0, "http_compression_responses_total", "counter", "Respuestas comprimidas"),
+                (1, "http_compression_input_bytes_total", "counter", "Bytes antes de comprimir"),
+                (2, "http_compression_output_bytes_total", "counter", "Bytes enviados comprimidos"),
+                (3, "http_compression_cpu_seconds_total", "counter", "Tiempo de CPU comprimiendo"),
+            ):
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                for (ruta, algoritmo), valores in sorted(self.comprimidas.items()):
+                    valor = f"{valores[indice]:.6f}" if indice == 3 else str(valores[indice])
+                    lineas.append(f'{nombre}{{route="{escapar(ruta)}",algorithm="{algoritmo}"}} {valor}')
+            nombre = "http_compression_skipped_total"
+            lineas += [f"# HELP {nombre} Respuestas sin comprimir por motivo", f"# TYPE {nombre} counter"]
+            for (ruta, motivo), n in sorted(self.omitidas.items()):
+                lineas.append(f'{nombre}{{route="{escapar(ruta)}",reason="{motivo}"}} {n}')
+        return lineas
+
+metricas_compresion = MetricasCompresion()
+
+def _comprimible(encabezados: Dict[bytes, bytes]) -> Optional[str]:
+    """Motivo para no comprimir una respuesta por sus encabezados, o None"""
+    if b"content-encoding" in encabezados or b"content-range" in encabezados:
+        return "ya_codificada"
+    if b"no-transform" in encabezados.get(b"cache-control", b"").lower():
+        return "no_transform"
+    tipo = encabezados.get(b"content-type", b"").decode("latin-1").lower()
+    if not tipo.startswith(TIPOS_COMPRIMIBLES):
+        return "tipo"
+    return None
+
+class CompresionMiddleware:
+    """
+    Middleware ASGI de compresión
+
+    Retiene el http.response.start hasta ver el primer fragmento del cuerpo:
+    así decide con el tamaño real si la respuesta es de un solo cuerpo, o
+    con Content-Length si es streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not settings.COMPRESION_ACTIVA:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for nombre, valor in scope["headers"]:
+            if nombre == b"accept-encoding":
+                accept_encoding = valor.decode("latin-1")
+                break
+        algoritmo = elegir_algoritmo(accept_encoding) if accept_encoding else None
+
+        inicio_respuesta = None
+        compresor = None
+        entrada = salida = pendiente = 0
+        cpu = 0.0
+
+        def ruta() -> str:
+            from app.utils.metricas_http import SIN_RUTA
+            return getattr(scope.get("route"), "path", None) or SIN_RUTA
+
+        async def enviar_sin_comprimir(mensaje, motivo: Optional[str]):
+            nonlocal inicio_respuesta
+            if motivo:
+                metricas_compresion.omitir(ruta(), motivo)
+            await send(inicio_respuesta)
+            inicio_respuesta = None
+            await send(mensaje)
+
+        async def send_comprimido(mensaje):
+            nonlocal inicio_respuesta, compresor, entrada, salida, pendiente, cpu
+            if mensaje["type"] == "http.response.start":
+                inicio_respuesta = mensaje
+                return
+            if mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+
+            if inicio_respuesta is not None:
+                # Primer fragmento: decidir
+                encabezados = dict(inicio_respuesta["headers"])
+                estado = inicio_respuesta["status"]
+                if estado < 200 or estado in (204, 304):
+                    await enviar_sin_comprimir(mensaje, None)
+                    return
+                motivo = _comprimible(encabezados)
+                if motivo is None and algoritmo is None:
+                    motivo = "cliente"
+                if motivo is None:
+                    longitud = encabezados.get(b"content-length")
+                    tamano = int(longitud) if longitud is not None else (None if mas else len(cuerpo))
+                    if tamano is not None and tamano < settings.COMPRESION_MINIMO_BYTES:
+                        motivo = "tamano"
+                if motivo is not None:
+                    await enviar_sin_comprimir(mensaje, motivo)
+                    return
+
+                compresor = COMPRESORES[algoritmo]()
+                nuevos = [
+                    (nombre, valor) for nombre, valor in inicio_respuesta["headers"]
+                    if nombre not in (b"content-length", b"vary", b"etag")
+                ]
+                nuevos.append((b"content-encoding", algoritmo.encode()))
+                vary = encabezados.get(b"vary")
+                nuevos.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                etag = encabezados.get(b"etag")
+                if etag is not None:
+                    # El cuerpo cambia: la representación comprimida ya no es
+                    # idéntica byte a byte a la del ETag fuerte
+                    nuevos.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+                if not mas:
+                    cpu_inicio = time.thread_time()
+                    comprimido = compresor.comprimir(cuerpo) + compresor.finalizar()
+                    cpu += time.thread_time() - cpu_inicio
+                    nuevos.append((b"content-length", str(len(comprimido)).encode()))
+                await send({**inicio_respuesta, "headers": nuevos})
+                inicio_respuesta = None
+                if not mas:
+                    metricas_compresion.registrar(ruta(), algoritmo, len(cuerpo), len(comprimido), cpu)
+                    await send({"type": "http.response.body", "body": comprimido, "more_body": False})
+                    return
+
+            if compresor is None:
+                await send(mensaje)
+                return
+
+            # Streaming: comprimir cada fragmento y vaciar cada VACIADO_BYTES
+            cpu_inicio = time.thread_time()
+            comprimido = compresor.comprimir(cuerpo)
+            pendiente += len(cuerpo)
+            if not mas:
+                comprimido += compresor.finalizar()
+            elif pendiente >= VACIADO_BYTES:
+                comprimido += compresor.vaciar()
+                pendiente = 0
+            cpu += time.thread_time() - cpu_inicio
+            entrada += len(cuerpo)
+            salida += len(comprimido)
+            if not mas:
+                metricas_compresion.registrar(ruta(), algoritmo, entrada, salida, cpu)
+            if comprimido or not mas:
+                await send({"type": "http.response.body", "body": comprimido, "more_body": mas})
+
+        await self.app(scope, receive, send_comprimido)
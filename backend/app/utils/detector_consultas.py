@@ -0,0 +1,149 @@
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional
+from app.config.settings import settings
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - SQLAlchemy async lo instala
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_BACKEND = os.path.dirname(DIRECTORIO_APP)
+# Frames que nunca son el origen de una consulta (la instrumentación y las
+# dependencias que solo abren la sesión)
+EXCLUIDOS = (
+    os.path.join(DIRECTORIO_APP, "utils", "detector_consultas.py"),
+    os.path.join(DIRECTORIO_APP, "utils", "metricas_http.py"),
+    os.path.join(DIRECTORIO_APP, "config", "database.py"),
+)
+
+class PresupuestoConsultasExcedido(RuntimeError):
+    """Un request superó el presupuesto de consultas declarado en su ruta"""
+
+def presupuesto_consultas(maximo: int) -> Callable:
+    """
+    Declara cuántas sentencias SQL puede ejecutar un endpoint por request
+
+    Se aplica debajo del decorador de la ruta:
+
+        @router.get("/alertas")
+        @presupuesto_consultas(3)
+        async def listar_alertas(...):
+
+    Solo se verifica con DETECTOR_CONSULTAS activo (desarrollo y pruebas).
+    """
+    def decorador(funcion: Callable) -> Callable:
+        funcion.presupuesto_consultas = maximo
+        return funcion
+    return decorador
+
+def forma_sentencia(sentencia: str) -> str:
+    """Normaliza una sentencia para agrupar las que solo cambian en sus parámetros"""
+    sentencia = re.sub(r"\s+", " ", sentencia).strip()
+    # Listas IN expandidas (POSTCOMPILE) y literales numéricos
+    sentencia = re.sub(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+)\s*,?)+\)", "(?)", sentencia)
+    return re.sub(r"\b\d+\b", "?", sentencia)
+
+def ubicacion_llamada() -> Optional[str]:
+    """
+    Primer frame del código de la app que originó la consulta
+
+    Con SQLAlchemy async la sentencia corre en un greenlet cuya pila
+    termina en SQLAlchemy; la ruta que hizo el await está en la pila del
+    greenlet padre, así que se recorren ambas.
+    """
+    frame = sys._getframe(1)
+    actual = greenlet.getcurrent() if greenlet else None
+    while frame is not None:
+        nombre = frame.f_code.co_filename
+        if nombre.startswith(DIRECTORIO_APP) and nombre not in EXCLUIDOS:
+            ruta = os.path.relpath(nombre, DIRECTORIO_BACKEND)
+            return f"{ruta}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+        if frame is None and actual is not None:
+            actual = actual.parent
+            frame = actual.gr_frame if actual is not None else None
+    return None
+
+class RegistroConsultas:
+    """Sentencias de un request, con su forma y origen (solo en modo detector)"""
+
+    def __init__(self, scope: Dict):
+        self.scope = scope
+        self.formas: Counter = Counter()
+        self.ubicaciones: Dict[str, Counter] = {}
+
+    def presupuesto(self) -> Optional[int]:
+        ruta = self.scope.get("route")
+        return getattr(getattr(ruta, "endpoint", None), "presupuesto_consultas", None)
+
+    def registrar(self, sentencia: str, total: int) -> None:
+        forma = forma_sentencia(sentencia)
+        self.formas[forma] += 1
+        self.ubicaciones.setdefault(forma, Counter())[ubicacion_llamada() or "?"] += 1
+
+        presupuesto = self.presupuesto()
+        if settings.PRESUPUESTO_CONSULTAS_ESTRICTO and presupuesto is not None and total > presupuesto:
+            raise PresupuestoConsultasExcedido(
+                f"{self.scope.get('method')} {getattr(self.scope.get('route'), 'path', '?')}: "
+                f"{total} sentencias, presupuesto {presupuesto}. Sentencia: {sentencia[:200]}"
+            )
+
+    def analizar(self, metodo: str, ruta: str, total: int) -> List[Dict]:
+        """Registra y devuelve los hallazgos del request (N+1 y presupuesto excedido)"""
+        hallazgos = []
+        for forma, n in self.formas.items():
+            # Solo lecturas: el unit of work puede insertar fila por fila
+            # (SQLite con RETURNING) sin que sea un N+1
+            if n >= settings.DETECTOR_UMBRAL_REPETICIONES and forma.upper().startswith(("SELECT", "WITH")):
+                hallazgos.append({
+                    "tipo": "n_mas_1",
+                    "metodo": metodo,
+                    "ruta": ruta,
+                    "repeticiones": n,
+                    "sentencia": forma[:300],
+                    "origen": dict(self.ubicaciones[forma].most_common(3)),
+                })
+        presupuesto = self.presupuesto()
+        if presupuesto is not None and total > presupuesto:
+            hallazgos.append({
+                "tipo": "presupuesto",
+                "metodo": metodo,
+                "ruta": ruta,
+                "sentencias": total,
+                "presupuesto": presupuesto,
+            })
+
+        for hallazgo in hallazgos:
+            if hallazgo["tipo"] == "n_mas_1":
+                logger.warning(
+                    "Posible N+1 en %s %s: %d x %s desde %s",
+                    metodo, ruta, hallazgo["repeticiones"], hallazgo["sentencia"][:120], hallazgo["origen"]
+                )
+            else:
+                logger.warning(
+                    "%s %s ejecutó %d sentencias (presupuesto %d)", metodo, ruta, total, presupuesto
+                )
+        if hallazgos:
+            with _lock:
+                _hallazgos.extend(hallazgos)
+        return hallazgos
+
+# Últimos hallazgos del proceso (para scripts de verificación)
+_lock = threading.Lock()
+_hallazgos: Deque[Dict] = deque(maxlen=1000)
+
+def hallazgos() -> List[Dict]:
+    with _lock:
+        return list(_hallazgos)
+
+def limpiar_hallazgos() -> None:
+    with _lock:
+        _hallazgos.clear()
@@ -0,0 +1,78 @@
+from typing import Optional, Tuple
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from app.config.instituciones import (
+    Institucion, PREDETERMINADA, institucion_por_host, obtener_institucion, usar_institucion
+)
+from app.config.settings import settings
+
+# Cabecera para elegir institución en un host compartido (login desde un
+# frontend común); con un host registrado manda el host
+CABECERA_INSTITUCION = b"x-institucion"
+
+# Rutas de infraestructura (scraper, balanceador): no pertenecen a ninguna
+# institución y deben responder aunque el host no esté registrado
+RUTAS_SIN_INSTITUCION = frozenset({"/health", "/metrics"})
+
+def resolver_institucion(headers: dict) -> Tuple[Optional[Institucion], Optional[Tuple[int, str]]]:
+    """
+    Institución del request a partir del Host, la cabecera X-Institucion y
+    el claim "inst" del token
+
+    Returns:
+        (institucion, None) o (None, (codigo_http, detalle))
+    """
+    host = headers.get(b"host", b"").decode("latin-1")
+    elegida = institucion_por_host(host)
+    if elegida is None and CABECERA_INSTITUCION in headers:
+        elegida = obtener_institucion(headers[CABECERA_INSTITUCION].decode("latin-1").strip().lower())
+        if elegida is None:
+            return None, (404, "Institución no encontrada")
+
+    autorizacion = headers.get(b"authorization", b"").decode("latin-1")
+    if autorizacion[:7].lower() == "bearer ":
+        try:
+            payload = jwt.decode(autorizacion[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            # Token inválido: lo rechaza get_current_user en las rutas protegidas
+            payload = None
+        if payload is not None:
+            clave = payload.get("inst", PREDETERMINADA.clave)
+            del_token = obtener_institucion(clave) if isinstance(clave, str) else None
+            if del_token is None or (elegida is not None and elegida.clave != del_token.clave):
+                return None, (401, "El token no corresponde a esta institución")
+            return del_token, None
+
+    if elegida is not None:
+        return elegida, None
+    if settings.INSTITUCION_HOST_ESTRICTO:
+        return None, (404, "Institución no encontrada")
+    return PREDETERMINADA, None
+
+class InstitucionMiddleware:
+    """
+    Middleware ASGI que fija la institución de cada request
+
+    La deja en la ContextVar que leen get_db y los servicios (llega al
+    endpoint, a las dependencias y al threadpool) y en scope["institucion"]
+    para las métricas. Es ASGI puro por la misma razón que MetricasMiddleware.
+    Las RUTAS_SIN_INSTITUCION pasan sin resolverla.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in RUTAS_SIN_INSTITUCION:
+            await self.app(scope, receive, send)
+            return
+
+        institucion, error = resolver_institucion(dict(scope["headers"]))
+        if error is not None:
+            codigo, detalle = error
+            await JSONResponse({"detail": detalle}, status_code=codigo)(scope, receive, send)
+            return
+
+        scope["institucion"] = institucion.clave
+        with usar_institucion(institucion.clave):
+            await self.app(scope, receive, send)
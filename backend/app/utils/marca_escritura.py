@@ -0,0 +1,43 @@
+from app.config.database import CABECERA_ESCRITURA, marcas_request
+
+_CABECERA = CABECERA_ESCRITURA.lower().encode("latin-1")
+
+class MarcaEscrituraMiddleware:
+    """
+    Middleware ASGI que lleva la marca de read-your-writes entre requests
+
+    Deja en la ContextVar la marca que envía el cliente (la lee
+    leer_de_primario) y, si la ruta llamó a marcar_escritura, agrega la
+    nueva marca firmada a la respuesta. Así el pinning al primario vale
+    aunque el siguiente request lo atienda otro worker. Es ASGI puro por la
+    misma razón que MetricasMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recibida = None
+        for nombre, valor in scope["headers"]:
+            if nombre == _CABECERA:
+                recibida = valor.decode("latin-1")
+                break
+        marca = {"recibida": recibida, "emitida": None}
+
+        async def send_con_marca(mensaje):
+            if mensaje["type"] == "http.response.start" and marca["emitida"]:
+                mensaje = {
+                    **mensaje,
+                    "headers": [*mensaje.get("headers", []), (_CABECERA, marca["emitida"].encode("latin-1"))]
+                }
+            await send(mensaje)
+
+        token = marcas_request.set(marca)
+        try:
+            await self.app(scope, receive, send_con_marca)
+        finally:
+            marcas_request.reset(token)
@@ -0,0 +1,187 @@
+"""
+Métricas de /metrics sumadas entre los workers de gunicorn
+
+Cada worker guarda en memoria sus propios contadores, así que un scrape a
+/metrics vería solo los del worker que lo atendió. Con METRICAS_DIRECTORIO
+cada worker publica su exposición en un archivo del directorio cada
+METRICAS_PUBLICAR_SEGUNDOS (y al apagarse) y /metrics devuelve la suma de
+todos: contadores e histogramas de cada serie, y los gauges de los workers
+vivos. Cuando un worker termina (reciclaje, caída), el proceso padre suma
+sus contadores a un archivo acumulado para que los totales no retrocedan.
+"""
+import fcntl
+import glob
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_WORKER = "worker-"
+ARCHIVO_ACUMULADO = "acumulado.prom"
+ARCHIVO_LOCK = ".lock"
+
+# nombre de la familia -> (ayuda, tipo, {serie: valor}); las series
+# conservan el orden de la exposición original
+Familias = Dict[str, Tuple[str, str, Dict[str, float]]]
+
+def _familia_de(serie: str, familias: Familias, actual: Optional[str]) -> Optional[str]:
+    nombre = serie.split("{", 1)[0]
+    if nombre in familias:
+        return nombre
+    # Series de un histograma: <familia>_bucket, _sum y _count
+    return actual
+
+def leer_exposicion(texto: str, familias: Familias, solo_acumulables: bool = False) -> None:
+    """Suma a `familias` las series de una exposición en formato de texto de Prometheus"""
+    ayudas: Dict[str, str] = {}
+    actual = None
+    for linea in texto.splitlines():
+        if linea.startswith("# HELP "):
+            nombre, _, ayuda = linea[7:].partition(" ")
+            ayudas[nombre] = ayuda
+        elif linea.startswith("# TYPE "):
+            nombre, _, tipo = linea[7:].partition(" ")
+            actual = nombre
+            if nombre not in familias:
+                familias[nombre] = (ayudas.get(nombre, ""), tipo, {})
+        elif linea and not linea.startswith("#"):
+            serie, _, valor = linea.rpartition(" ")
+            familia = _familia_de(serie, familias, actual)
+            if familia is None:
+                continue
+            _, tipo, series = familias[familia]
+            if solo_acumulables and tipo == "gauge":
+                continue
+            series[serie] = series.get(serie, 0.0) + float(valor)
+
+def escribir_exposicion(familias: Familias) -> str:
+    lineas: List[str] = []
+    for nombre, (ayuda, tipo, series) in familias.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        for serie, valor in series.items():
+            lineas.append(f"{serie} {int(valor) if valor.is_integer() else f'{valor:.6f}'}")
+    return "\n".join(lineas) + "\n"
+
+def _escribir_atomico(ruta: str, texto: str) -> None:
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(texto)
+    os.replace(temporal, ruta)
+
+class MetricasCompartidas:
+    """
+    Publica las métricas de este worker y suma las de todos en el scrape
+
+    Los archivos se reemplazan de forma atómica, así que leerlos no necesita
+    coordinación con los workers. El lock del directorio solo ordena el
+    scrape frente al proceso padre cuando pasa un worker terminado al
+    acumulado: sin él, un scrape podría contar ese worker dos veces (o
+    ninguna) y Prometheus lo vería como un reinicio del contador.
+    """
+
+    def __init__(self, intervalo_segundos: float):
+        self.intervalo_segundos = intervalo_segundos
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._temporal = False
+
+    @property
+    def directorio(self) -> Optional[str]:
+        return settings.METRICAS_DIRECTORIO
+
+    @contextmanager
+    def _bloqueo(self, modo: int):
+        with open(os.path.join(self.directorio, ARCHIVO_LOCK), "a") as archivo:
+            fcntl.flock(archivo, modo)
+            try:
+                yield
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+    def _archivo_worker(self, pid: int) -> str:
+        return os.path.join(self.directorio, f"{PREFIJO_WORKER}{pid}.prom")
+
+    def publicar(self) -> None:
+        """Escribe la exposición de este worker"""
+        from app.utils.metricas_http import exponer_prometheus
+
+        if self.directorio:
+            _escribir_atomico(self._archivo_worker(os.getpid()), exponer_prometheus())
+
+    def exponer(self) -> str:
+        """Exposición sumada de todos los workers (la de este, al momento)"""
+        self.publicar()
+        familias: Familias = {}
+        with self._bloqueo(fcntl.LOCK_SH):
+            # Con el lock compartido el padre no borra archivos mientras se leen
+            for ruta in sorted(glob.glob(os.path.join(self.directorio, "*.prom"))):
+                with open(ruta, encoding="utf-8") as archivo:
+                    leer_exposicion(archivo.read(), familias)
+        return escribir_exposicion(familias)
+
+    def preparar(self) -> str:
+        """
+        En el proceso padre, antes de lanzar los workers: crea el directorio
+        (uno temporal si METRICAS_DIRECTORIO no está definido) y borra lo que
+        haya quedado de una ejecución anterior
+        """
+        if not self.directorio:
+            import tempfile
+
+            settings.METRICAS_DIRECTORIO = tempfile.mkdtemp(prefix="bienestar-metricas-")
+            self._temporal = True
+        os.makedirs(self.directorio, exist_ok=True)
+        for ruta in glob.glob(os.path.join(self.directorio, "*.prom")):
+            os.remove(ruta)
+        return self.directorio
+
+    def acumular_worker(self, pid: int) -> None:
+        """En el proceso padre, al terminar un worker: pasa sus contadores al acumulado"""
+        ruta = self._archivo_worker(pid)
+        acumulado = os.path.join(self.directorio, ARCHIVO_ACUMULADO)
+        with self._bloqueo(fcntl.LOCK_EX):
+            if not os.path.exists(ruta):
+                return
+            familias: Familias = {}
+            for origen in (acumulado, ruta):
+                if os.path.exists(origen):
+                    with open(origen, encoding="utf-8") as archivo:
+                        leer_exposicion(archivo.read(), familias, solo_acumulables=True)
+            _escribir_atomico(acumulado, escribir_exposicion(familias))
+            os.remove(ruta)
+
+    def limpiar(self) -> None:
+        """En el proceso padre, al salir: borra el directorio si lo creó preparar"""
+        if self._temporal:
+            import shutil
+
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def iniciar(self) -> None:
+        if not self.directorio or self.intervalo_segundos <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="metricas", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Para el hilo y publica la última exposición (la suma el padre al acumulado)"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+        if self.directorio:
+            self.publicar()
+
+    def _ejecutar(self) -> None:
+        while not self._detener.wait(self.intervalo_segundos):
+            try:
+                self.publicar()
+            except OSError:
+                logger.exception("Error publicando las métricas de este worker")
+
+metricas_compartidas = MetricasCompartidas(intervalo_segundos=settings.METRICAS_PUBLICAR_SEGUNDOS)
@@ -0,0 +1,284 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config.settings import settings
+from app.utils.detector_consultas import RegistroConsultas
+
+# Límites superiores de los histogramas (convención de Prometheus: segundos)
+BUCKETS_LATENCIA_S = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BUCKETS_TIEMPO_DB_S = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5]
+BUCKETS_CONSULTAS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+# Etiqueta de los requests que no corresponden a ninguna ruta (404, CORS
+# preflight): nunca la ruta cruda, para no disparar la cardinalidad
+SIN_RUTA = "sin_ruta"
+
+# Etiqueta de los requests rechazados antes de resolver la institución
+SIN_INSTITUCION = "ninguna"
+
+class ConsultasRequest:
+    """Sentencias SQL y tiempo en base de datos acumulados por un request"""
+
+    __slots__ = ("sentencias", "segundos", "detalle")
+
+    def __init__(self, detalle: Optional[RegistroConsultas] = None):
+        self.sentencias = 0
+        self.segundos = 0.0
+        # Formas y origen de cada sentencia, solo con DETECTOR_CONSULTAS
+        self.detalle = detalle
+
+# El middleware fija un acumulador por request; los eventos del engine lo
+# encuentran aunque la consulta corra en el threadpool (se copia el
+# contexto) o dentro del greenlet de SQLAlchemy async
+_consultas_request: ContextVar[Optional[ConsultasRequest]] = ContextVar("consultas_request", default=None)
+
+def consultas_request_actual() -> Optional[ConsultasRequest]:
+    return _consultas_request.get()
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus (no thread-safe: lo protege el registro)"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.n = 0
+
+    def observar(self, valor: float) -> None:
+        self.suma += valor
+        self.n += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+                return
+        self.conteos[-1] += 1
+
+    def exponer(self, nombre: str, etiquetas: str) -> List[str]:
+        separador = "," if etiquetas else ""
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.buckets, self.conteos):
+            acumulado += conteo
+            lineas.append(f'{nombre}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+        lineas.append(f'{nombre}_bucket{{{etiquetas}{separador}le="+Inf"}} {self.n}')
+        lineas.append(f"{nombre}_sum{{{etiquetas}}} {self.suma:.6f}")
+        lineas.append(f"{nombre}_count{{{etiquetas}}} {self.n}")
+        return lineas
+
+def escapar(valor: str) -> str:
+    """Escapa un valor de etiqueta del formato de texto de Prometheus"""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricasHTTP:
+    """Métricas por ruta (plantilla de FastAPI) de este worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latencia: Dict[Tuple[str, str], Histograma] = {}
+        self.sentencias: Dict[Tuple[str, str], Histograma] = {}
+        self.tiempo_db: Dict[Tuple[str, str], Histograma] = {}
+        # Por institución: cuál concentra la carga y el tiempo en base de datos
+        self.requests_institucion: Dict[Tuple[str, int], int] = {}
+        self.latencia_institucion: Dict[str, Histograma] = {}
+        self.tiempo_db_institucion: Dict[str, Histograma] = {}
+
+    def iniciar_request(self) -> None:
+        with self._lock:
+            self.en_curso += 1
+
+    def registrar(
+        self,
+        metodo: str,
+        ruta: str,
+        estado: int,
+        segundos: float,
+        consultas: ConsultasRequest,
+        institucion: str = SIN_INSTITUCION
+    ) -> None:
+        clave = (metodo, ruta)
+        with self._lock:
+            self.en_curso -= 1
+            self.requests[(metodo, ruta, estado)] = self.requests.get((metodo, ruta, estado), 0) + 1
+            if clave not in self.latencia:
+                self.latencia[clave] = Histograma(BUCKETS_LATENCIA_S)
+                self.sentencias[clave] = Histograma(BUCKETS_CONSULTAS)
+                self.tiempo_db[clave] = Histograma(BUCKETS_TIEMPO_DB_S)
+            self.latencia[clave].observar(segundos)
+            self.sentencias[clave].observar(consultas.sentencias)
+            self.tiempo_db[clave].observar(consultas.segundos)
+
+            self.requests_institucion[(institucion, estado)] = self.requests_institucion.get((institucion, estado), 0) + 1
+            if institucion not in self.latencia_institucion:
+                self.latencia_institucion[institucion] = Histograma(BUCKETS_LATENCIA_S)
+                self.tiempo_db_institucion[institucion] = Histograma(BUCKETS_TIEMPO_DB_S)
+            self.latencia_institucion[institucion].observar(segundos)
+            self.tiempo_db_institucion[institucion].observar(consultas.segundos)
+
+    def exponer(self) -> List[str]:
+        """Líneas en formato de texto de Prometheus"""
+        lineas = [
+            "# HELP http_requests_in_flight Requests en curso",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        with self._lock:
+            lineas.append(f"http_requests_in_flight {self.en_curso}")
+
+            lineas += [
+                "# HELP http_requests_total Requests atendidos por ruta y código de estado",
+                "# TYPE http_requests_total counter",
+            ]
+            for (metodo, ruta, estado), n in sorted(self.requests.items()):
+                lineas.append(
+                    f'http_requests_total{{method="{metodo}",route="{escapar(ruta)}",status="{estado}"}} {n}'
+                )
+
+            for nombre, ayuda, histogramas in (
+                ("http_request_duration_seconds", "Latencia de los requests por ruta", self.latencia),
+                ("http_request_db_statements", "Sentencias SQL ejecutadas por request", self.sentencias),
+                ("http_request_db_seconds", "Tiempo acumulado en base de datos por request", self.tiempo_db),
+            ):
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+                for (metodo, ruta), histograma in sorted(histogramas.items()):
+                    lineas += histograma.exponer(nombre, f'method="{metodo}",route="{escapar(ruta)}"')
+
+            lineas += [
+                "# HELP http_requests_institucion_total Requests atendidos por institución y código de estado",
+                "# TYPE http_requests_institucion_total counter",
+            ]
+            for (institucion, estado), n in sorted(self.requests_institucion.items()):
+                lineas.append(f'http_requests_institucion_total{{institucion="{escapar(institucion)}",status="{estado}"}} {n}')
+            for nombre, ayuda, histogramas in (
+                ("http_request_institucion_duration_seconds", "Latencia de los requests por institución",
+                 self.latencia_institucion),
+                ("http_request_institucion_db_seconds", "Tiempo en base de datos por request e institución",
+                 self.tiempo_db_institucion),
+            ):
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+                for institucion, histograma in sorted(histogramas.items()):
+                    lineas += histograma.exponer(nombre, f'institucion="{escapar(institucion)}"')
+        return lineas
+
+metricas_http = MetricasHTTP()
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI que mide cada request HTTP
+
+    Es ASGI puro (no BaseHTTPMiddleware) para que la ContextVar del
+    acumulador de SQL llegue al endpoint y para medir también el envío de
+    respuestas en streaming. La ruta se toma de scope["route"], que FastAPI
+    fija al resolver el endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = 500
+
+        async def send_con_estado(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        consultas = ConsultasRequest(RegistroConsultas(scope) if settings.DETECTOR_CONSULTAS else None)
+        token = _consultas_request.set(consultas)
+        metricas_http.iniciar_request()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            duracion = time.perf_counter() - inicio
+            _consultas_request.reset(token)
+            ruta = getattr(scope.get("route"), "path", None) or SIN_RUTA
+            metricas_http.registrar(
+                scope["method"], ruta, estado, duracion, consultas, scope.get("institucion", SIN_INSTITUCION)
+            )
+            if consultas.detalle is not None:
+                consultas.detalle.analizar(scope["method"], ruta, consultas.sentencias)
+
+def instrumentar_sql(engine: Engine) -> None:
+    """Cuenta sentencias y tiempo de base de datos del request en curso (para async usar engine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["metricas_inicio"].pop()
+        consultas = _consultas_request.get()
+        if consultas is not None:
+            consultas.sentencias += 1
+            consultas.segundos += time.perf_counter() - inicio
+            if consultas.detalle is not None:
+                consultas.detalle.registrar(statement, consultas.sentencias)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(contexto):
+        # La sentencia falló: after_cursor_execute no llega a ejecutarse
+        conexion = contexto.connection
+        if conexion is not None and conexion.info.get("metricas_inicio"):
+            conexion.info["metricas_inicio"].pop()
+
+def _lineas_pools() -> List[str]:
+    from app.utils.pool_metrics import BUCKETS_ESPERA_MS, estadisticas_pools
+
+    pools = {nombre: datos for nombre, datos in estadisticas_pools().items() if "checkouts" in datos}
+    lineas = []
+    for nombre, tipo, campo, ayuda in (
+        ("db_pool_checkouts_total", "counter", "checkouts", "Conexiones entregadas por el pool"),
+        ("db_pool_timeouts_total", "counter", "timeouts", "Checkouts que agotaron pool_timeout"),
+        ("db_pool_connections_created_total", "counter", "conexiones_nuevas", "Conexiones abiertas contra la base de datos"),
+        ("db_pool_size", "gauge", "size", "Tamaño configurado del pool"),
+        ("db_pool_checked_out", "gauge", "checkedout", "Conexiones en uso"),
+        ("db_pool_overflow_in_use", "gauge", "overflow_en_uso", "Conexiones de overflow en uso"),
+    ):
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        for pool, datos in sorted(pools.items()):
+            if campo in datos:
+                lineas.append(f'{nombre}{{pool="{pool}"}} {datos[campo]}')
+
+    nombre = "db_pool_wait_seconds"
+    lineas += [f"# HELP {nombre} Espera por una conexión libre", f"# TYPE {nombre} histogram"]
+    for pool, datos in sorted(pools.items()):
+        histograma = Histograma([ms / 1000 for ms in BUCKETS_ESPERA_MS])
+        histograma.conteos = [datos["histograma_espera_ms"][f"le_{ms}"] for ms in BUCKETS_ESPERA_MS]
+        histograma.conteos.append(datos["histograma_espera_ms"]["mayor"])
+        histograma.suma = datos["espera_total_ms"] / 1000
+        histograma.n = datos["checkouts"]
+        lineas += histograma.exponer(nombre, f'pool="{pool}"')
+    return lineas
+
+def exponer_prometheus() -> str:
+    """Métricas HTTP, de compresión, de login, de notificaciones y de los pools en formato de texto de Prometheus"""
+    from app.utils.compresion import metricas_compresion
+    from app.utils.rate_limit import login_rate_limiter
+    from app.services.notificacion_service import despachador_notificaciones
+
+    lineas = metricas_http.exponer()
+    lineas += metricas_compresion.exponer()
+    lineas += [
+        "# HELP login_events_total Intentos de login y rechazos por throttling",
+        "# TYPE login_events_total counter",
+    ]
+    for evento, n in sorted(login_rate_limiter.metricas().items()):
+        lineas.append(f'login_events_total{{evento="{evento}"}} {n}')
+    lineas += [
+        "# HELP notificaciones_events_total Envíos del despachador de notificaciones",
+        "# TYPE notificaciones_events_total counter",
+    ]
+    for evento, n in sorted(despachador_notificaciones.metricas().items()):
+        lineas.append(f'notificaciones_events_total{{evento="{evento}"}} {n}')
+    lineas += _lineas_pools()
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,123 @@
+import threading
+import time
+from typing import Dict, List
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+# Límites superiores (ms) del histograma de espera por conexión
+BUCKETS_ESPERA_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+class EstadisticasPool:
+    """Contadores de un pool de conexiones (por proceso)"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.conexiones_nuevas = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self.histograma: List[int] = [0] * (len(BUCKETS_ESPERA_MS) + 1)
+
+    def registrar_espera(self, ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total_ms += ms
+            self.espera_max_ms = max(self.espera_max_ms, ms)
+            for i, limite in enumerate(BUCKETS_ESPERA_MS):
+                if ms <= limite:
+                    self.histograma[i] += 1
+                    break
+            else:
+                self.histograma[-1] += 1
+
+    def registrar_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def registrar_conexion(self) -> None:
+        with self._lock:
+            self.conexiones_nuevas += 1
+
+    def snapshot(self, pool: Pool) -> Dict:
+        with self._lock:
+            datos = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "conexiones_nuevas": self.conexiones_nuevas,
+                "espera_promedio_ms": round(self.espera_total_ms / self.checkouts, 3) if self.checkouts else 0,
+                "espera_max_ms": round(self.espera_max_ms, 3),
+                "espera_total_ms": round(self.espera_total_ms, 3),
+                "histograma_espera_ms": {
+                    **{f"le_{limite}": n for limite, n in zip(BUCKETS_ESPERA_MS, self.histograma)},
+                    "mayor": self.histograma[-1]
+                }
+            }
+
+        # Estado actual (solo disponible en pools con cola)
+        for campo in ("size", "checkedout", "checkedin"):
+            metodo = getattr(pool, campo, None)
+            if callable(metodo):
+                datos[campo] = metodo()
+        if callable(getattr(pool, "overflow", None)):
+            # QueuePool.overflow() es negativo mientras no se use el overflow
+            datos["overflow_en_uso"] = max(0, pool.overflow())
+        datos["pool_timeout_s"] = getattr(pool, "_timeout", None)
+        datos["max_overflow"] = getattr(pool, "_max_overflow", None)
+        datos["pool_class"] = type(pool).__bases__[-1].__name__
+        return datos
+
+class PoolInstrumentado:
+    """
+    Mixin que mide cuánto espera cada checkout y cuenta los timeouts
+
+    Se mezcla con QueuePool / AsyncAdaptedQueuePool; _do_get es el punto
+    donde el pool bloquea cuando no hay conexiones libres.
+    """
+
+    estadisticas: EstadisticasPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except PoolTimeoutError:
+            self.estadisticas.registrar_timeout()
+            raise
+        self.estadisticas.registrar_espera((time.perf_counter() - inicio) * 1000)
+        return conexion
+
+def pool_instrumentado(base: type, nombre: str) -> type:
+    """Crea la subclase instrumentada; recreate() la conserva al hacer dispose"""
+    estadisticas = EstadisticasPool(nombre)
+    return type(f"{base.__name__}Instrumentado", (PoolInstrumentado, base), {"estadisticas": estadisticas})
+
+# Engines registrados para el endpoint de métricas
+_engines: Dict[str, Engine] = {}
+
+def registrar_engine(nombre: str, engine: Engine) -> None:
+    """Registra un engine (para async usar engine.sync_engine)"""
+    _engines[nombre] = engine
+    clase = type(engine.pool)
+    if issubclass(clase, PoolInstrumentado):
+        @event.listens_for(engine, "connect")
+        def _al_conectar(dbapi_connection, connection_record):
+            clase.estadisticas.registrar_conexion()
+
+def desregistrar_engine(nombre: str) -> None:
+    """Quita un engine descartado (instituciones fuera de la caché de engines)"""
+    _engines.pop(nombre, None)
+
+def estadisticas_pools() -> Dict[str, Dict]:
+    """Snapshot de todos los pools registrados"""
+    resultado = {}
+    for nombre, engine in list(_engines.items()):
+        pool = engine.pool
+        if isinstance(pool, PoolInstrumentado):
+            resultado[nombre] = pool.estadisticas.snapshot(pool)
+        else:
+            resultado[nombre] = {"pool_class": type(pool).__name__}
+    return resultado
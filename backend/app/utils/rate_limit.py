@@ -0,0 +1,199 @@
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class RateLimitBackend(ABC):
+    """
+    Almacenamiento de los token buckets
+
+    consumir() retira un token del bucket de la clave y devuelve 0 si se
+    permitió el intento, o los segundos que faltan para el próximo token.
+    """
+
+    # True si consumir() hace E/S de red: desde código async se llama en el threadpool
+    bloqueante = False
+
+    @abstractmethod
+    def consumir(self, clave: str, capacidad: int, recarga_por_segundo: float) -> float:
+        ...
+
+class MemoriaBackend(RateLimitBackend):
+    """Buckets en memoria del proceso (un worker)"""
+
+    def __init__(self, max_claves: int = 100_000):
+        self.max_claves = max_claves
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, clave: str, capacidad: int, recarga_por_segundo: float) -> float:
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultimo = self._buckets.pop(clave, (float(capacidad), ahora))
+            tokens = min(float(capacidad), tokens + (ahora - ultimo) * recarga_por_segundo)
+
+            if tokens >= 1:
+                tokens -= 1
+                espera = 0.0
+            else:
+                espera = (1 - tokens) / recarga_por_segundo
+
+            # LRU acotado para que rotar IPs/correos no agote la memoria
+            self._buckets[clave] = (tokens, ahora)
+            if len(self._buckets) > self.max_claves:
+                self._buckets.popitem(last=False)
+
+        return espera
+
+class RedisBackend(RateLimitBackend):
+    """
+    Buckets compartidos entre workers/instancias en Redis
+
+    Las operaciones tienen timeout (REDIS_TIMEOUT_SEGUNDOS). Si Redis falla o
+    no responde, el login no se cae: durante RESPALDO_SEGUNDOS se usan
+    buckets en memoria de este worker (límite por worker, como el backend
+    memoria) y después se vuelve a intentar con Redis.
+    """
+
+    RESPALDO_SEGUNDOS = 30
+    bloqueante = True
+
+    SCRIPT = """
+    local capacidad = tonumber(ARGV[1])
+    local recarga = tonumber(ARGV[2])
+    local ahora = tonumber(ARGV[3])
+    local datos = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(datos[1]) or capacidad
+    local ts = tonumber(datos[2]) or ahora
+    tokens = math.min(capacidad, tokens + math.max(0, ahora - ts) * recarga)
+    local espera = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        espera = (1 - tokens) / recarga
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', ahora)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / recarga) + 1)
+    return tostring(espera)
+    """
+
+    def __init__(self, url: str, prefijo: str = "login_rl:"):
+        # Dependencia opcional: solo se necesita con LOGIN_RATE_LIMIT_BACKEND=redis
+        if redis is None:
+            raise RuntimeError(
+                "LOGIN_RATE_LIMIT_BACKEND=redis requiere el paquete redis: pip install redis"
+            )
+        self.prefijo = prefijo
+        self._cliente = redis.Redis.from_url(
+            url,
+            socket_timeout=settings.REDIS_TIMEOUT_SEGUNDOS,
+            socket_connect_timeout=settings.REDIS_TIMEOUT_SEGUNDOS
+        )
+        self._script = self._cliente.register_script(self.SCRIPT)
+        self._respaldo = MemoriaBackend()
+        self._respaldo_hasta = 0.0
+
+    def consumir(self, clave: str, capacidad: int, recarga_por_segundo: float) -> float:
+        if time.monotonic() < self._respaldo_hasta:
+            return self._respaldo.consumir(clave, capacidad, recarga_por_segundo)
+        try:
+            espera = self._script(
+                keys=[self.prefijo + clave],
+                args=[capacidad, recarga_por_segundo, time.time()]
+            )
+        except redis.RedisError as e:
+            logger.warning(
+                "Redis no disponible para el límite de login (%s); buckets en memoria por %d s", e, self.RESPALDO_SEGUNDOS
+            )
+            self._respaldo_hasta = time.monotonic() + self.RESPALDO_SEGUNDOS
+            return self._respaldo.consumir(clave, capacidad, recarga_por_segundo)
+        return float(espera)
+
+class LoginRateLimiter:
+    """
+    Limita los intentos de login por correo y por IP antes de tocar la
+    base de datos o calcular bcrypt
+    """
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, int] = {
+            "intentos": 0,
+            "bloqueados_ip": 0,
+            "bloqueados_correo": 0
+        }
+
+    def _contar(self, nombre: str) -> None:
+        with self._lock:
+            self._metricas[nombre] += 1
+
+    def verificar(self, correo: str, ip: Optional[str]) -> None:
+        """Consume un token de cada bucket o responde 429 con Retry-After"""
+        self._contar("intentos")
+
+        if ip:
+            espera = self.backend.consumir(
+                f"ip:{ip}",
+                settings.LOGIN_LIMITE_IP_CAPACIDAD,
+                settings.LOGIN_LIMITE_IP_POR_MINUTO / 60
+            )
+            if espera > 0:
+                self._contar("bloqueados_ip")
+                self._rechazar(espera)
+
+        espera = self.backend.consumir(
+            f"correo:{correo.strip().lower()}",
+            settings.LOGIN_LIMITE_CORREO_CAPACIDAD,
+            settings.LOGIN_LIMITE_CORREO_POR_MINUTO / 60
+        )
+        if espera > 0:
+            self._contar("bloqueados_correo")
+            self._rechazar(espera)
+
+    async def verificar_async(self, correo: str, ip: Optional[str]) -> None:
+        """verificar() para rutas async: con un backend de red no bloquea el event loop"""
+        if self.backend.bloqueante:
+            await run_in_threadpool(self.verificar, correo, ip)
+        else:
+            self.verificar(correo, ip)
+
+    @staticmethod
+    def _rechazar(espera: float) -> None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos de inicio de sesión. Intenta de nuevo más tarde.",
+            headers={"Retry-After": str(max(1, math.ceil(espera)))}
+        )
+
+    def metricas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metricas)
+
+def obtener_ip_cliente(request: Request) -> Optional[str]:
+    """IP del cliente; solo usa X-Forwarded-For detrás de un proxy de confianza"""
+    if settings.LOGIN_CONFIAR_X_FORWARDED_FOR:
+        reenviada = request.headers.get("x-forwarded-for")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+def _crear_backend() -> RateLimitBackend:
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    return MemoriaBackend()
+
+login_rate_limiter = LoginRateLimiter(_crear_backend())
@@ -0,0 +1,70 @@
+"""
+Camino rápido de serialización JSON (RESPUESTAS_RAPIDAS)
+
+FastAPI pasa todo lo que devuelve una ruta por jsonable_encoder y luego por
+json.dumps; con response_model además valida y vuelve a serializar cada
+fila. Las rutas calientes devuelven en su lugar una Response ya
+serializada:
+
+- dicts (alertas, métricas): orjson directamente, que conoce datetime,
+  Enum y los tipos básicos sin pasar por jsonable_encoder
+- filas de columnas con response_model (historial): la consulta trae
+  exactamente los campos del modelo, con sus tipos, así que se codifican
+  fila a fila sin volver a validarlas
+
+El JSON resultante es el mismo que el del camino estándar; con la opción
+desactivada (o sin orjson) las funciones devuelven el contenido tal cual y
+FastAPI lo serializa como siempre.
+"""
+import logging
+from typing import Any, Dict, Optional, Sequence
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from sqlalchemy.engine import Row
+from app.config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia de requirements.txt
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def respuestas_rapidas() -> bool:
+    return settings.RESPUESTAS_RAPIDAS and orjson is not None
+
+def clase_respuesta_por_defecto() -> type:
+    """Clase de respuesta de la app: orjson también para las rutas sin camino rápido"""
+    if settings.RESPUESTAS_RAPIDAS and orjson is None:
+        logger.warning("RESPUESTAS_RAPIDAS activo pero orjson no está instalado; se usa json estándar")
+    return ORJSONResponse if respuestas_rapidas() else JSONResponse
+
+def json_directo(contenido: Any, status_code: int = 200, encabezados: Optional[Dict[str, str]] = None) -> Any:
+    """dicts y listas de tipos básicos, datetime y Enum"""
+    if respuestas_rapidas():
+        return Response(
+            orjson.dumps(contenido, option=orjson.OPT_NON_STR_KEYS),
+            status_code=status_code,
+            headers=encabezados,
+            media_type="application/json"
+        )
+    if encabezados:
+        # Igual que la serialización de FastAPI, pero con los encabezados
+        return JSONResponse(jsonable_encoder(contenido), status_code=status_code, headers=encabezados)
+    return contenido
+
+def json_filas(filas: Sequence[Row], status_code: int = 200) -> Any:
+    """
+    Filas de un select con las columnas del response_model, en su orden
+
+    La ruta conserva su response_model para la documentación y para el
+    camino estándar, que valida cada Row por atributos; al devolver una
+    Response, FastAPI no vuelve a validarla.
+    """
+    if not respuestas_rapidas():
+        return filas
+    return Response(
+        orjson.dumps([fila._asdict() for fila in filas]),
+        status_code=status_code,
+        media_type="application/json"
+    )
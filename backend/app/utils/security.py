@@ -1,15 +1,17 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.config.settings import settings
-from app.config.database import get_db
+from app.config.database import get_db, leer_de_primario, motores
+from app.config.instituciones import PREDETERMINADA, institucion_actual
 from app.models.usuario import Usuario
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Usuario:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Usuario:
     """Obtiene el usuario actual desde el token JWT"""
     
     credentials_exception = HTTPException(
@@ -23,11 +25,20 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         correo = payload.get("sub")
         if not correo or not isinstance(correo, str):
             raise credentials_exception
+        # Un token solo vale en su institución (los previos al claim, en la predeterminada)
+        if payload.get("inst", PREDETERMINADA.clave) != institucion_actual().clave:
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    usuario = db.query(Usuario).filter(Usuario.correo_institucional == correo).first()
-    
+    result = await db.execute(select(Usuario).where(Usuario.correo_institucional == correo))
+    usuario = result.scalars().first()
+    # Devolver la conexión al pool ya: get_read_db abre otra sesión y, si
+    # cada request retiene dos conexiones, con la mitad del pool en vuelo
+    # los requests se bloquean esperándose entre sí hasta pool_timeout.
+    # expire_on_commit=False: el usuario sigue cargado y en la sesión
+    await db.commit()
+
     if usuario is None:
         raise credentials_exception
     
@@ -42,7 +53,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 def require_role(roles: List[str]):
     """Decorador para requerir roles específicos"""
     
-    def role_checker(current_user: Usuario = Depends(get_current_user)):
+    async def role_checker(current_user: Usuario = Depends(get_current_user)):
         if current_user.rol.value not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -51,3 +62,23 @@ def require_role(roles: List[str]):
         return current_user
     
     return role_checker
+
+async def get_read_db(current_user: Usuario = Depends(get_current_user)):
+    """
+    Sesión de solo lectura: réplica si está configurada, salvo que el
+    usuario haya escrito recientemente (read-your-writes)
+    """
+    actuales = motores()
+    fabrica = actuales.AsyncSessionLocal if leer_de_primario(current_user.id) else actuales.AsyncReadSessionLocal
+    async with fabrica() as db:
+        yield db
+
+def get_sync_read_db(current_user: Usuario = Depends(get_current_user)):
+    """Variante sync de get_read_db para rutas que corren en el threadpool"""
+    actuales = motores()
+    fabrica = actuales.SessionLocal if leer_de_primario(current_user.id) else actuales.ReadSessionLocal
+    db = fabrica()
+    try:
+        yield db
+    finally:
+        db.close()
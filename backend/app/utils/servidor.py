@@ -0,0 +1,68 @@
+"""
+Integración con gunicorn para el modo de producción (ver gunicorn.conf.py)
+
+Solo lo importa gunicorn: la app no depende de gunicorn en desarrollo.
+"""
+import logging
+import os
+from uvicorn.workers import UvicornWorker
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def numero_workers() -> int:
+    """WEB_WORKERS, o uno por CPU: los workers uvicorn son async y no necesitan 2n+1"""
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    return max(1, len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+
+class WorkerBienestar(UvicornWorker):
+    """
+    Worker uvicorn con drenaje acotado
+
+    UvicornWorker no le pasa a uvicorn un límite para el apagado: con un
+    request colgado, uvicorn esperaría hasta que gunicorn lo matara con
+    SIGKILL al vencer graceful_timeout, sin llegar al shutdown del
+    lifespan (y se perderían los last_login del buffer). Con
+    timeout_graceful_shutdown uvicorn cancela lo que quede tras
+    WEB_DRENAJE_SEGUNDOS y el lifespan alcanza a escribir los buffers.
+    """
+
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": settings.WEB_DRENAJE_SEGUNDOS}
+
+def al_iniciar(server) -> None:
+    """when_ready: en el proceso padre, con la app ya precargada y antes del fork"""
+    from app.utils.calentamiento import precargar_modulos
+
+    precargar_modulos()
+    if settings.BCRYPT_CALIBRAR_AL_INICIO:
+        # Una sola calibración para todos los workers (la heredan en el fork)
+        from app.services.auth_service import pwd_context
+        from app.utils.bcrypt_policy import calibrar_una_vez
+
+        server.log.info("bcrypt calibrado en %d rounds", calibrar_una_vez(pwd_context))
+    from app.utils.metricas_compartidas import metricas_compartidas
+
+    server.log.info("Métricas de los workers en %s", metricas_compartidas.preparar())
+    server.log.info("App precargada; lanzando %d workers", server.num_workers)
+
+def tras_fork(server, worker) -> None:
+    """post_fork: el worker no reutiliza conexiones abiertas por el padre"""
+    from app.config.database import reiniciar_tras_fork
+
+    reiniciar_tras_fork()
+
+def al_terminar_worker(server, worker) -> None:
+    """child_exit: en el proceso padre, los contadores del worker pasan al acumulado de /metrics"""
+    from app.utils.metricas_compartidas import metricas_compartidas
+
+    try:
+        metricas_compartidas.acumular_worker(worker.pid)
+    except OSError:
+        server.log.exception("No se pudieron acumular las métricas del worker %s", worker.pid)
+
+def al_salir(server) -> None:
+    """on_exit: en el proceso padre, tras detener los workers"""
+    from app.utils.metricas_compartidas import metricas_compartidas
+
+    metricas_compartidas.limpiar()
@@ -0,0 +1,142 @@
+"""
+Stack sync de referencia para el benchmark async vs sync
+
+Replica crear_encuesta y obtener_metricas tal como funcionaban antes de
+migrar a AsyncSession: rutas `def` con la Session sync, que FastAPI
+ejecuta en el threadpool (40 hilos por defecto).
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+from app.config.database import get_sync_db
+from app.config.settings import settings
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.respuesta import Respuesta
+from app.models.usuario import Usuario
+from app.schemas.encuesta import EncuestaCreate, EncuestaResponse
+from app.services.who5_service import WHO5Service
+
+app = FastAPI(title="Benchmark stack sync")
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_sync_db)) -> Usuario:
+    try:
+        correo = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    usuario = db.execute(select(Usuario).where(Usuario.correo_institucional == correo)).scalars().first()
+    if usuario is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return usuario
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+@app.post("/api/encuestas/", response_model=EncuestaResponse, status_code=status.HTTP_201_CREATED)
+def crear_encuesta(
+    data: EncuestaCreate,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_sync_db)
+):
+    valores = [r.valor for r in sorted(data.respuestas, key=lambda x: x.pregunta_numero)]
+    puntaje_raw = WHO5Service.calcular_puntaje_raw(valores)
+    puntaje_final = WHO5Service.calcular_puntaje_final(puntaje_raw)
+    es_alerta = WHO5Service.es_alerta(puntaje_final)
+
+    ahora = datetime.utcnow()
+    encuesta = Encuesta(
+        usuario_id=current_user.id,
+        created_at=ahora,
+        completed_at=ahora,
+        puntaje_raw=puntaje_raw,
+        puntaje_final=puntaje_final,
+        es_alerta=es_alerta,
+        comentario=data.comentario,
+        estado="completada",
+        respuestas=[
+            Respuesta(pregunta_numero=r.pregunta_numero, valor=r.valor)
+            for r in data.respuestas
+        ]
+    )
+    if es_alerta:
+        encuesta.alerta = Alerta(
+            usuario_id=current_user.id,
+            puntaje_obtenido=puntaje_final,
+            prioridad="alta" if puntaje_final < 10 else "media",
+            estado="pendiente"
+        )
+    db.add(encuesta)
+
+    db.commit()
+    db.refresh(encuesta)
+    return encuesta
+
+@app.get("/api/dashboard/metricas")
+def obtener_metricas(
+    periodo: str = "30d",
+    tipo_usuario: Optional[str] = None,
+    programa: Optional[str] = None,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_sync_db)
+):
+    dias = {"7d": 7, "30d": 30, "90d": 90}.get(periodo)
+    fecha_desde = datetime.utcnow() - timedelta(days=dias) if dias else None
+
+    filtros_usuario = []
+    if tipo_usuario:
+        filtros_usuario.append(Usuario.tipo_usuario == tipo_usuario)
+    if programa:
+        filtros_usuario.append(Usuario.programa == programa)
+
+    query_encuestas = select(func.count(Encuesta.id))
+    if filtros_usuario:
+        query_encuestas = query_encuestas.join(Usuario).where(*filtros_usuario)
+    if fecha_desde:
+        query_encuestas = query_encuestas.where(Encuesta.created_at >= fecha_desde)
+
+    total_usuarios = db.execute(select(func.count(Usuario.id)).where(*filtros_usuario)).scalar_one()
+    total_encuestas = db.execute(query_encuestas).scalar_one()
+    usuarios_han_respondido = db.execute(
+        select(func.count(func.distinct(Usuario.id))).join(Encuesta).where(*filtros_usuario)
+    ).scalar_one()
+    distribucion = db.execute(
+        select(
+            func.avg(Encuesta.puntaje_final).label("promedio"),
+            func.sum(case((Encuesta.puntaje_final < 13, 1), else_=0)).label("alerta"),
+            func.sum(case((and_(Encuesta.puntaje_final >= 13, Encuesta.puntaje_final < 51), 1), else_=0)).label("bajo"),
+            func.sum(case((and_(Encuesta.puntaje_final >= 51, Encuesta.puntaje_final < 76), 1), else_=0)).label("medio"),
+            func.sum(case((Encuesta.puntaje_final >= 76, 1), else_=0)).label("alto")
+        ).where(Encuesta.completed_at.isnot(None))
+    ).one()
+    conteo_alertas = db.execute(
+        select(
+            func.sum(case((Alerta.estado != "resuelta", 1), else_=0)).label("activas"),
+            func.sum(case((Alerta.estado == "pendiente", 1), else_=0)).label("pendientes"),
+            func.sum(case((Alerta.estado == "resuelta", 1), else_=0)).label("resueltas")
+        )
+    ).one()
+
+    return {
+        "total_usuarios": total_usuarios,
+        "total_encuestas": total_encuestas,
+        "tasa_participacion": round(usuarios_han_respondido / total_usuarios * 100, 2) if total_usuarios else 0,
+        "puntaje_promedio": round(float(distribucion.promedio or 0), 2),
+        "alertas": {
+            "activas": conteo_alertas.activas or 0,
+            "pendientes": conteo_alertas.pendientes or 0,
+            "resueltas": conteo_alertas.resueltas or 0
+        },
+        "distribucion_puntajes": {
+            "alerta_0_12": distribucion.alerta or 0,
+            "bajo_13_50": distribucion.bajo or 0,
+            "medio_51_75": distribucion.medio or 0,
+            "alto_76_100": distribucion.alto or 0
+        }
+    }
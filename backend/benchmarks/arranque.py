@@ -0,0 +1,82 @@
+"""
+Benchmark de arranque en frío por worker
+
+Uso:
+    python -m benchmarks.arranque --repeticiones 10 [--detalle]
+
+Cada repetición lanza un intérprete nuevo que importa app.main y ejecuta
+el lifespan de startup, como hace un worker recién creado. Con --detalle
+muestra los módulos que más tardan en importarse (python -X importtime).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from benchmarks.comun import DIRECTORIO_BACKEND, percentil
+
+CODIGO_WORKER = """
+import json, time
+inicio = time.perf_counter()
+import app.main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app):
+    listo = time.perf_counter()
+print(json.dumps({"import_ms": (importado - inicio) * 1000, "startup_ms": (listo - importado) * 1000}))
+"""
+
+def medir_arranque() -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", CODIGO_WORKER],
+        cwd=DIRECTORIO_BACKEND, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+def imports_mas_lentos(top: int = 15) -> list:
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=DIRECTORIO_BACKEND, capture_output=True, text=True, check=True
+    )
+    filas = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        partes = [p.strip() for p in linea[len("import time:"):].split("|")]
+        if partes[1].isdigit():
+            filas.append((int(partes[1]) / 1000, partes[2].strip()))
+    return sorted(filas, reverse=True)[:top]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío de un worker")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--detalle", action="store_true", help="Mostrar los imports más lentos")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    muestras = [medir_arranque() for _ in range(args.repeticiones)]
+    resultado = {}
+    for campo in ("import_ms", "startup_ms"):
+        valores = [m[campo] for m in muestras]
+        resultado[campo] = {
+            "mediana": round(statistics.median(valores), 1),
+            "p95": round(percentil(valores, 95), 1),
+            "min": round(min(valores), 1)
+        }
+
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        print(f"Arranque en frío ({args.repeticiones} repeticiones)")
+        for campo, datos in resultado.items():
+            print(f"  {campo:<11} mediana {datos['mediana']:>8} ms   p95 {datos['p95']:>8} ms   min {datos['min']:>8} ms")
+
+    if args.detalle:
+        print("Imports acumulados más lentos:")
+        for ms, modulo in imports_mas_lentos():
+            print(f"  {ms:>8.1f} ms  {modulo}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Benchmark: requests por segundo del stack async frente al sync de referencia
+
+Uso (desde backend/, con la base de datos de DATABASE_URL disponible):
+    python -m benchmarks.async_vs_sync --concurrencia 100 --duracion 15
+
+Levanta app.main:app (AsyncSession + asyncpg) y benchmarks.app_sync:app
+(Session sync en el threadpool) y mide crear_encuesta y obtener_metricas
+con la misma concurrencia.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from benchmarks.comun import generar_carga, preparar_usuario_benchmark, servidor
+
+STACKS = {
+    "async": "app.main:app",
+    "sync": "benchmarks.app_sync:app",
+}
+
+async def _crear_encuesta(cliente):
+    return await cliente.post("/api/encuestas/", json={
+        "respuestas": [{"pregunta_numero": i, "valor": random.randint(0, 5)} for i in range(1, 6)]
+    })
+
+async def _obtener_metricas(cliente):
+    return await cliente.get("/api/dashboard/metricas", params={"periodo": "30d"})
+
+ESCENARIOS = {
+    "crear_encuesta": _crear_encuesta,
+    "obtener_metricas": _obtener_metricas,
+}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara el stack async con el sync")
+    parser.add_argument("--concurrencia", type=int, default=100)
+    parser.add_argument("--duracion", type=float, default=15.0)
+    parser.add_argument("--puerto", type=int, default=8100)
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    args = parser.parse_args(argv)
+
+    headers = {"Authorization": f"Bearer {preparar_usuario_benchmark()}"}
+    resultados = {}
+
+    for i, (stack, app_path) in enumerate(STACKS.items()):
+        with servidor(app_path, args.puerto + i) as base_url:
+            resultados[stack] = {}
+            for nombre, escenario in ESCENARIOS.items():
+                resultados[stack][nombre] = asyncio.run(
+                    generar_carga(escenario, base_url, args.concurrencia, args.duracion, headers)
+                )
+
+    print(f"{'escenario':<18}{'stack':<8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for nombre in ESCENARIOS:
+        for stack in STACKS:
+            r = resultados[stack][nombre]
+            print(f"{nombre:<18}{stack:<8}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errores']:>9}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"concurrencia": args.concurrencia, "duracion": args.duracion, "resultados": resultados}, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
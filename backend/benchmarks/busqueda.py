@@ -0,0 +1,185 @@
+"""
+Latencia de la búsqueda de texto sobre comentarios y notas de atención
+
+Uso (desde backend/, con la base migrada a la última versión):
+    python -m benchmarks.busqueda [--comentarios 300000] [--repeticiones 30] [--umbral-ms 100]
+
+Siembra encuestas con comentarios sintéticos (idempotente, documentos con
+prefijo BUSQ) armados con un vocabulario de frecuencias muy distintas, de
+modo que haya términos frecuentes, raros y combinaciones; después ejecuta
+VACUUM ANALYZE y mide BusquedaService.consulta (primera página y la siguiente por
+cursor) con y sin filtros. Informa p50/p95 por caso y sale con código 1 si
+algún p95 supera --umbral-ms.
+
+En PostgreSQL la búsqueda siempre parte del índice GIN, así que el tiempo
+crece con el número de coincidencias y no con el tamaño de la tabla: el
+caso "frecuente" es el peor y "sin_resultados" debe quedar en pocos ms.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import func, insert, select, text
+from app.config.catalogos import PROGRAMAS
+from app.config.database import engine
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario, TipoUsuario, TipoDocumento, Rol
+from app.services.busqueda_service import BusquedaService
+from app.services.particiones_service import ParticionesService
+from benchmarks.comun import percentil
+
+PREFIJO_DOCUMENTO = "BUSQ"
+ENCUESTAS_POR_USUARIO = 20
+LOTE = 5_000
+
+# (frase, peso): la mayoría son frases neutras que nadie busca; entre las
+# buscadas hay una frecuente (~10 % de los comentarios) y otras cada vez más raras
+FRASES = [
+    ("todo bien por ahora", 14),
+    ("sin novedades esta semana", 12),
+    ("gracias por preguntar", 10),
+    ("la encuesta es corta y clara", 8),
+    ("el semestre va normal", 8),
+    ("me gustan mis materias", 6),
+    ("me siento cansado", 4),
+    ("tengo mucha ansiedad por los exámenes", 3),
+    ("duermo poco entre semana", 2),
+    ("problemas con mi familia", 1.5),
+    ("preocupaciones económicas por el trabajo", 1),
+    ("me cuesta concentrarme en clase", 1),
+    ("pensé en abandonar la carrera", 0.5),
+    ("tuve una cirugía y estoy en recuperación", 0.2),
+    ("me diagnosticaron hipotiroidismo", 0.05),
+]
+
+CASOS = [
+    ("frecuente", "cansado", {}),
+    ("prefijo", "ansie", {}),
+    ("dos_terminos", "familia problemas", {}),
+    ("raro", "hipotiroidismo", {}),
+    ("sin_resultados", "xilófono", {}),
+    ("con_programa", "concentrarme", {"programa": PROGRAMAS[0]}),
+]
+
+def sembrar_comentarios(comentarios: int, semilla: int = 7) -> int:
+    """Inserta usuarios y encuestas con comentario hasta llegar a `comentarios`"""
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow()
+    frases, pesos = zip(*FRASES)
+
+    with engine.begin() as conn:
+        existentes = conn.execute(
+            select(func.count(Encuesta.id))
+            .join(Usuario, Usuario.id == Encuesta.usuario_id)
+            .where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"))
+        ).scalar_one()
+        if existentes >= comentarios:
+            return 0
+
+        ParticionesService.asegurar_particiones(conn, 0, desde=ahora - timedelta(days=730))
+
+        desde_usuario = existentes // ENCUESTAS_POR_USUARIO
+        hasta_usuario = -(-comentarios // ENCUESTAS_POR_USUARIO)
+        filas_usuarios = [
+            {
+                "tipo_usuario": TipoUsuario.ESTUDIANTE,
+                "nombres": "Busqueda",
+                "apellidos": f"Sintético {i}",
+                "tipo_documento": TipoDocumento.CC,
+                "numero_documento": f"{PREFIJO_DOCUMENTO}{i:08d}",
+                "correo_institucional": f"busq{i}@estudiantes.uniempresarial.edu.co",
+                # Hash inválido a propósito: estos usuarios no inician sesión
+                "password_hash": "!",
+                "rol": Rol.USER,
+                "programa": rnd.choice(PROGRAMAS),
+                "consent_accepted": True,
+                "created_at": ahora - timedelta(days=730),
+                "is_active": True
+            }
+            for i in range(desde_usuario, hasta_usuario)
+        ]
+        ids_usuarios = conn.execute(
+            insert(Usuario.__table__).returning(Usuario.__table__.c.id), filas_usuarios
+        ).scalars().all()
+
+        filas = []
+        insertadas = 0
+        for usuario_id in ids_usuarios:
+            for _ in range(ENCUESTAS_POR_USUARIO):
+                creada = ahora - timedelta(days=rnd.uniform(0, 730))
+                filas.append({
+                    "usuario_id": usuario_id,
+                    "created_at": creada,
+                    "started_at": creada,
+                    "completed_at": creada + timedelta(minutes=3),
+                    "puntaje_raw": 15,
+                    "puntaje_final": 60,
+                    "es_alerta": False,
+                    "estado": "completada",
+                    "comentario": ". ".join(rnd.choices(frases, weights=pesos, k=rnd.randint(1, 3))).capitalize()
+                })
+                if len(filas) == LOTE:
+                    conn.execute(insert(Encuesta.__table__), filas)
+                    insertadas += len(filas)
+                    filas = []
+        if filas:
+            conn.execute(insert(Encuesta.__table__), filas)
+            insertadas += len(filas)
+
+    # VACUUM además vacía la lista pendiente de los índices GIN (fastupdate),
+    # que tras una carga masiva haría las primeras búsquedas más lentas
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE" if conn.dialect.name == "postgresql" else "ANALYZE"))
+    return insertadas
+
+def medir_caso(conn, dialecto: str, texto_busqueda: str, filtros: Dict, repeticiones: int) -> Dict:
+    """p50/p95 de la primera página y de la siguiente (por cursor)"""
+    terminos = BusquedaService.terminos(texto_busqueda)
+    tiempos: Dict[str, List[float]] = {"pagina_1": [], "pagina_2": []}
+    filas = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = conn.execute(BusquedaService.consulta(dialecto, terminos, filtros=filtros)).all()
+        tiempos["pagina_1"].append((time.perf_counter() - inicio) * 1000)
+    if len(filas) > 20:
+        cursor = BusquedaService.leer_cursor(BusquedaService.cursor(filas[19]))
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            conn.execute(BusquedaService.consulta(dialecto, terminos, filtros=filtros, cursor=cursor)).all()
+            tiempos["pagina_2"].append((time.perf_counter() - inicio) * 1000)
+    return {
+        pagina: {"p50_ms": round(percentil(valores, 50), 2), "p95_ms": round(percentil(valores, 95), 2)}
+        for pagina, valores in tiempos.items() if valores
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mide la latencia de la búsqueda de texto")
+    parser.add_argument("--comentarios", type=int, default=300_000)
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--umbral-ms", type=float, default=100.0, help="p95 máximo por caso")
+    parser.add_argument("--sin-sembrar", action="store_true", help="Usar los datos existentes")
+    args = parser.parse_args(argv)
+
+    if not args.sin_sembrar:
+        creadas = sembrar_comentarios(args.comentarios)
+        if creadas:
+            print(f"Sembradas {creadas} encuestas con comentario", file=sys.stderr)
+
+    lentos = 0
+    with engine.connect() as conn:
+        dialecto = conn.dialect.name
+        for nombre, texto_busqueda, filtros in CASOS:
+            for pagina, medidas in medir_caso(conn, dialecto, texto_busqueda, filtros, args.repeticiones).items():
+                lento = medidas["p95_ms"] > args.umbral_ms
+                lentos += lento
+                print(
+                    f"[{'LENTO' if lento else 'OK'}] {nombre:<15} {pagina}  "
+                    f"p50 {medidas['p50_ms']:>8.2f} ms  p95 {medidas['p95_ms']:>8.2f} ms"
+                )
+
+    return 1 if lentos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
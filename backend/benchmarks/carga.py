@@ -0,0 +1,197 @@
+"""
+Escenarios de carga contra un servidor local con la población de benchmarks.generador
+
+Uso (desde backend/, después de generar la población):
+    python -m benchmarks.generador --estudiantes 5000 --personal 500 --encuestas 20000
+    python -m benchmarks.carga --duracion 20 --salida resultados/carga.json
+    python -m benchmarks.carga --escenarios login,dashboard --comparar resultados/carga.json
+
+Escenarios:
+    login       avalancha de inicios de sesión de usuarios distintos (bcrypt)
+    envios      ráfaga de encuestas enviadas por estudiantes
+    dashboard   polling de métricas y alertas desde el dashboard
+    exportacion descargas del Excel completo, con baja concurrencia
+
+Cada escenario corre en bucle cerrado durante `--duracion` segundos y
+reporta throughput, latencias p50/p95/p99, tasa de error y códigos de
+estado. La salida es JSON con los metadatos de la corrida (commit, motor,
+tamaño de los datos) para comparar corridas en el tiempo; `--comparar`
+muestra la variación de rps y p95 frente a una corrida anterior.
+
+El servidor confía en X-Forwarded-For y cada login usa una IP distinta,
+como detrás del proxy del campus: así el límite por IP no convierte el
+escenario en una prueba del rate limiter.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from app.config.database import engine
+from app.config.settings import settings
+from app.models.encuesta import Encuesta
+from app.models.usuario import TipoUsuario, Usuario
+from app.services.auth_service import AuthService
+from benchmarks.comun import DIRECTORIO_BACKEND, generar_carga, preparar_usuario_benchmark, servidor
+from benchmarks.generador import CONTRASENA_CARGA, usuarios_generados
+
+# Concurrencia por defecto de cada escenario
+CONCURRENCIA = {
+    "login": 50,
+    "envios": 100,
+    "dashboard": 20,
+    "exportacion": 2,
+}
+
+def _escenario_login(usuarios: List[Dict]) -> Callable:
+    siguiente = itertools.cycle(usuarios).__next__
+
+    async def hacer_request(cliente):
+        usuario = siguiente()
+        return await cliente.post(
+            "/api/auth/login",
+            data={"username": usuario["correo_institucional"], "password": CONTRASENA_CARGA},
+            headers={"X-Forwarded-For": f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"}
+        )
+    return hacer_request
+
+def _escenario_envios(estudiantes: List[Dict]) -> Callable:
+    # Tokens emitidos localmente: el escenario mide el envío, no el login
+    tokens = [
+        AuthService.create_access_token({"sub": u["correo_institucional"], "id": u["id"], "rol": u["rol"]})
+        for u in estudiantes
+    ]
+    siguiente = itertools.cycle(tokens).__next__
+
+    async def hacer_request(cliente):
+        return await cliente.post(
+            "/api/encuestas/",
+            json={"respuestas": [{"pregunta_numero": i, "valor": random.randint(0, 5)} for i in range(1, 6)]},
+            headers={"Authorization": f"Bearer {siguiente()}"}
+        )
+    return hacer_request
+
+def _escenario_dashboard(token_admin: str) -> Callable:
+    from app.config.catalogos import PROGRAMAS
+
+    consultas = itertools.cycle(
+        [("/api/dashboard/metricas", {"periodo": periodo}) for periodo in ("7d", "30d", "90d", "all")]
+        + [("/api/dashboard/metricas", {"periodo": "30d", "programa": programa}) for programa in PROGRAMAS[:3]]
+        + [("/api/dashboard/alertas", {"estado": "activas"})]
+    )
+
+    async def hacer_request(cliente):
+        ruta, parametros = next(consultas)
+        return await cliente.get(ruta, params=parametros, headers={"Authorization": f"Bearer {token_admin}"})
+    return hacer_request
+
+def _escenario_exportacion(token_admin: str) -> Callable:
+    async def hacer_request(cliente):
+        return await cliente.get("/api/dashboard/export/excel", headers={"Authorization": f"Bearer {token_admin}"})
+    return hacer_request
+
+def metadatos() -> Dict:
+    """Contexto de la corrida para poder comparar resultados en el tiempo"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO_BACKEND,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    with engine.connect() as conn:
+        usuarios = conn.execute(select(func.count(Usuario.id))).scalar_one()
+        encuestas = conn.execute(select(func.count(Encuesta.id))).scalar_one()
+    return {
+        "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit,
+        # Solo el motor: la URL completa puede llevar credenciales
+        "motor": make_url(settings.DATABASE_URL).get_backend_name(),
+        "cpus": os.cpu_count(),
+        "usuarios": usuarios,
+        "encuestas": encuestas,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+    }
+
+def comparar(actual: Dict, anterior: Dict) -> List[str]:
+    lineas = []
+    for nombre, resultado in actual["escenarios"].items():
+        previo = anterior.get("escenarios", {}).get(nombre)
+        if not previo:
+            continue
+        variaciones = []
+        for campo in ("rps", "p95_ms", "tasa_error"):
+            if previo.get(campo):
+                variaciones.append(f"{campo} {(resultado[campo] - previo[campo]) / previo[campo] * 100:+.1f}%")
+            else:
+                variaciones.append(f"{campo} {previo.get(campo)} -> {resultado[campo]}")
+        lineas.append(f"{nombre}: " + ", ".join(variaciones))
+    return lineas
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Escenarios de carga con la población sintética")
+    parser.add_argument("--escenarios", default=",".join(CONCURRENCIA), help="Lista separada por comas")
+    parser.add_argument("--duracion", type=float, default=15.0)
+    parser.add_argument("--concurrencia", type=int, default=None, help="Igual para todos los escenarios")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--puerto", type=int, default=8200)
+    parser.add_argument("--salida", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", default=None, help="Resultados JSON de una corrida anterior")
+    args = parser.parse_args(argv)
+
+    escenarios = [nombre.strip() for nombre in args.escenarios.split(",") if nombre.strip()]
+    desconocidos = set(escenarios) - set(CONCURRENCIA)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    usuarios = usuarios_generados(limite=100_000)
+    estudiantes = usuarios_generados(limite=5_000, tipo=TipoUsuario.ESTUDIANTE)
+    if not usuarios:
+        print("Error: no hay población generada (python -m benchmarks.generador)", file=sys.stderr)
+        return 1
+    token_admin = preparar_usuario_benchmark()
+
+    constructores = {
+        "login": lambda: _escenario_login(usuarios),
+        "envios": lambda: _escenario_envios(estudiantes),
+        "dashboard": lambda: _escenario_dashboard(token_admin),
+        "exportacion": lambda: _escenario_exportacion(token_admin),
+    }
+
+    # El subproceso de uvicorn hereda el entorno
+    os.environ["LOGIN_CONFIAR_X_FORWARDED_FOR"] = "true"
+    resultados = {"metadatos": metadatos(), "parametros": vars(args), "escenarios": {}}
+    with servidor("app.main:app", args.puerto, args.workers) as base_url:
+        for nombre in escenarios:
+            concurrencia = args.concurrencia or CONCURRENCIA[nombre]
+            resultado = asyncio.run(generar_carga(constructores[nombre](), base_url, concurrencia, args.duracion))
+            resultado["concurrencia"] = concurrencia
+            resultados["escenarios"][nombre] = resultado
+            print(
+                f"{nombre}: {resultado['rps']} rps, p50 {resultado['p50_ms']} ms, "
+                f"p95 {resultado['p95_ms']} ms, p99 {resultado['p99_ms']} ms, errores {resultado['tasa_error']:.2%}",
+                file=sys.stderr
+            )
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            for linea in comparar(resultados, json.load(f)):
+                print(linea, file=sys.stderr)
+
+    salida = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(salida)
+    print(salida)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Utilidades compartidas por los benchmarks: servidor local, usuario de
+prueba y generación de carga concurrente con httpx
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List
+import httpx
+from app.config.database import SessionLocal
+from app.models.usuario import Usuario, TipoUsuario, TipoDocumento, Rol
+from app.services.auth_service import AuthService
+
+CORREO_BENCHMARK = "benchmark@uniempresarial.edu.co"
+CONTRASENA_BENCHMARK = "Benchmark123"
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def preparar_usuario_benchmark(rol: Rol = Rol.ADMIN) -> str:
+    """Crea (si no existe) un usuario con consentimiento y devuelve su token"""
+    db = SessionLocal()
+    try:
+        usuario = db.query(Usuario).filter(Usuario.correo_institucional == CORREO_BENCHMARK).first()
+        if not usuario:
+            usuario = Usuario(
+                tipo_usuario=TipoUsuario.PERSONAL,
+                nombres="Benchmark",
+                apellidos="Carga",
+                tipo_documento=TipoDocumento.CC,
+                numero_documento="BENCH0001",
+                correo_institucional=CORREO_BENCHMARK,
+                password_hash=AuthService.get_password_hash(CONTRASENA_BENCHMARK),
+                cargo="Otro",
+                rol=rol,
+                consent_accepted=True
+            )
+            db.add(usuario)
+            db.commit()
+            db.refresh(usuario)
+        return AuthService.create_access_token(
+            {"sub": usuario.correo_institucional, "id": usuario.id, "rol": usuario.rol}
+        )
+    finally:
+        db.close()
+
+@contextmanager
+def servidor(app_path: str, puerto: int, workers: int = 1):
+    """Levanta uvicorn en un subproceso y espera a que /health responda"""
+    proceso = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app_path,
+            "--host", "127.0.0.1", "--port", str(puerto),
+            "--workers", str(workers), "--no-access-log", "--log-level", "warning"
+        ],
+        cwd=DIRECTORIO_BACKEND
+    )
+    try:
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            try:
+                if httpx.get(f"http://127.0.0.1:{puerto}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError(f"El servidor {app_path} no arrancó en el puerto {puerto}")
+        yield f"http://127.0.0.1:{puerto}"
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+async def generar_carga(
+    hacer_request: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]],
+    base_url: str,
+    concurrencia: int,
+    duracion: float,
+    headers: Dict[str, str] = None
+) -> Dict:
+    """
+    Ejecuta `concurrencia` clientes en bucle cerrado durante `duracion` segundos
+
+    Returns:
+        Dict con requests, throughput y latencias p50/p95/p99 en ms
+    """
+    latencias: List[float] = []
+    errores = 0
+    estados: Dict[int, int] = {}
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limites, timeout=60) as cliente:
+        fin = time.perf_counter() + duracion
+
+        async def trabajador():
+            nonlocal errores
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await hacer_request(cliente)
+                    estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+                    if respuesta.status_code >= 400:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio_total = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        transcurrido = time.perf_counter() - inicio_total
+
+    total = len(latencias)
+    return {
+        "requests": total,
+        "duracion_s": round(transcurrido, 2),
+        "rps": round(total / transcurrido, 1) if transcurrido else 0,
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "errores": errores,
+        "tasa_error": round(errores / total, 4) if total else 0,
+        "estados": estados
+    }
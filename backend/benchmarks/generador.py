@@ -0,0 +1,261 @@
+"""
+Generador reproducible de una población sintética del campus
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base de pruebas):
+    python -m benchmarks.generador --estudiantes 5000 --personal 500 --encuestas 20000
+    python -m benchmarks.generador --limpiar
+
+Crea estudiantes repartidos entre PROGRAMAS y promociones, personal
+repartido entre CARGOS, y encuestas WHO-5 con sus respuestas y alertas a lo
+largo de los últimos `--meses`. El bienestar de cada persona es un nivel
+latente estable con ruido por encuesta: la mayoría se concentra en
+puntajes medios y una fracción en riesgo (`--proporcion-riesgo`) produce
+casi todas las alertas (puntaje < 13), como en una campaña real, y el
+historial de cada usuario es coherente. Con la misma `--semilla` se
+generan exactamente los mismos datos.
+
+Todos los usuarios comparten la contraseña CONTRASENA_CARGA (un solo hash
+bcrypt) para que los escenarios de benchmarks.carga puedan iniciar sesión.
+Los documentos llevan el prefijo PREFIJO_DOCUMENTO y `--limpiar` los borra.
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import delete, func, insert, select
+from app.config.catalogos import CARGOS, PROGRAMAS
+from app.config.database import engine
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.respuesta import Respuesta
+from app.models.usuario import Rol, TipoDocumento, TipoUsuario, Usuario
+from app.services.auth_service import AuthService
+from app.services.particiones_service import ParticionesService
+from app.services.who5_service import WHO5Service
+
+PREFIJO_DOCUMENTO = "CARGA"
+CONTRASENA_CARGA = "Carga12345"
+LOTE = 5_000
+
+def _por_lotes(filas: List[Dict]):
+    for inicio in range(0, len(filas), LOTE):
+        yield filas[inicio:inicio + LOTE]
+
+def _promociones(ahora: datetime, anios: int = 5) -> List[str]:
+    return [f"{anio}-{semestre}" for anio in range(ahora.year - anios, ahora.year + 1) for semestre in (1, 2)]
+
+def _valores_who5(rnd: random.Random, nivel: float) -> List[int]:
+    """Cinco respuestas 0-5 alrededor del nivel latente de la persona"""
+    return [min(5, max(0, round(rnd.gauss(nivel, 0.9)))) for _ in range(5)]
+
+def generar_usuarios(rnd: random.Random, estudiantes: int, personal: int, ahora: datetime) -> List[Dict]:
+    password_hash = AuthService.get_password_hash(CONTRASENA_CARGA)
+    # Programas con tamaños distintos, como en un campus real
+    pesos_programas = [rnd.uniform(0.5, 2.0) for _ in PROGRAMAS]
+    promociones = _promociones(ahora)
+    filas = []
+    for i in range(estudiantes + personal):
+        estudiante = i < estudiantes
+        fila = {
+            "tipo_usuario": TipoUsuario.ESTUDIANTE if estudiante else TipoUsuario.PERSONAL,
+            "nombres": "Carga",
+            "apellidos": f"Sintético {i}",
+            "tipo_documento": TipoDocumento.CC if rnd.random() < 0.9 else TipoDocumento.TI,
+            "numero_documento": f"{PREFIJO_DOCUMENTO}{i:08d}",
+            "correo_institucional": (
+                f"carga{i}@estudiantes.uniempresarial.edu.co" if estudiante else f"carga{i}@uniempresarial.edu.co"
+            ),
+            "password_hash": password_hash,
+            "rol": Rol.USER,
+            "consent_accepted": rnd.random() < 0.97,
+            "created_at": ahora - timedelta(days=rnd.uniform(30, 1500)),
+            "is_active": True,
+            # executemany exige las mismas claves en todas las filas
+            "programa": None,
+            "promocion": None,
+            "cargo": None,
+        }
+        if estudiante:
+            fila["programa"] = rnd.choices(PROGRAMAS, weights=pesos_programas)[0]
+            fila["promocion"] = rnd.choice(promociones)
+        else:
+            fila["cargo"] = rnd.choice(CARGOS)
+        filas.append(fila)
+    return filas
+
+def _nivel_latente(rnd: random.Random, proporcion_riesgo: float) -> float:
+    if rnd.random() < proporcion_riesgo:
+        return max(0.0, rnd.gauss(0.6, 0.35))
+    return min(5.0, max(0.5, rnd.gauss(3.1, 0.8)))
+
+def generar_encuestas(
+    rnd: random.Random,
+    usuarios: List[int],
+    encuestas: int,
+    meses: int,
+    proporcion_riesgo: float,
+    ahora: datetime
+) -> List[Dict]:
+    """Encuestas con su nivel latente por usuario; solo responden quienes aceptaron el consentimiento"""
+    niveles = {usuario_id: _nivel_latente(rnd, proporcion_riesgo) for usuario_id in usuarios}
+    # Participación desigual: unos pocos responden muchas veces
+    pesos = [rnd.paretovariate(2.0) for _ in usuarios]
+    filas = []
+    for usuario_id in rnd.choices(usuarios, weights=pesos, k=encuestas):
+        creada = ahora - timedelta(days=rnd.uniform(0, meses * 30.4))
+        valores = _valores_who5(rnd, niveles[usuario_id])
+        puntaje_raw = WHO5Service.calcular_puntaje_raw(valores)
+        puntaje_final = WHO5Service.calcular_puntaje_final(puntaje_raw)
+        filas.append({
+            "usuario_id": usuario_id,
+            "created_at": creada,
+            "started_at": creada,
+            "completed_at": creada + timedelta(seconds=rnd.randint(40, 600)),
+            "puntaje_raw": puntaje_raw,
+            "puntaje_final": puntaje_final,
+            "es_alerta": WHO5Service.es_alerta(puntaje_final),
+            "comentario": "Comentario sintético" if rnd.random() < 0.1 else None,
+            "estado": "completada",
+            "valores": valores,
+        })
+    return filas
+
+def sembrar(
+    estudiantes: int,
+    personal: int,
+    encuestas: int,
+    meses: int = 24,
+    proporcion_riesgo: float = 0.06,
+    semilla: int = 42
+) -> Dict:
+    """Inserta la población completa; falla si ya existe una generada"""
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow()
+    with engine.begin() as conn:
+        existentes = conn.execute(
+            select(func.count(Usuario.id)).where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"))
+        ).scalar_one()
+        if existentes:
+            raise ValueError(f"Ya hay {existentes} usuarios generados; usa --limpiar primero")
+
+        ParticionesService.asegurar_particiones(conn, 0, desde=ahora - timedelta(days=meses * 30.4))
+
+        tabla_usuarios = Usuario.__table__
+        filas_usuarios = generar_usuarios(rnd, estudiantes, personal, ahora)
+        usuarios = []
+        for lote in _por_lotes(filas_usuarios):
+            usuarios += conn.execute(
+                insert(tabla_usuarios).returning(tabla_usuarios.c.id, tabla_usuarios.c.consent_accepted), lote
+            ).all()
+        con_consentimiento = [u.id for u in usuarios if u.consent_accepted]
+
+        filas_encuestas = sorted(
+            generar_encuestas(rnd, con_consentimiento, encuestas, meses, proporcion_riesgo, ahora), key=lambda f: f["created_at"]
+        )
+        tabla_encuestas = Encuesta.__table__
+        alertas = respuestas = 0
+        for lote in _por_lotes(filas_encuestas):
+            valores = [fila.pop("valores") for fila in lote]
+            # sort_by_parameter_order: las filas devueltas siguen el orden del lote
+            creadas = conn.execute(
+                insert(tabla_encuestas).returning(
+                    tabla_encuestas.c.id, tabla_encuestas.c.usuario_id,
+                    tabla_encuestas.c.puntaje_final, tabla_encuestas.c.created_at,
+                    sort_by_parameter_order=True
+                ),
+                lote
+            ).all()
+
+            filas_respuestas = [
+                {"encuesta_id": e.id, "encuesta_created_at": e.created_at, "pregunta_numero": n, "valor": valor}
+                for e, valores_encuesta in zip(creadas, valores)
+                for n, valor in enumerate(valores_encuesta, start=1)
+            ]
+            conn.execute(insert(Respuesta.__table__), filas_respuestas)
+            respuestas += len(filas_respuestas)
+
+            antiguedad_resuelta = timedelta(days=21)
+            filas_alertas = [
+                {
+                    "encuesta_id": e.id,
+                    "encuesta_created_at": e.created_at,
+                    "usuario_id": e.usuario_id,
+                    "puntaje_obtenido": e.puntaje_final,
+                    "prioridad": "alta" if e.puntaje_final < 10 else "media",
+                    # Las alertas de hace más de tres semanas ya fueron atendidas
+                    "estado": (
+                        "resuelta" if ahora - e.created_at > antiguedad_resuelta
+                        else rnd.choice(["pendiente", "pendiente", "en_atencion"])
+                    ),
+                    "created_at": e.created_at,
+                }
+                for e in creadas if WHO5Service.es_alerta(e.puntaje_final)
+            ]
+            if filas_alertas:
+                conn.execute(insert(Alerta.__table__), filas_alertas)
+            alertas += len(filas_alertas)
+
+    return {
+        "semilla": semilla,
+        "estudiantes": estudiantes,
+        "personal": personal,
+        "encuestas": len(filas_encuestas),
+        "respuestas": respuestas,
+        "alertas": alertas,
+        "tasa_alerta": round(alertas / len(filas_encuestas), 4) if filas_encuestas else 0,
+    }
+
+def limpiar() -> int:
+    """Borra los usuarios generados con sus encuestas, respuestas y alertas"""
+    with engine.begin() as conn:
+        ids = select(Usuario.id).where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%")).scalar_subquery()
+        conn.execute(delete(Alerta.__table__).where(Alerta.usuario_id.in_(ids)))
+        encuestas = select(Encuesta.id).where(Encuesta.usuario_id.in_(ids)).scalar_subquery()
+        conn.execute(delete(Respuesta.__table__).where(Respuesta.encuesta_id.in_(encuestas)))
+        conn.execute(delete(Encuesta.__table__).where(Encuesta.usuario_id.in_(ids)))
+        return conn.execute(
+            delete(Usuario.__table__).where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"))
+        ).rowcount
+
+def usuarios_generados(limite: int, tipo: TipoUsuario = None) -> List[Dict]:
+    """Usuarios generados con consentimiento (para los escenarios de carga)"""
+    consulta = (
+        select(Usuario.id, Usuario.correo_institucional, Usuario.rol)
+        .where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"), Usuario.consent_accepted.is_(True))
+        .order_by(Usuario.id)
+        .limit(limite)
+    )
+    if tipo is not None:
+        consulta = consulta.where(Usuario.tipo_usuario == tipo)
+    with engine.connect() as conn:
+        return [dict(fila) for fila in conn.execute(consulta).mappings()]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera una población sintética del campus")
+    parser.add_argument("--estudiantes", type=int, default=5000)
+    parser.add_argument("--personal", type=int, default=500)
+    parser.add_argument("--encuestas", type=int, default=20000)
+    parser.add_argument("--meses", type=int, default=24, help="Ventana de fechas de las encuestas")
+    parser.add_argument("--proporcion-riesgo", type=float, default=0.06, help="Fracción de personas en riesgo")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--limpiar", action="store_true", help="Borra la población generada y termina")
+    args = parser.parse_args(argv)
+
+    if args.limpiar:
+        print(f"Usuarios generados eliminados: {limpiar()}")
+        return 0
+
+    try:
+        resumen = sembrar(
+            args.estudiantes, args.personal, args.encuestas, args.meses, args.proporcion_riesgo, args.semilla
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(resumen, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
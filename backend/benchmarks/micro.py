@@ -0,0 +1,284 @@
+"""
+Microbenchmarks de los caminos calientes de CPU, con líneas base versionadas
+
+Uso (desde backend/, no necesita base de datos):
+    python -m benchmarks.micro                     # compara con la línea base
+    python -m benchmarks.micro --filtro export     # solo los casos que coinciden
+    python -m benchmarks.micro --guardar           # reemplaza la línea base
+
+Casos:
+    validacion_encuesta     EncuestaCreate con validar_respuestas_completas
+    puntaje_who5            calcular_puntaje_raw + calcular_puntaje_final + es_alerta
+    serializacion_encuesta  EncuestaResponse desde el ORM hasta JSON (response_model)
+    registro_estudiante     EstudianteRegistro con los validadores de correo,
+                            promoción y contraseña
+    alertas_dict_N          dicts de listar_alertas para N alertas
+    export_filas_N          filas de ExportService para N encuestas (sin openpyxl)
+
+Cada caso se mide con timeit: autorange fija el número de llamadas y se
+toma el mínimo de `--repeticiones` rondas, que es lo más estable frente al
+ruido de la máquina. La línea base (benchmarks/baselines/micro.json) guarda
+el tiempo por operación; un caso cuyo tiempo supere la base en más de
+`--umbral` (20 % por defecto) se marca como regresión y el comando sale con
+código 1. Las líneas base solo son comparables en la misma máquina y
+versión de Python: regenéralas con --guardar al cambiar de entorno.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm.attributes import set_committed_value
+from app.config.catalogos import CARGOS, PROGRAMAS
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.respuesta import Respuesta
+from app.models.usuario import TipoDocumento, TipoUsuario, Usuario
+from app.routes.dashboard import _alerta_a_dict
+from app.schemas.encuesta import EncuestaCreate, EncuestaResponse
+from app.schemas.usuario import EstudianteRegistro
+from app.services.export_service import ExportService
+from app.services.who5_service import WHO5Service
+
+DIRECTORIO_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+ARCHIVO_BASELINE = os.path.join(DIRECTORIO_BASELINES, "micro.json")
+TAMANOS = (1_000, 10_000, 100_000)
+
+def _usuarios(rnd: random.Random, n: int) -> List[Usuario]:
+    usuarios = []
+    for i in range(n):
+        estudiante = i % 5 != 0
+        usuarios.append(Usuario(
+            id=i + 1,
+            tipo_usuario=TipoUsuario.ESTUDIANTE if estudiante else TipoUsuario.PERSONAL,
+            nombres="Micro",
+            apellidos=f"Benchmark {i}",
+            tipo_documento=TipoDocumento.CC,
+            numero_documento=f"MICRO{i:08d}",
+            programa=rnd.choice(PROGRAMAS) if estudiante else None,
+            promocion="2024-1" if estudiante else None,
+            cargo=None if estudiante else rnd.choice(CARGOS),
+        ))
+    return usuarios
+
+def _encuestas(n: int, semilla: int = 7) -> List[Encuesta]:
+    """
+    Encuestas transitorias con usuario, respuestas y alerta ya cargados, como
+    las deja la consulta de exportación (set_committed_value evita los
+    eventos de backref, igual que el loader)
+    """
+    rnd = random.Random(semilla)
+    usuarios = _usuarios(rnd, max(1, n // 4))
+    ahora = datetime(2025, 6, 1)
+    encuestas = []
+    for i in range(n):
+        valores = [rnd.randint(0, 5) for _ in range(5)]
+        puntaje_raw = sum(valores)
+        creada = ahora - timedelta(minutes=i)
+        encuesta = Encuesta(
+            id=i + 1,
+            usuario_id=0,
+            created_at=creada,
+            completed_at=creada + timedelta(minutes=3),
+            puntaje_raw=puntaje_raw,
+            puntaje_final=puntaje_raw * 4,
+            es_alerta=puntaje_raw * 4 < 13,
+            comentario="Comentario" if i % 10 == 0 else None,
+            estado="completada",
+        )
+        usuario = usuarios[i % len(usuarios)]
+        encuesta.usuario_id = usuario.id
+        set_committed_value(encuesta, "usuario", usuario)
+        set_committed_value(encuesta, "respuestas", [
+            Respuesta(encuesta_id=i + 1, encuesta_created_at=creada, pregunta_numero=numero, valor=valor)
+            for numero, valor in enumerate(valores, start=1)
+        ])
+        alerta = None
+        if encuesta.es_alerta:
+            alerta = Alerta(
+                id=i + 1, encuesta_id=i + 1, usuario_id=usuario.id,
+                puntaje_obtenido=encuesta.puntaje_final, prioridad="alta", estado="pendiente", created_at=creada
+            )
+            set_committed_value(alerta, "usuario", usuario)
+        set_committed_value(encuesta, "alerta", alerta)
+        encuestas.append(encuesta)
+    return encuestas
+
+def _alertas(n: int) -> List[Alerta]:
+    rnd = random.Random(11)
+    usuarios = _usuarios(rnd, max(1, n // 2))
+    ahora = datetime(2025, 6, 1)
+    alertas = []
+    for i in range(n):
+        usuario = usuarios[i % len(usuarios)]
+        alerta = Alerta(
+            id=i + 1, encuesta_id=i + 1, usuario_id=usuario.id, tipo="puntaje", puntaje_obtenido=rnd.choice([0, 4, 8, 12]),
+            prioridad="alta", estado=rnd.choice(["pendiente", "en_atencion", "resuelta"]),
+            created_at=ahora - timedelta(hours=i)
+        )
+        set_committed_value(alerta, "usuario", usuario)
+        alertas.append(alerta)
+    return alertas
+
+# Cada caso prepara sus datos fuera de la medición y devuelve la función a medir
+def _caso_validacion_encuesta() -> Callable:
+    payload = {
+        "respuestas": [{"pregunta_numero": n, "valor": v} for n, v in zip(range(1, 6), (3, 4, 2, 5, 1))],
+        "comentario": "Semana pesada",
+        "can_contact": True,
+    }
+    return lambda: EncuestaCreate.model_validate(payload)
+
+def _caso_puntaje_who5() -> Callable:
+    valores = [3, 4, 2, 5, 1]
+
+    def puntuar():
+        WHO5Service.es_alerta(WHO5Service.calcular_puntaje_final(WHO5Service.calcular_puntaje_raw(valores)))
+    return puntuar
+
+def _caso_serializacion_encuesta() -> Callable:
+    encuesta = _encuestas(1)[0]
+    return lambda: EncuestaResponse.model_validate(encuesta).model_dump_json()
+
+def _caso_registro_estudiante() -> Callable:
+    datos = {
+        "nombres": "Ana María",
+        "apellidos": "Rodríguez Pérez",
+        "tipo_documento": "CC",
+        "numero_documento": "1020304050",
+        "correo_institucional": "Ana.Rodriguez@estudiantes.uniempresarial.edu.co",
+        "password": "Bienestar2024",
+        "programa": PROGRAMAS[0],
+        "promocion": "2024-1",
+    }
+    return lambda: EstudianteRegistro(**datos)
+
+def _caso_alertas_dict(n: int) -> Callable:
+    alertas = _alertas(n)
+    return lambda: [_alerta_a_dict(alerta) for alerta in alertas]
+
+def _caso_export_filas(n: int) -> Callable:
+    encuestas = _encuestas(n)
+    return lambda: [ExportService._fila_encuesta(encuesta) for encuesta in encuestas]
+
+def casos(tamanos=TAMANOS) -> Dict[str, Callable[[], Callable]]:
+    registro = {
+        "validacion_encuesta": _caso_validacion_encuesta,
+        "puntaje_who5": _caso_puntaje_who5,
+        "serializacion_encuesta": _caso_serializacion_encuesta,
+        "registro_estudiante": _caso_registro_estudiante,
+        # listar_alertas devuelve como máximo 100 alertas
+        "alertas_dict_100": lambda: _caso_alertas_dict(100),
+    }
+    for n in tamanos:
+        registro[f"export_filas_{n}"] = lambda n=n: _caso_export_filas(n)
+    return registro
+
+def medir(funcion: Callable, repeticiones: int) -> Dict:
+    temporizador = timeit.Timer(funcion)
+    numero, _ = temporizador.autorange()
+    tiempos = [total / numero for total in temporizador.repeat(repeat=repeticiones, number=numero)]
+    return {"s_por_op": min(tiempos), "llamadas": numero, "rondas": repeticiones}
+
+def metadatos() -> Dict:
+    return {
+        "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementacion": platform.python_implementation(),
+        "maquina": platform.machine(),
+        "sistema": platform.system(),
+    }
+
+def leer_baseline(ruta: str = ARCHIVO_BASELINE) -> Optional[Dict]:
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_baseline(resultados: Dict, ruta: str = ARCHIVO_BASELINE) -> None:
+    existente = leer_baseline(ruta) or {"casos": {}}
+    # Con --filtro solo se actualizan los casos medidos
+    existente["casos"].update(resultados["casos"])
+    existente["metadatos"] = resultados["metadatos"]
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(existente, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(temporal, ruta)
+
+def comparar(resultados: Dict, baseline: Dict, umbral: float) -> List[Dict]:
+    comparaciones = []
+    for nombre, actual in resultados["casos"].items():
+        base = baseline.get("casos", {}).get(nombre)
+        if not base:
+            comparaciones.append({"caso": nombre, "variacion": None, "regresion": False})
+            continue
+        variacion = actual["s_por_op"] / base["s_por_op"] - 1
+        comparaciones.append({"caso": nombre, "variacion": variacion, "regresion": variacion > umbral})
+    return comparaciones
+
+def _formatear_tiempo(segundos: float) -> str:
+    for unidad, factor in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if segundos >= factor:
+            return f"{segundos / factor:.2f} {unidad}"
+    return f"{segundos / 1e-9:.0f} ns"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de validación, puntaje y serialización")
+    parser.add_argument("--filtro", default=None, help="Solo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--tamanos", default=",".join(str(n) for n in TAMANOS), help="Filas de los casos export_filas")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--umbral", type=float, default=0.20, help="Regresión tolerada (0.20 = 20 %%)")
+    parser.add_argument("--baseline", default=ARCHIVO_BASELINE)
+    parser.add_argument("--guardar", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    tamanos = [int(n) for n in args.tamanos.split(",") if n.strip()]
+    seleccionados = {
+        nombre: preparar for nombre, preparar in casos(tamanos).items()
+        if not args.filtro or args.filtro in nombre
+    }
+    if not seleccionados:
+        parser.error(f"Ningún caso coincide con '{args.filtro}'")
+
+    resultados = {"metadatos": metadatos(), "casos": {}}
+    for nombre, preparar in seleccionados.items():
+        resultados["casos"][nombre] = medir(preparar(), args.repeticiones)
+
+    if args.guardar:
+        guardar_baseline(resultados, args.baseline)
+
+    baseline = None if args.guardar else leer_baseline(args.baseline)
+    comparaciones = comparar(resultados, baseline, args.umbral) if baseline else []
+    variaciones = {c["caso"]: c for c in comparaciones}
+
+    if args.json:
+        print(json.dumps({**resultados, "comparacion": comparaciones}, indent=2, ensure_ascii=False))
+    else:
+        if baseline and baseline.get("metadatos", {}).get("python") != resultados["metadatos"]["python"]:
+            print(
+                f"Aviso: la línea base es de Python {baseline['metadatos'].get('python')}; "
+                "las variaciones pueden no ser comparables", file=sys.stderr
+            )
+        for nombre, resultado in resultados["casos"].items():
+            linea = f"{nombre:<26} {_formatear_tiempo(resultado['s_por_op']):>12}/op"
+            comparacion = variaciones.get(nombre)
+            if comparacion and comparacion["variacion"] is not None:
+                marca = "REGRESIÓN" if comparacion["regresion"] else "ok"
+                linea += f"  {comparacion['variacion']:+.1%} [{marca}]"
+            elif baseline:
+                linea += "  (sin línea base)"
+            print(linea)
+        if args.guardar:
+            print(f"Línea base guardada en {os.path.relpath(args.baseline)}")
+
+    return 1 if any(c["regresion"] for c in comparaciones) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
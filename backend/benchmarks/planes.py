@@ -0,0 +1,242 @@
+"""
+Verificación de planes de consulta de las rutas frecuentes
+
+Uso (desde backend/, con la base migrada a la última versión):
+    python -m benchmarks.planes [--usuarios 3000] [--encuestas-por-usuario 12] [--json]
+
+Siembra datos sintéticos (idempotente, documentos con prefijo PLAN), ejecuta
+ANALYZE y pide el plan (EXPLAIN en PostgreSQL, EXPLAIN QUERY PLAN en SQLite)
+de cada consulta. Falla con código 1 si alguna recorre la tabla completa
+(Seq Scan / SCAN sin índice), deja de usar el índice esperado o, con las
+tablas particionadas, toca más particiones de las previstas; sirve como
+chequeo de regresión en CI tras cambiar modelos o migraciones.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import and_, func, insert, select, text
+from app.config.catalogos import PROGRAMAS
+from app.config.database import engine
+from app.models.alerta import Alerta
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario, TipoUsuario, TipoDocumento, Rol
+from app.services.particiones_service import ParticionesService
+
+PREFIJO_DOCUMENTO = "PLAN"
+SUFIJO_PARTICION = r"(?:_\d{4}_[12]|_default)"
+
+def sembrar_datos(usuarios: int, encuestas_por_usuario: int, semilla: int = 42) -> int:
+    """Inserta usuarios, encuestas y alertas sintéticas si aún no existen"""
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow()
+
+    with engine.begin() as conn:
+        existentes = conn.execute(
+            select(func.count(Usuario.id)).where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"))
+        ).scalar_one()
+        if existentes >= usuarios:
+            return 0
+
+        # Particiones de los semestres sembrados (no-op sin particionamiento)
+        ParticionesService.asegurar_particiones(conn, 0, desde=ahora - timedelta(days=730))
+
+        filas_usuarios = []
+        for i in range(existentes, usuarios):
+            estudiante = rnd.random() < 0.85
+            filas_usuarios.append({
+                "tipo_usuario": TipoUsuario.ESTUDIANTE if estudiante else TipoUsuario.PERSONAL,
+                "nombres": "Plan",
+                "apellidos": f"Sintético {i}",
+                "tipo_documento": TipoDocumento.CC,
+                "numero_documento": f"{PREFIJO_DOCUMENTO}{i:08d}",
+                "correo_institucional": (
+                    f"plan{i}@estudiantes.uniempresarial.edu.co" if estudiante else f"plan{i}@uniempresarial.edu.co"
+                ),
+                # Hash inválido a propósito: estos usuarios no inician sesión
+                "password_hash": "!",
+                "rol": Rol.USER,
+                "programa": rnd.choice(PROGRAMAS) if estudiante else None,
+                "consent_accepted": True,
+                "created_at": ahora - timedelta(days=730),
+                "is_active": True
+            })
+        ids_usuarios = conn.execute(
+            insert(Usuario.__table__).returning(Usuario.__table__.c.id), filas_usuarios
+        ).scalars().all()
+
+        filas_encuestas = []
+        for usuario_id in ids_usuarios:
+            for _ in range(encuestas_por_usuario):
+                creada = ahora - timedelta(days=rnd.uniform(0, 730))
+                puntaje = rnd.randint(0, 25)
+                filas_encuestas.append({
+                    "usuario_id": usuario_id,
+                    "created_at": creada,
+                    "started_at": creada,
+                    "completed_at": creada + timedelta(minutes=3) if rnd.random() < 0.95 else None,
+                    "puntaje_raw": puntaje,
+                    "puntaje_final": puntaje * 4,
+                    "es_alerta": puntaje * 4 < 13,
+                    "estado": "completada"
+                })
+        tabla = Encuesta.__table__
+        encuestas = conn.execute(
+            insert(tabla).returning(tabla.c.id, tabla.c.usuario_id, tabla.c.puntaje_final, tabla.c.created_at),
+            filas_encuestas
+        ).all()
+
+        filas_alertas = [
+            {
+                "encuesta_id": e.id,
+                "encuesta_created_at": e.created_at,
+                "usuario_id": e.usuario_id,
+                "puntaje_obtenido": e.puntaje_final,
+                "prioridad": "alta" if e.puntaje_final < 8 else "media",
+                # La mayoría de las alertas históricas ya están resueltas
+                "estado": "resuelta" if rnd.random() < 0.9 else rnd.choice(["pendiente", "en_atencion"]),
+                "created_at": e.created_at
+            }
+            for e in encuestas if e.puntaje_final < 13
+        ]
+        if filas_alertas:
+            conn.execute(insert(Alerta.__table__), filas_alertas)
+
+    return len(ids_usuarios)
+
+def consultas() -> List[Dict]:
+    """Consultas de las rutas con la tabla a vigilar y los índices aceptados"""
+    ahora = datetime.utcnow()
+    return [
+        {
+            "nombre": "historial_usuario",
+            "tabla": "encuestas",
+            "indices": ["ix_encuestas_usuario_created"],
+            "sql": select(Encuesta).where(Encuesta.usuario_id == 10).order_by(Encuesta.created_at.desc())
+        },
+        {
+            "nombre": "resultado_anterior",
+            "tabla": "encuestas",
+            "indices": ["ix_encuestas_usuario_created"],
+            "sql": select(Encuesta).where(
+                Encuesta.usuario_id == 10,
+                Encuesta.id < 1_000_000,
+                Encuesta.completed_at.isnot(None)
+            ).order_by(Encuesta.created_at.desc()).limit(1)
+        },
+        {
+            "nombre": "alertas_activas",
+            "tabla": "alertas",
+            "indices": ["ix_alertas_activas_created"],
+            "sql": select(Alerta).join(Usuario, Alerta.usuario_id == Usuario.id)
+                .where(Alerta.estado != "resuelta")
+                .order_by(Alerta.created_at.desc()).limit(100)
+        },
+        {
+            "nombre": "usuarios_por_tipo_programa",
+            "tabla": "usuarios",
+            "indices": ["ix_usuarios_tipo_programa"],
+            "sql": select(func.count(Usuario.id)).where(
+                Usuario.tipo_usuario == TipoUsuario.ESTUDIANTE,
+                Usuario.programa == PROGRAMAS[0]
+            )
+        },
+        {
+            "nombre": "encuestas_completadas_periodo",
+            "tabla": "encuestas",
+            "indices": ["ix_encuestas_created_completadas", "ix_encuestas_created_at"],
+            # 30 días caen en uno o dos semestres
+            "max_particiones": 2,
+            "sql": select(func.avg(Encuesta.puntaje_final)).where(and_(
+                Encuesta.completed_at.isnot(None),
+                Encuesta.created_at.between(ahora - timedelta(days=30), ahora)
+            ))
+        },
+    ]
+
+def obtener_plan(conn, sentencia) -> List[str]:
+    sql = str(sentencia.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [fila[3] for fila in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+    return [fila[0] for fila in conn.exec_driver_sql("EXPLAIN " + sql)]
+
+def recorre_tabla(plan: List[str], tabla: str, dialecto: str) -> bool:
+    if dialecto == "sqlite":
+        patron = re.compile(rf"^SCAN {tabla}$")
+        return any(patron.search(linea.strip()) for linea in plan)
+    patron = re.compile(rf"Seq Scan on {tabla}{SUFIJO_PARTICION}?\b")
+    # Un Seq Scan de costo 0 es una partición vacía (futura o DEFAULT)
+    return any(patron.search(linea) and "..0.00 " not in linea for linea in plan)
+
+def particiones_en_plan(plan: List[str], tabla: str) -> set:
+    patron = re.compile(rf"\bon ({tabla}{SUFIJO_PARTICION})\b")
+    return {m.group(1) for linea in plan for m in patron.finditer(linea)}
+
+def indices_de_particiones(conn, indices: List[str]) -> List[str]:
+    """Índices de cada partición creados a partir de los índices del padre"""
+    if conn.dialect.name != "postgresql":
+        return []
+    return conn.execute(text(
+        "SELECT hijo.relname FROM pg_inherits i "
+        "JOIN pg_class hijo ON hijo.oid = i.inhrelid "
+        "JOIN pg_class padre ON padre.oid = i.inhparent "
+        "WHERE padre.relname = ANY(:indices)"
+    ), {"indices": indices}).scalars().all()
+
+def verificar_planes() -> List[Dict]:
+    resultados = []
+    with engine.connect() as conn:
+        dialecto = conn.dialect.name
+        conn.exec_driver_sql("ANALYZE")
+        for consulta in consultas():
+            plan = obtener_plan(conn, consulta["sql"])
+            texto = "\n".join(plan)
+            aceptados = consulta["indices"] + indices_de_particiones(conn, consulta["indices"])
+            errores = []
+            if recorre_tabla(plan, consulta["tabla"], dialecto):
+                errores.append(f"recorrido completo de {consulta['tabla']}")
+            if not any(indice in texto for indice in aceptados):
+                errores.append(f"no usa {' / '.join(consulta['indices'])}")
+            particiones = particiones_en_plan(plan, consulta["tabla"])
+            if len(particiones) > consulta.get("max_particiones", len(particiones)):
+                errores.append(f"toca {len(particiones)} particiones: {', '.join(sorted(particiones))}")
+            resultados.append({
+                "consulta": consulta["nombre"],
+                "ok": not errores,
+                "errores": errores,
+                "plan": plan
+            })
+    return resultados
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica los planes de las consultas frecuentes")
+    parser.add_argument("--usuarios", type=int, default=3000)
+    parser.add_argument("--encuestas-por-usuario", type=int, default=12)
+    parser.add_argument("--sin-sembrar", action="store_true", help="Usar los datos existentes")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.sin_sembrar:
+        creados = sembrar_datos(args.usuarios, args.encuestas_por_usuario)
+        if creados:
+            print(f"Sembrados {creados} usuarios sintéticos", file=sys.stderr)
+
+    resultados = verificar_planes()
+
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    else:
+        for r in resultados:
+            print(f"[{'OK' if r['ok'] else 'FALLA'}] {r['consulta']}")
+            for error in r["errores"]:
+                print(f"    {error}")
+            for linea in r["plan"]:
+                print(f"      {linea}")
+
+    return 0 if all(r["ok"] for r in resultados) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Verifica los presupuestos de consultas por ruta y busca patrones N+1
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base de pruebas):
+    python -m benchmarks.presupuestos [--usuarios 200] [--encuestas-por-usuario 6] [--json]
+
+Siembra los mismos datos sintéticos que benchmarks.planes, recorre las
+rutas principales con el detector de consultas activo y sale con código 1
+si alguna ruta supera su presupuesto (@presupuesto_consultas) o repite una
+misma sentencia DETECTOR_UMBRAL_REPETICIONES veces o más. Pensado para CI:
+un lazy load nuevo en un bucle hace fallar la verificación antes de llegar
+a producción.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from sqlalchemy import select
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.main import app
+from app.models.encuesta import Encuesta
+from app.models.usuario import Usuario
+from app.services.auth_service import AuthService, pwd_context
+from app.utils.bcrypt_policy import rounds_actuales
+from app.utils.detector_consultas import hallazgos, limpiar_hallazgos
+from app.utils.metricas_http import metricas_http
+from benchmarks.comun import CORREO_BENCHMARK, CONTRASENA_BENCHMARK, preparar_usuario_benchmark
+from benchmarks.planes import PREFIJO_DOCUMENTO, sembrar_datos
+
+def token_estudiante() -> Dict:
+    """Token y una encuesta de un usuario sintético con historial"""
+    db = SessionLocal()
+    try:
+        encuesta = db.execute(
+            select(Encuesta).join(Usuario)
+            .where(Usuario.numero_documento.like(f"{PREFIJO_DOCUMENTO}%"))
+            .order_by(Encuesta.id.desc()).limit(1)
+        ).scalars().first()
+        usuario = encuesta.usuario
+        token = AuthService.create_access_token(
+            {"sub": usuario.correo_institucional, "id": usuario.id, "rol": usuario.rol}
+        )
+        return {"token": token, "encuesta_id": encuesta.id}
+    finally:
+        db.close()
+
+def hash_fuera_de_politica() -> None:
+    """Deja la contraseña del usuario de benchmark con otro costo: el siguiente login la rehashea"""
+    rounds = 4 if rounds_actuales(pwd_context) != 4 else 5
+    db = SessionLocal()
+    try:
+        usuario = db.query(Usuario).filter(Usuario.correo_institucional == CORREO_BENCHMARK).one()
+        usuario.password_hash = bcrypt.using(rounds=rounds).hash(CONTRASENA_BENCHMARK)
+        db.commit()
+    finally:
+        db.close()
+
+def recorridos(admin: str, estudiante: Dict) -> List[Dict]:
+    """Requests a verificar: rutas de lectura con más datos detrás y el login"""
+    login = {"username": CORREO_BENCHMARK, "password": CONTRASENA_BENCHMARK}
+    return [
+        {"metodo": "POST", "url": "/api/auth/login", "form": login},
+        {"metodo": "POST", "url": "/api/auth/login", "form": login, "antes": hash_fuera_de_politica, "nombre": "login con rehash"},
+        {"metodo": "GET", "url": "/api/dashboard/metricas?periodo=all", "token": admin},
+        {"metodo": "GET", "url": "/api/dashboard/metricas?periodo=30d&programa=Psicología", "token": admin},
+        {"metodo": "GET", "url": "/api/dashboard/segmentos?periodo=all", "token": admin},
+        {"metodo": "GET", "url": "/api/dashboard/alertas", "token": admin},
+        {"metodo": "GET", "url": "/api/dashboard/alertas?estado=activas", "token": admin},
+        {"metodo": "GET", "url": "/api/dashboard/export/excel", "token": admin},
+        {"metodo": "GET", "url": "/api/encuestas/mis-encuestas", "token": estudiante["token"]},
+        {"metodo": "GET", "url": f"/api/encuestas/{estudiante['encuesta_id']}/resultado", "token": estudiante["token"]},
+    ]
+
+def sentencias_por_ruta() -> Dict:
+    with metricas_http._lock:
+        return {clave: histograma.suma for clave, histograma in metricas_http.sentencias.items()}
+
+def verificar() -> List[Dict]:
+    admin = preparar_usuario_benchmark()
+    estudiante = token_estudiante()
+
+    settings.DETECTOR_CONSULTAS = True
+    limpiar_hallazgos()
+    resultados = []
+    with TestClient(app) as cliente:
+        for recorrido in recorridos(admin, estudiante):
+            if "antes" in recorrido:
+                recorrido["antes"]()
+            antes = sentencias_por_ruta()
+            respuesta = cliente.request(
+                recorrido["metodo"], recorrido["url"],
+                data=recorrido.get("form"),
+                headers={"Authorization": f"Bearer {recorrido['token']}"} if "token" in recorrido else {}
+            )
+            despues = sentencias_por_ruta()
+            ejecutadas = sum(despues.values()) - sum(antes.values())
+            resultados.append({
+                "metodo": recorrido["metodo"],
+                "url": recorrido["url"],
+                "nombre": recorrido.get("nombre"),
+                "estado": respuesta.status_code,
+                "sentencias": int(ejecutadas),
+            })
+
+    encontrados = hallazgos()
+    for resultado in resultados:
+        ruta = resultado["url"].split("?")[0]
+        resultado["hallazgos"] = [
+            h for h in encontrados
+            if h["metodo"] == resultado["metodo"] and _coincide(h["ruta"], ruta)
+        ]
+    return resultados
+
+def _coincide(plantilla: str, ruta: str) -> bool:
+    partes_plantilla, partes_ruta = plantilla.strip("/").split("/"), ruta.strip("/").split("/")
+    return len(partes_plantilla) == len(partes_ruta) and all(
+        p == r or (p.startswith("{") and p.endswith("}")) for p, r in zip(partes_plantilla, partes_ruta)
+    )
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Presupuestos de consultas y detección de N+1")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--encuestas-por-usuario", type=int, default=6)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    sembrar_datos(args.usuarios, args.encuestas_por_usuario)
+    resultados = verificar()
+
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    else:
+        for resultado in resultados:
+            marca = "OK" if resultado["estado"] < 400 and not resultado["hallazgos"] else "FALLA"
+            nombre = f" ({resultado['nombre']})" if resultado["nombre"] else ""
+            print(
+                f"[{marca}] {resultado['metodo']} {resultado['url']}{nombre}: "
+                f"{resultado['estado']}, {resultado['sentencias']} sentencias"
+            )
+            for hallazgo in resultado["hallazgos"]:
+                if hallazgo["tipo"] == "n_mas_1":
+                    print(f"      N+1: {hallazgo['repeticiones']} x {hallazgo['sentencia'][:100]}")
+                    for origen, n in hallazgo["origen"].items():
+                        print(f"           {n} desde {origen}")
+                else:
+                    print(f"      presupuesto {hallazgo['presupuesto']} excedido")
+
+    fallas = [r for r in resultados if r["estado"] >= 400 or r["hallazgos"]]
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Costo de serializar las respuestas calientes: camino estándar vs RESPUESTAS_RAPIDAS
+
+Uso (desde backend/, no necesita base de datos):
+    python -m benchmarks.serializacion [--filas 100] [--repeticiones 5] [--json]
+
+Para cada ruta mide desde el valor que devuelve el endpoint hasta los
+bytes del cuerpo:
+    alertas     lista de _alerta_a_dict (jsonable_encoder + json vs orjson)
+    metricas    dict de obtener_metricas (una sola respuesta, sin filas)
+    historial   /mis-encuestas: objetos ORM validados y serializados por
+                response_model (como era la ruta) vs filas de columnas
+                codificadas con orjson
+
+El camino estándar usa las mismas funciones de FastAPI que la ruta
+(serialize_response y JSONResponse). Antes de medir verifica que ambos
+caminos producen el mismo JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import namedtuple
+from typing import Callable, Dict
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from app.config.settings import settings
+from app.main import app
+from app.routes.dashboard import _alerta_a_dict
+from app.schemas.encuesta import EncuestaResponse
+from app.utils.respuestas_json import json_directo, json_filas, respuestas_rapidas
+from benchmarks.micro import _alertas, _encuestas, medir
+
+def _campo_respuesta(ruta: str):
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == ruta:
+            return route.secure_cloned_response_field
+    raise LookupError(ruta)
+
+def _metricas() -> Dict:
+    return {
+        "total_usuarios": 5500,
+        "total_encuestas": 20000,
+        "tasa_participacion": 87.31,
+        "puntaje_promedio": 58.44,
+        "alertas": {"activas": 41, "pendientes": 30, "resueltas": 305},
+        "distribucion_puntajes": {"alerta_0_12": 346, "bajo_13_50": 6120, "medio_51_75": 9874, "alto_76_100": 3660},
+    }
+
+def caminos(filas: int) -> Dict[str, Dict[str, Callable[[], bytes]]]:
+    """Por ruta, una función por camino que devuelve el cuerpo de la respuesta"""
+    bucle = asyncio.new_event_loop()
+    alertas = [_alerta_a_dict(alerta) for alerta in _alertas(filas)]
+    metricas = _metricas()
+    encuestas = _encuestas(filas)
+    # Las Row de SQLAlchemy tienen la interfaz de namedtuple (_asdict, atributos)
+    FilaHistorial = namedtuple("FilaHistorial", list(EncuestaResponse.model_fields))
+    filas_historial = [FilaHistorial(*(getattr(e, campo) for campo in FilaHistorial._fields)) for e in encuestas]
+    campo_historial = _campo_respuesta("/api/encuestas/mis-encuestas")
+
+    def estandar(contenido, campo=None) -> bytes:
+        serializado = bucle.run_until_complete(serialize_response(field=campo, response_content=contenido))
+        return JSONResponse(serializado).body
+
+    return {
+        "alertas": {
+            "estandar": lambda: estandar(alertas),
+            "rapido": lambda: json_directo(alertas).body,
+        },
+        "metricas": {
+            "estandar": lambda: estandar(metricas),
+            "rapido": lambda: json_directo(metricas).body,
+        },
+        "historial": {
+            "estandar": lambda: estandar(encuestas, campo_historial),
+            "rapido": lambda: json_filas(filas_historial).body,
+        },
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serialización estándar vs orjson")
+    parser.add_argument("--filas", type=int, default=100, help="Filas de alertas e historial")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    settings.RESPUESTAS_RAPIDAS = True
+    if not respuestas_rapidas():
+        print("Error: orjson no está instalado", file=sys.stderr)
+        return 1
+
+    resultados = {}
+    for ruta, funciones in caminos(args.filas).items():
+        estandar, rapido = funciones["estandar"](), funciones["rapido"]()
+        if json.loads(estandar) != json.loads(rapido):
+            print(f"Error: {ruta} produce JSON distinto en el camino rápido", file=sys.stderr)
+            return 1
+        tiempos = {camino: medir(funcion, args.repeticiones)["s_por_op"] for camino, funcion in funciones.items()}
+        resultados[ruta] = {
+            "estandar_us": round(tiempos["estandar"] * 1e6, 1),
+            "rapido_us": round(tiempos["rapido"] * 1e6, 1),
+            "aceleracion": round(tiempos["estandar"] / tiempos["rapido"], 2),
+            "bytes": len(rapido),
+        }
+
+    if args.json:
+        print(json.dumps({"filas": args.filas, "rutas": resultados}, indent=2))
+    else:
+        print(f"{'ruta':<10} {'estándar':>12} {'rápido':>12} {'aceleración':>12}  ({args.filas} filas)")
+        for ruta, r in resultados.items():
+            print(f"{ruta:<10} {r['estandar_us']:>9} µs {r['rapido_us']:>9} µs {r['aceleracion']:>11}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+# Servidor de producción:
+#     gunicorn -c gunicorn.conf.py app.main:app
+#
+# Los valores salen de Settings (.env o variables de entorno, prefijo WEB_);
+# las opciones de línea de comandos de gunicorn los sobrescriben.
+from app.config.settings import settings
+from app.utils.servidor import al_iniciar, al_salir, al_terminar_worker, numero_workers, tras_fork
+
+bind = settings.WEB_BIND
+workers = numero_workers()
+worker_class = "app.utils.servidor.WorkerBienestar"
+
+# La app se importa una vez en el padre: los workers arrancan sin volver a
+# importar FastAPI, SQLAlchemy ni pandas y comparten esas páginas (copy-on-write)
+preload_app = True
+
+# Reciclaje: cada worker se reinicia tras max_requests (+ jitter aleatorio
+# para que no lo hagan todos a la vez) con el mismo apagado ordenado
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER
+
+timeout = settings.WEB_TIMEOUT
+keepalive = settings.WEB_KEEPALIVE
+# Drenaje de uvicorn + margen para el shutdown del lifespan (flush de
+# last_login, cierre del despachador de notificaciones)
+graceful_timeout = int(settings.WEB_DRENAJE_SEGUNDOS) + 10
+
+when_ready = al_iniciar
+post_fork = tras_fork
+child_exit = al_terminar_worker
+on_exit = al_salir
@@ -9,18 +9,32 @@ export const apiClient = axios.create({
   },
 });
 
+// Marca de escritura reciente: mientras no venza, el backend lee del
+// primario y no de la réplica (read-your-writes entre workers)
+const CABECERA_ESCRITURA = 'X-Escritura-Reciente';
+let marcaEscritura: string | null = null;
+
 // Interceptor para añadir token
 apiClient.interceptors.request.use((config) => {
   const token = localStorage.getItem('authToken');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (marcaEscritura && Number(marcaEscritura.split('.')[0]) > Date.now()) {
+    config.headers[CABECERA_ESCRITURA] = marcaEscritura;
+  }
   return config;
 });
 
 // Interceptor para manejar errores
 apiClient.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const marca = response.headers[CABECERA_ESCRITURA.toLowerCase()];
+    if (marca) {
+      marcaEscritura = marca;
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('authToken');